@@ -0,0 +1,669 @@
+from JackAST import LetStatement, IfStatement, WhileStatement, DoStatement, ReturnStatement, IntegerConstant, \
+    StringConstant, KeywordConstant, VariableAccess, ArrayAccess, UnaryOperation, BinaryOperation, SubroutineCall
+from SymbolTable import STATIC_SEGMENT_KEYWORD, FIELD_SEGMENT_KEYWORD, VAR_SEGMENT_KEYWORD
+
+# the names of the optimizations
+CONSTANT_FOLDING = "constant-folding"
+LOOP_INVARIANT_MOTION = "loop-invariant-motion"
+COMMON_SUBEXPRESSIONS = "common-subexpressions"
+
+WORD_BITS = 16
+WORD_MASK = (1 << WORD_BITS) - 1
+SIGN_BIT = 1 << (WORD_BITS - 1)
+MIN_VALUE = -SIGN_BIT
+TRUE_VALUE = -1
+FALSE_VALUE = 0
+KEYWORD_VALUES = {"true": TRUE_VALUE, "false": FALSE_VALUE, "null": FALSE_VALUE}
+PLUS = "+"
+MINUS = "-"
+MULTIPLY = "*"
+DIVIDE = "/"
+AND = "&"
+OR = "|"
+NOT = "~"
+# the binary operators applied to two constants, with 16-bit two's complement results
+BINARY_FOLDS = {
+    PLUS: lambda left, right: left + right,
+    MINUS: lambda left, right: left - right,
+    MULTIPLY: lambda left, right: left * right,
+    AND: lambda left, right: left & right,
+    OR: lambda left, right: left | right,
+    "<": lambda left, right: TRUE_VALUE if left < right else FALSE_VALUE,
+    ">": lambda left, right: TRUE_VALUE if left > right else FALSE_VALUE,
+    "=": lambda left, right: TRUE_VALUE if left == right else FALSE_VALUE,
+}
+COMPARISON_OPERATORS = ("<", ">", "=")
+UNARY_FOLDS = {MINUS: lambda value: -value, NOT: lambda value: ~value}
+# the operators whose constant operands can be combined: (x op c1) op c2 is x op (c1 op c2)
+ASSOCIATIVE_OPERATORS = (PLUS, MULTIPLY, AND, OR)
+# the operators that call a function of the Math class, which runs many commands
+MATH_OPERATORS = (MULTIPLY, DIVIDE)
+MATH_CALL_COST = 10  # the estimated cost of a call of the Math class, in vm commands
+ARRAY_ACCESS_COST = 3  # the commands an array access adds to its array and index: add, pop pointer 1, push that 0
+
+
+class ASTOptimizer:
+    """
+    Optimizes the abstract syntax tree of a subroutine (see JackAST) in place, before its code is written.
+    Constant folding evaluates the constant subexpressions at compile time, with the 16-bit two's complement
+    arithmetic of the Hack platform, and applies algebraic identities such as x + 0, x * 1, x * 0 and ~~x.
+    Operands that may have side effects (calls and string constants) are never dropped.
+    Loop invariant motion computes the expressions whose value can't change while a loop runs once, before the
+    loop, into hidden local variables (see LoopInvariantHoister).
+    Common subexpression elimination computes an expression that appears several times in a statement once, into a
+    hidden local variable, before the statement (see SubexpressionMerger).
+    """
+    def __init__(self, optimizations):
+        """
+        Creates an optimizer
+        :param optimizations: a set of the names of the enabled optimizations
+        """
+        self.__optimizations = optimizations
+
+    def optimize(self, subroutine):
+        """
+        Applies the enabled optimizations to the given subroutine
+        :param subroutine: a Subroutine node
+        """
+        if CONSTANT_FOLDING in self.__optimizations:
+            self.__fold_statements(subroutine.statements)
+        if LOOP_INVARIANT_MOTION in self.__optimizations:
+            self.__hoist_statements(subroutine.statements, subroutine)
+        if COMMON_SUBEXPRESSIONS in self.__optimizations:
+            self.__merge_statements(subroutine.statements, subroutine)
+
+    def __fold_statements(self, statements):
+        """
+        Folds the expressions in a list of statements
+        :param statements: a list of statement nodes
+        """
+        for statement in statements:
+            statement_type = type(statement)
+            if statement_type is LetStatement:
+                if type(statement.target) is ArrayAccess:
+                    statement.target.index = fold_expression(statement.target.index)
+                statement.value = fold_expression(statement.value)
+            elif statement_type is IfStatement:
+                statement.condition = fold_expression(statement.condition)
+                self.__fold_statements(statement.then_statements)
+                if statement.else_statements is not None:
+                    self.__fold_statements(statement.else_statements)
+            elif statement_type is WhileStatement:
+                statement.condition = fold_expression(statement.condition)
+                self.__fold_statements(statement.statements)
+            elif statement_type is DoStatement:
+                statement.call = fold_expression(statement.call)
+            elif statement_type is ReturnStatement and statement.value is not None:
+                statement.value = fold_expression(statement.value)
+
+
+    def __hoist_statements(self, statements, subroutine):
+        """
+        Moves the invariant expressions of the loops in a list of statements before the loops. The inner loops are
+        handled first, so an expression that is invariant in the outer loop too moves out of it as well
+        :param statements: a list of statement nodes
+        :param subroutine: the Subroutine node of the statements, which gets the hidden local variables
+        """
+        hoisted_statements = []
+        for statement in statements:
+            statement_type = type(statement)
+            if statement_type is IfStatement:
+                self.__hoist_statements(statement.then_statements, subroutine)
+                if statement.else_statements is not None:
+                    self.__hoist_statements(statement.else_statements, subroutine)
+            elif statement_type is WhileStatement:
+                self.__hoist_statements(statement.statements, subroutine)
+                hoisted_statements.extend(LoopInvariantHoister(statement, subroutine).hoist())
+            hoisted_statements.append(statement)
+        statements[:] = hoisted_statements
+
+    def __merge_statements(self, statements, subroutine):
+        """
+        Merges the common subexpressions of each statement in a list of statements
+        :param statements: a list of statement nodes
+        :param subroutine: the Subroutine node of the statements, which gets the hidden local variables
+        """
+        merged_statements = []
+        for statement in statements:
+            statement_type = type(statement)
+            if statement_type is IfStatement:
+                self.__merge_statements(statement.then_statements, subroutine)
+                if statement.else_statements is not None:
+                    self.__merge_statements(statement.else_statements, subroutine)
+            elif statement_type is WhileStatement:
+                self.__merge_statements(statement.statements, subroutine)
+            else:
+                merged_statements.extend(SubexpressionMerger(statement, subroutine).merge())
+            merged_statements.append(statement)
+        statements[:] = merged_statements
+
+
+class LoopInvariantHoister:
+    """
+    Moves the invariant expressions of a while loop before it. An expression is invariant if it reads no variable
+    that the loop assigns, and:
+    - it reads no field when the loop stores to a field or an array element or calls a subroutine (which may
+      change any memory word), and no static variable when the loop calls a subroutine
+    - it doesn't divide (the division may be guarded by a condition in the loop, and dividing by 0 is an error)
+    - it reads no array element. Only the address of an element is invariant, since a guarded access of an element
+      may read an address that is not valid when the guard is false
+    Each invariant expression with an operation is computed once before the loop into a hidden local variable, and
+    the loop reads the variable. The address of an array element with an invariant index is moved out the same way
+    (or the array's address plus the invariant operand of an index such as i + j), so each access only adds the rest
+    of the index to it.
+    """
+    def __init__(self, loop, subroutine):
+        """
+        :param loop: a WhileStatement node
+        :param subroutine: the Subroutine node of the loop, which gets the hidden local variables
+        """
+        self.__loop = loop
+        self.__subroutine = subroutine
+        self.__assigned_variables = set()  # the kind and index of each variable the loop assigns
+        self.__writes_memory = False  # whether the loop stores to a field or an array element
+        self.__has_calls = False
+        self.__hoisted_statements = {}  # the statement that computes each hoisted expression, by the expression key
+        self.__find_statements_effects(loop.statements)
+        self.__find_expression_effects(loop.condition)
+
+    def hoist(self):
+        """
+        Replaces the invariant expressions of the loop with hidden local variables
+        :return: a list of the statements that compute the hidden local variables, to be placed before the loop
+        """
+        # a loop whose whole condition is invariant runs at most once or until a return, so it's left as is
+        if not self.__is_invariant(self.__loop.condition):
+            self.__loop.condition = self.__hoist_expression(self.__loop.condition)
+        self.__hoist_statements(self.__loop.statements)
+        return list(self.__hoisted_statements.values())
+
+    def __find_statements_effects(self, statements):
+        """
+        Records the variables and memory that a list of statements may change
+        :param statements: a list of statement nodes
+        """
+        for statement in statements:
+            statement_type = type(statement)
+            if statement_type is LetStatement:
+                target = statement.target
+                if type(target) is ArrayAccess:
+                    self.__writes_memory = True
+                    self.__find_expression_effects(target.index)
+                else:
+                    self.__assigned_variables.add((target.kind, target.index))
+                    if target.kind == FIELD_SEGMENT_KEYWORD:
+                        self.__writes_memory = True
+                self.__find_expression_effects(statement.value)
+            elif statement_type is IfStatement:
+                self.__find_expression_effects(statement.condition)
+                self.__find_statements_effects(statement.then_statements)
+                if statement.else_statements is not None:
+                    self.__find_statements_effects(statement.else_statements)
+            elif statement_type is WhileStatement:
+                self.__find_expression_effects(statement.condition)
+                self.__find_statements_effects(statement.statements)
+            elif statement_type is DoStatement:
+                self.__find_expression_effects(statement.call)
+            elif statement_type is ReturnStatement and statement.value is not None:
+                self.__find_expression_effects(statement.value)
+
+    def __find_expression_effects(self, expression):
+        """
+        Records whether an expression calls a subroutine (creating a string constant calls String.new)
+        :param expression: an expression node
+        """
+        if not is_pure(expression):
+            self.__has_calls = True
+
+    def __is_invariant(self, expression):
+        """
+        :param expression: an expression node
+        :return: True iff the expression can be computed once before the loop instead
+        """
+        expression_type = type(expression)
+        if expression_type is IntegerConstant or expression_type is KeywordConstant:
+            return True
+        if expression_type is VariableAccess:
+            if (expression.kind, expression.index) in self.__assigned_variables:
+                return False
+            if expression.kind == FIELD_SEGMENT_KEYWORD:
+                return not self.__writes_memory and not self.__has_calls
+            return expression.kind != STATIC_SEGMENT_KEYWORD or not self.__has_calls
+        if expression_type is BinaryOperation:
+            return expression.op != DIVIDE and self.__is_invariant(expression.left) and \
+                self.__is_invariant(expression.right)
+        if expression_type is UnaryOperation:
+            return self.__is_invariant(expression.operand)
+        return False
+
+    def __hoist_statements(self, statements):
+        """
+        Replaces the invariant expressions in a list of statements of the loop
+        :param statements: a list of statement nodes
+        """
+        for statement in statements:
+            statement_type = type(statement)
+            if statement_type is LetStatement:
+                if type(statement.target) is ArrayAccess:
+                    statement.target = self.__hoist_array_access(statement.target)
+                statement.value = self.__hoist_expression(statement.value)
+            elif statement_type is IfStatement:
+                statement.condition = self.__hoist_expression(statement.condition)
+                self.__hoist_statements(statement.then_statements)
+                if statement.else_statements is not None:
+                    self.__hoist_statements(statement.else_statements)
+            elif statement_type is WhileStatement:
+                statement.condition = self.__hoist_expression(statement.condition)
+                self.__hoist_statements(statement.statements)
+            elif statement_type is DoStatement:
+                statement.call = self.__hoist_expression(statement.call)
+            elif statement_type is ReturnStatement and statement.value is not None:
+                statement.value = self.__hoist_expression(statement.value)
+
+    def __hoist_expression(self, expression):
+        """
+        :param expression: an expression node in the loop
+        :return: the expression node with its invariant subexpressions replaced with hidden local variables
+        """
+        expression_type = type(expression)
+        if expression_type is BinaryOperation:
+            if self.__is_invariant(expression):
+                return self.__get_hidden_local(expression)
+            expression.left = self.__hoist_expression(expression.left)
+            expression.right = self.__hoist_expression(expression.right)
+        elif expression_type is UnaryOperation:
+            if self.__is_invariant(expression):
+                return self.__get_hidden_local(expression)
+            expression.operand = self.__hoist_expression(expression.operand)
+        elif expression_type is ArrayAccess:
+            return self.__hoist_array_access(expression)
+        elif expression_type is SubroutineCall:
+            expression.arguments = [self.__hoist_expression(argument) for argument in expression.arguments]
+        return expression
+
+    def __hoist_array_access(self, access):
+        """
+        :param access: an ArrayAccess node in the loop
+        :return: the access, reading the element's address (or the array's address plus the invariant operand of
+        the index) from a hidden local variable when it is invariant
+        """
+        index = access.index
+        if self.__is_invariant(access.array):
+            if get_constant_value(index) is None and self.__is_invariant(index):
+                return ArrayAccess(self.__get_hidden_local(BinaryOperation(PLUS, access.array, index)),
+                                   IntegerConstant(0))
+            if type(index) is BinaryOperation and index.op == PLUS:
+                # a + (i + j) is (a + i) + j, in the 16-bit arithmetic too
+                if self.__is_invariant(index.left):
+                    return ArrayAccess(self.__get_hidden_local(BinaryOperation(PLUS, access.array, index.left)),
+                                       self.__hoist_expression(index.right))
+                if self.__is_invariant(index.right):
+                    return ArrayAccess(self.__get_hidden_local(BinaryOperation(PLUS, access.array, index.right)),
+                                       self.__hoist_expression(index.left))
+        access.index = self.__hoist_expression(index)
+        return access
+
+    def __get_hidden_local(self, expression):
+        """
+        :param expression: an invariant expression
+        :return: a VariableAccess node of the hidden local variable that holds the value of the expression. The
+        same expression gets the same variable
+        """
+        key = get_expression_key(expression)
+        statement = self.__hoisted_statements.get(key)
+        if statement is None:
+            statement = LetStatement(VariableAccess(VAR_SEGMENT_KEYWORD, self.__subroutine.locals_amount), expression)
+            self.__subroutine.locals_amount += 1
+            self.__hoisted_statements[key] = statement
+        return VariableAccess(VAR_SEGMENT_KEYWORD, statement.target.index)
+
+
+def get_operands(statement):
+    """
+    :param statement: a let, do or return statement node
+    :return: a list of the expressions the statement computes: the index of an assigned array element and the
+    assigned value, the arguments of a call, or the returned value
+    """
+    statement_type = type(statement)
+    if statement_type is LetStatement:
+        if type(statement.target) is ArrayAccess:
+            return [statement.target.index, statement.value]
+        return [statement.value]
+    if statement_type is DoStatement:
+        return list(statement.call.arguments)
+    if statement.value is not None:
+        return [statement.value]
+    return []
+
+
+def set_operands(statement, operands):
+    """
+    Replaces the expressions a statement computes
+    :param statement: a let, do or return statement node
+    :param operands: a list of the new expressions, in the order get_operands returns them
+    """
+    statement_type = type(statement)
+    if statement_type is LetStatement:
+        if type(statement.target) is ArrayAccess:
+            statement.target.index = operands[0]
+        statement.value = operands[-1]
+    elif statement_type is DoStatement:
+        statement.call.arguments = operands
+    elif statement.value is not None:
+        statement.value = operands[0]
+
+
+def get_subexpressions(expression):
+    """
+    :param expression: an expression node
+    :return: a list of the operand expressions of the expression
+    """
+    expression_type = type(expression)
+    if expression_type is BinaryOperation:
+        return [expression.left, expression.right]
+    if expression_type is UnaryOperation:
+        return [expression.operand]
+    if expression_type is ArrayAccess:
+        return [expression.array, expression.index]
+    return []
+
+
+def get_expression_cost(expression):
+    """
+    :param expression: an expression node without side effects
+    :return: the estimated number of vm commands that compute the expression
+    """
+    expression_type = type(expression)
+    cost = 1
+    if expression_type is ArrayAccess:
+        cost = ARRAY_ACCESS_COST
+    elif expression_type is BinaryOperation and expression.op in MATH_OPERATORS:
+        cost += MATH_CALL_COST
+    return cost + sum(get_expression_cost(operand) for operand in get_subexpressions(expression))
+
+
+def count_subexpressions(expression, counts, amount=1):
+    """
+    Adds the occurrences of the operations in an expression to their counts
+    :param expression: an expression node without side effects
+    :param counts: a dictionary from the key of each operation (see get_expression_key) to its number of occurrences
+    :param amount: the number to add for each occurrence (negative to remove occurrences)
+    """
+    if type(expression) is BinaryOperation or type(expression) is UnaryOperation:
+        key = get_expression_key(expression)
+        counts[key] = counts.get(key, 0) + amount
+    for operand in get_subexpressions(expression):
+        count_subexpressions(operand, counts, amount)
+
+
+class SubexpressionMerger:
+    """
+    Replaces the operations that a statement computes several times with a hidden local variable, which is
+    computed once before the statement. Only a let, do or return statement whose expressions have no side effects
+    (apart from the call of a do statement) is merged, so nothing the expressions read can change while they are
+    computed, and computing them before the statement is the same as computing them in it. The conditions of if
+    and while statements are not merged, since parts of a condition may be skipped.
+    An operation is merged when computing it once and reading it from the variable costs fewer commands. A single
+    array element read twice is not merged, since the code generator reuses its address for the second read.
+    """
+    def __init__(self, statement, subroutine):
+        """
+        :param statement: a statement node
+        :param subroutine: the Subroutine node of the statement, which gets the hidden local variables
+        """
+        self.__statement = statement
+        self.__subroutine = subroutine
+        self.__merged_keys = set()  # the keys of the merged operations (see get_expression_key)
+        self.__hidden_locals = {}  # the index of the hidden local variable of each merged operation, by its key
+        self.__merged_statements = []
+
+    def merge(self):
+        """
+        Merges the common operations of the statement
+        :return: a list of the statements that compute the hidden local variables, to be placed before the statement
+        """
+        if type(self.__statement) not in (LetStatement, DoStatement, ReturnStatement):
+            return []
+        operands = get_operands(self.__statement)
+        if not all(is_pure(operand) for operand in operands):
+            return []
+        self.__find_merged_keys(operands)
+        if self.__merged_keys:
+            set_operands(self.__statement, [self.__merge_expression(operand) for operand in operands])
+        return self.__merged_statements
+
+    def __find_merged_keys(self, operands):
+        """
+        Decides which operations to merge. The larger operations are decided first: when an operation is merged,
+        the operations inside its other occurrences are not computed any more
+        :param operands: a list of the expressions the statement computes
+        """
+        counts = {}
+        operations = {}  # an operation of each key
+        for operand in operands:
+            count_subexpressions(operand, counts)
+        pending_expressions = list(operands)
+        while pending_expressions:
+            expression = pending_expressions.pop()
+            if type(expression) is BinaryOperation or type(expression) is UnaryOperation:
+                operations.setdefault(get_expression_key(expression), expression)
+            pending_expressions.extend(get_subexpressions(expression))
+
+        for key in sorted(operations, key=lambda operation_key: -get_expression_cost(operations[operation_key])):
+            occurrences = counts[key]
+            if occurrences > 1 and (occurrences - 1) * get_expression_cost(operations[key]) > occurrences + 1:
+                self.__merged_keys.add(key)
+                for operand in get_subexpressions(operations[key]):
+                    count_subexpressions(operand, counts, 1 - occurrences)
+
+    def __merge_expression(self, expression):
+        """
+        :param expression: an expression node of the statement
+        :return: the expression with the merged operations replaced with their hidden local variables
+        """
+        expression_type = type(expression)
+        if expression_type is ArrayAccess:
+            expression.index = self.__merge_expression(expression.index)
+            return expression
+        if expression_type is not BinaryOperation and expression_type is not UnaryOperation:
+            return expression
+
+        key = get_expression_key(expression)
+        if key in self.__hidden_locals:
+            return VariableAccess(VAR_SEGMENT_KEYWORD, self.__hidden_locals[key])
+        if expression_type is BinaryOperation:
+            expression.left = self.__merge_expression(expression.left)
+            expression.right = self.__merge_expression(expression.right)
+        else:
+            expression.operand = self.__merge_expression(expression.operand)
+        if key not in self.__merged_keys:
+            return expression
+        # the operations inside were merged first, so their statements come first
+        self.__hidden_locals[key] = self.__subroutine.locals_amount
+        self.__subroutine.locals_amount += 1
+        self.__merged_statements.append(LetStatement(VariableAccess(VAR_SEGMENT_KEYWORD, self.__hidden_locals[key]),
+                                                     expression))
+        return VariableAccess(VAR_SEGMENT_KEYWORD, self.__hidden_locals[key])
+
+
+def to_word(value):
+    """
+    :param value: an integer
+    :return: the value wrapped into a signed 16-bit word
+    """
+    value &= WORD_MASK
+    if value & SIGN_BIT:
+        return value - (1 << WORD_BITS)
+    return value
+
+
+def get_constant_value(expression):
+    """
+    :param expression: an expression node
+    :return: the value of the expression if it is a constant, or None otherwise
+    """
+    if type(expression) is IntegerConstant:
+        return expression.value
+    if type(expression) is KeywordConstant:
+        return KEYWORD_VALUES.get(expression.keyword)
+    return None
+
+
+def is_pure(expression):
+    """
+    :param expression: an expression node
+    :return: True iff evaluating the expression has no side effects, so it can be dropped or evaluated once
+    instead of twice. Calls may have side effects, and string constants allocate a new string
+    """
+    expression_type = type(expression)
+    if expression_type is SubroutineCall or expression_type is StringConstant:
+        return False
+    if expression_type is BinaryOperation:
+        return is_pure(expression.left) and is_pure(expression.right)
+    if expression_type is UnaryOperation:
+        return is_pure(expression.operand)
+    if expression_type is ArrayAccess:
+        return is_pure(expression.index)
+    return True
+
+
+def get_expression_key(expression):
+    """
+    :param expression: an expression node without side effects (see is_pure)
+    :return: a hashable key of the expression. Two expressions have the same key iff they are written the same,
+    so they have the same value as long as no variable and no memory word they read is assigned in between
+    """
+    expression_type = type(expression)
+    if expression_type is BinaryOperation:
+        return BinaryOperation, expression.op, get_expression_key(expression.left), \
+            get_expression_key(expression.right)
+    if expression_type is UnaryOperation:
+        return UnaryOperation, expression.op, get_expression_key(expression.operand)
+    if expression_type is ArrayAccess:
+        return ArrayAccess, get_expression_key(expression.array), get_expression_key(expression.index)
+    if expression_type is VariableAccess:
+        return VariableAccess, expression.kind, expression.index
+    if expression_type is IntegerConstant:
+        return IntegerConstant, expression.value
+    return KeywordConstant, expression.keyword
+
+
+def is_boolean(expression):
+    """
+    :param expression: an expression node
+    :return: True iff the value of the expression is known to be true (-1) or false (0)
+    """
+    expression_type = type(expression)
+    if expression_type is BinaryOperation:
+        if expression.op in COMPARISON_OPERATORS:
+            return True
+        return expression.op in (AND, OR) and is_boolean(expression.left) and is_boolean(expression.right)
+    if expression_type is UnaryOperation:
+        return expression.op == NOT and is_boolean(expression.operand)
+    return get_constant_value(expression) in (TRUE_VALUE, FALSE_VALUE)
+
+
+def fold_expression(expression):
+    """
+    Folds the constant subexpressions of an expression, and simplifies it with algebraic identities
+    :param expression: an expression node
+    :return: the folded expression node
+    """
+    expression_type = type(expression)
+    if expression_type is BinaryOperation:
+        expression.left = fold_expression(expression.left)
+        expression.right = fold_expression(expression.right)
+        return fold_binary_operation(expression)
+    if expression_type is UnaryOperation:
+        expression.operand = fold_expression(expression.operand)
+        return fold_unary_operation(expression)
+    if expression_type is ArrayAccess:
+        expression.index = fold_expression(expression.index)
+    elif expression_type is SubroutineCall:
+        expression.arguments = [fold_expression(argument) for argument in expression.arguments]
+    return expression
+
+
+def fold_unary_operation(expression):
+    """
+    :param expression: a UnaryOperation node whose operand is already folded
+    :return: the folded expression node
+    """
+    value = get_constant_value(expression.operand)
+    if value is not None:
+        return IntegerConstant(to_word(UNARY_FOLDS[expression.op](value)))
+    operand = expression.operand
+    if type(operand) is UnaryOperation and operand.op == expression.op:
+        return operand.operand  # --x and ~~x are x
+    return expression
+
+
+def fold_binary_operation(expression):
+    """
+    :param expression: a BinaryOperation node whose operands are already folded
+    :return: the folded expression node
+    """
+    op = expression.op
+    left = expression.left
+    right = expression.right
+    left_value = get_constant_value(left)
+    right_value = get_constant_value(right)
+
+    if left_value is not None and right_value is not None:
+        if op in BINARY_FOLDS:
+            return IntegerConstant(to_word(BINARY_FOLDS[op](left_value, right_value)))
+        # Math.divide truncates towards zero. Division by zero is left for the program to report, and the
+        # overflowing -32768 is left to the runtime
+        if right_value != 0 and MIN_VALUE not in (left_value, right_value):
+            quotient = abs(left_value) // abs(right_value)
+            return IntegerConstant(quotient if (left_value < 0) == (right_value < 0) else -quotient)
+        return expression
+
+    # moves a constant left operand of a commutative operator to the right, so the rules below cover both sides
+    if left_value is not None and op in ASSOCIATIVE_OPERATORS:
+        left, right = right, left
+        right_value = left_value
+        expression = BinaryOperation(op, left, right)
+    elif left_value is not None:
+        if op == MINUS and left_value == 0:
+            return UnaryOperation(MINUS, right)  # 0 - x is -x
+        return expression
+
+    if right_value is None:
+        return expression
+
+    # (x op c1) op c2 is x op (c1 op c2)
+    if op in ASSOCIATIVE_OPERATORS and type(left) is BinaryOperation and left.op == op:
+        inner_value = get_constant_value(left.right)
+        if inner_value is not None:
+            return fold_binary_operation(BinaryOperation(op, left.left,
+                                                         IntegerConstant(to_word(BINARY_FOLDS[op](inner_value,
+                                                                                                  right_value)))))
+
+    if op in (PLUS, MINUS):
+        if right_value == 0:
+            return left  # x + 0 and x - 0 are x
+        if right_value < 0 and right_value != MIN_VALUE:
+            # x + -c is x - c, and x - -c is x + c, which save the negation of the constant
+            return BinaryOperation(MINUS if op == PLUS else PLUS, left, IntegerConstant(-right_value))
+    elif op == MULTIPLY:
+        if right_value == 1:
+            return left
+        if right_value == TRUE_VALUE:
+            return UnaryOperation(MINUS, left)
+        if right_value == 0 and is_pure(left):
+            return IntegerConstant(0)
+    elif op == DIVIDE:
+        if right_value == 1:
+            return left
+    elif op == AND:
+        if right_value == TRUE_VALUE:
+            return left
+        if right_value == 0 and is_pure(left):
+            return IntegerConstant(0)
+    elif op == OR:
+        if right_value == 0:
+            return left
+        if right_value == TRUE_VALUE and is_pure(left):
+            return IntegerConstant(TRUE_VALUE)
+    return expression
@@ -0,0 +1,203 @@
+###########
+# imports #
+###########
+import sys
+import io
+import time
+
+from JackTokenizer import JackTokenizer
+from CompilationEngine import CompilationEngine
+import JackCompiler
+from CodeGenerator import LOOP_ROTATION
+from Linker import split_commands
+from VMInterpreter import VMInterpreter
+
+#############
+# constants #
+#############
+NUM_SUBROUTINES_POS = 1  # the arguments position for the number of generated subroutines
+DEFAULT_NUM_SUBROUTINES = 2000
+DEFAULT_REPEATS = 3
+BENCHMARK_CLASS_NAME = "Bench"
+AST_MODE_LABEL = " (ast)"
+LOOP_ITERATIONS = 100
+LOOP_CLASS = """
+class Loops {
+    function int run(int n) {
+        var int i, j, sum;
+        let i = 0;
+        let sum = 0;
+        while (i < n) {
+            let j = 0;
+            while (j < 10) {
+                if ((j & 1) = 0) {
+                    let sum = sum + j;
+                } else {
+                    let sum = sum - 1;
+                }
+                let j = j + 1;
+            }
+            let i = i + 1;
+        }
+        return sum;
+    }
+}
+"""
+# the configurations of the loop benchmark: a name and the optimizations
+LOOP_CONFIGURATIONS = (("-O 0", JackCompiler.get_optimizations(0)),
+                       ("-O 1 without loop rotation", JackCompiler.get_optimizations(1, disabled=[LOOP_ROTATION])),
+                       ("-O 1", JackCompiler.get_optimizations(1)))
+LOOP_CLASS_NAME = "Loops"
+LOOP_FUNCTION = "Loops.run"
+SUBROUTINE_TEMPLATE = """
+    /** generated subroutine number {index} */
+    method int compute{index}(int a, Array b) {{
+        var int i, sum;
+        var String s;
+        let i = 0;
+        let sum = {index};
+        // sums the array and mixes in the field values
+        while (i < a) {{
+            let sum = sum + (b[i] * {index}) - (x / 2);
+            if ((sum > 1000) & ~(i = 3)) {{
+                let sum = sum - y;
+            }} else {{
+                let b[i] = sum;
+            }}
+            let i = i + 1;
+        }}
+        let s = "generated string constant {index}";
+        do Output.printString(s);
+        do Output.printInt(Math.max(sum, -1));
+        return sum;
+    }}
+"""
+
+
+def generate_class(num_subroutines, class_name=BENCHMARK_CLASS_NAME):
+    """
+    Generates the source of a large jack class, to be used as a benchmark input
+    :param num_subroutines: the number of subroutines the class contains
+    :param class_name: the name of the generated class
+    :return: the jack source of the class
+    """
+    parts = ["class " + class_name + " {\n    field int x, y;\n    static int total;\n"]
+    for index in range(num_subroutines):
+        parts.append(SUBROUTINE_TEMPLATE.format(index=index))
+    parts.append("}\n")
+    return "".join(parts)
+
+
+def best_time(function, repeats=DEFAULT_REPEATS):
+    """
+    Runs the given function several times
+    :param function: a function without arguments
+    :param repeats: the number of runs
+    :return: the best running time in seconds and the value returned by the function
+    """
+    best = None
+    result = None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = function()
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best, result
+
+
+class CountingStream(io.StringIO):
+    """
+    A text stream that counts the write calls made to it
+    """
+    def __init__(self):
+        """
+        Creates an empty stream
+        """
+        super().__init__()
+        self.write_calls = 0
+
+    def write(self, text):
+        """
+        Writes the text and counts the call
+        :param text: the text to write
+        :return: the number of characters written
+        """
+        self.write_calls += 1
+        return super().write(text)
+
+
+def count_tokens(source):
+    """
+    Tokenizes the given source
+    :param source: a jack source
+    :return: the number of tokens in the source
+    """
+    tokenizer = JackTokenizer(io.StringIO(source))
+    tokens_amount = 0
+    while tokenizer.has_more_tokens():
+        tokenizer.advance()
+        tokens_amount += 1
+    return tokens_amount
+
+
+def benchmark_tokenizer(source):
+    """
+    Measures the tokenizer speed over the given source and prints the result
+    :param source: a jack source
+    """
+    elapsed, tokens_amount = best_time(lambda: count_tokens(source))
+    print("tokenizer: %d tokens in %.3f sec (%.0f tokens/sec)" % (tokens_amount, elapsed, tokens_amount / elapsed))
+
+
+def compile_source(source, use_ast=False):
+    """
+    Compiles the given source
+    :param source: a jack source
+    :param use_ast: whether or not to compile through the abstract syntax tree
+    :return: the output stream the vm code was written into
+    """
+    output = CountingStream()
+    CompilationEngine(io.StringIO(source), output, use_ast=use_ast).compile()
+    return output
+
+
+def benchmark_compiler(source, use_ast=False):
+    """
+    Measures the full compilation time of the given source and prints the result, with the number of
+    write calls made to the output stream
+    :param source: a jack source
+    :param use_ast: whether or not to compile through the abstract syntax tree
+    """
+    elapsed, output = best_time(lambda: compile_source(source, use_ast))
+    print("compiler%s: %.3f sec, %d write calls, %d bytes of vm code" % (AST_MODE_LABEL if use_ast else "", elapsed,
+                                                                        output.write_calls, len(output.getvalue())))
+
+
+def benchmark_loops():
+    """
+    Runs a loop-heavy function compiled with several optimization configurations, and prints the number of vm
+    commands and jumps each of them executes
+    """
+    for name, optimizations in LOOP_CONFIGURATIONS:
+        vm_code = JackCompiler.compile_source(LOOP_CLASS, None, JackCompiler.get_build_options(
+            optimizations=optimizations))
+        interpreter = VMInterpreter()
+        interpreter.load_class(LOOP_CLASS_NAME, split_commands(vm_code))
+        result = interpreter.call_function(LOOP_FUNCTION, [LOOP_ITERATIONS])
+        print("loops (%s): %d vm commands executed, %d of them jumps (result %d)" % (
+            name, interpreter.get_executed_commands(), interpreter.get_executed_jumps(), result))
+
+
+# main part
+if __name__ == '__main__':
+    num_subroutines = DEFAULT_NUM_SUBROUTINES
+    if len(sys.argv) > NUM_SUBROUTINES_POS:
+        num_subroutines = int(sys.argv[NUM_SUBROUTINES_POS])
+
+    benchmark_source = generate_class(num_subroutines)
+    print("source: %d subroutines, %d bytes" % (num_subroutines, len(benchmark_source)))
+    benchmark_tokenizer(benchmark_source)
+    benchmark_compiler(benchmark_source)
+    benchmark_compiler(benchmark_source, use_ast=True)
+    benchmark_loops()
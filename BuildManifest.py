@@ -0,0 +1,124 @@
+import os
+import json
+import hashlib
+
+MANIFEST_FILE_NAME = ".jackbuild"
+VERSION_KEY = "version"
+OPTIONS_KEY = "options"
+FILES_KEY = "files"
+HASH_KEY = "hash"
+MTIME_KEY = "mtime"
+SIZE_KEY = "size"
+
+
+class BuildManifest:
+    """
+    The build manifest of a directory. Records for each jack file in the directory the hash of the source that was
+    compiled, together with the compiler version and the options used, so files whose inputs didn't change can be
+    skipped on the next build.
+    """
+    def __init__(self, directory, version, options):
+        """
+        Loads the manifest of the given directory. Entries recorded by another compiler version or with other
+        options are dropped.
+        :param directory: the directory of the jack files
+        :param version: the version of the compiler
+        :param options: a dictionary of the options that affect the compiler output
+        """
+        self.__path = os.path.join(directory, MANIFEST_FILE_NAME)
+        self.__version = version
+        self.__options = options
+        self.__files = {}
+        self.__is_modified = False
+
+        try:
+            with open(self.__path) as manifest_file:
+                content = json.load(manifest_file)
+        except (OSError, ValueError):
+            return  # no manifest yet (or a broken one) - every file is out of date
+        if content.get(VERSION_KEY) == version and content.get(OPTIONS_KEY) == options:
+            self.__files = content.get(FILES_KEY, {})
+
+    def get_path(self):
+        """
+        :return: the path of the manifest file
+        """
+        return self.__path
+
+    def is_modified(self):
+        """
+        :return: True iff the manifest changed since it was loaded and should be saved
+        """
+        return self.__is_modified
+
+    def get_entry(self, jack_file):
+        """
+        :param jack_file: the path of a jack file in the directory
+        :return: the recorded entry of the file (a dictionary), or None if there is none
+        """
+        return self.__files.get(os.path.basename(jack_file))
+
+    def is_up_to_date(self, jack_file, output_file):
+        """
+        Checks if the jack file has to be compiled again. The size and modification time of the source are checked
+        first, and the source is hashed only if they changed.
+        :param jack_file: the path of a jack file in the directory
+        :param output_file: the path of the output file of the jack file
+        :return: True iff the source didn't change since it was compiled, and the output file exists
+        """
+        entry = self.get_entry(jack_file)
+        if entry is None or not os.path.exists(output_file):
+            return False
+        try:
+            source_stat = os.stat(jack_file)
+        except OSError:
+            return False
+        if entry[MTIME_KEY] == source_stat.st_mtime_ns and entry[SIZE_KEY] == source_stat.st_size:
+            return True
+
+        # the file was touched - checks its content
+        with open(jack_file, "rb") as input_file:
+            source_hash = hash_source(input_file.read())
+        if source_hash != entry[HASH_KEY]:
+            return False
+        entry[MTIME_KEY] = source_stat.st_mtime_ns
+        entry[SIZE_KEY] = source_stat.st_size
+        self.__is_modified = True
+        return True
+
+    def record(self, jack_file, source_hash, mtime, size, **details):
+        """
+        Records that the jack file was compiled successfully
+        :param jack_file: the path of a jack file in the directory
+        :param source_hash: the hash of the compiled source
+        :param mtime: the modification time of the compiled source, in nanoseconds
+        :param size: the size of the compiled source
+        :param details: additional details to keep for the file
+        """
+        entry = {HASH_KEY: source_hash, MTIME_KEY: mtime, SIZE_KEY: size}
+        entry.update(details)
+        self.__files[os.path.basename(jack_file)] = entry
+        self.__is_modified = True
+
+    def forget(self, jack_file):
+        """
+        Removes the entry of the jack file, so it is compiled on the next build
+        :param jack_file: the path of a jack file in the directory
+        """
+        if self.__files.pop(os.path.basename(jack_file), None) is not None:
+            self.__is_modified = True
+
+    def dumps(self):
+        """
+        :return: the content of the manifest file
+        """
+        return json.dumps({VERSION_KEY: self.__version, OPTIONS_KEY: self.__options, FILES_KEY: self.__files},
+                          sort_keys=True)
+
+
+def hash_source(source):
+    """
+    :param source: the bytes of a source file
+    :return: the hex digest of the source
+    """
+    return hashlib.sha1(source).hexdigest()
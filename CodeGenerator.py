@@ -0,0 +1,602 @@
+from JackAST import LetStatement, IfStatement, WhileStatement, DoStatement, ReturnStatement, IntegerConstant, \
+    StringConstant, KeywordConstant, VariableAccess, ArrayAccess, UnaryOperation, BinaryOperation, SubroutineCall
+from VMWriter import CONSTANT_SEGMENT, POINTER_SEGMENT, TEMP_SEGMENT, THAT_SEGMENT
+from SymbolTable import ARG_SEGMENT_KEYWORD
+from StringPool import get_pool_class_name, get_pool_function, escape_string, write_string_construction
+from ASTOptimizer import get_constant_value, get_expression_key, is_pure, is_boolean, TRUE_VALUE, FALSE_VALUE
+
+# the names of the optimizations
+STRENGTH_REDUCTION = "strength-reduction"
+BRANCH_CONDITIONS = "branch-conditions"
+LOOP_ROTATION = "loop-rotation"
+ARRAY_ACCESS = "array-access"
+
+CONSTRUCTOR_KIND = "constructor"
+METHOD_KIND = "method"
+THIS_CONSTANT = "this"
+TRUE_CONSTANT = "true"
+THIS_POINTER_INDEX = 0
+THAT_POINTER_INDEX = 1
+ALLOC_FUNCTION = "Memory.alloc"
+ALLOC_ARGS_NUM = 1
+MINUS = "-"
+PLUS = "+"
+NOT_OPERATOR = "~"
+AND_OPERATOR = "&"
+OR_OPERATOR = "|"
+EQUAL_OPERATOR = "="
+LESS_OPERATOR = "<"
+GREATER_OPERATOR = ">"
+COMPARISON_OPERATORS = (EQUAL_OPERATOR, LESS_OPERATOR, GREATER_OPERATOR)
+MAX_CONSTANT = 32767
+MIN_CONSTANT = -32768
+MULTIPLY = "*"
+DIVIDE = "/"
+# the temp registers of a multiplication by a constant: the multiplied value and the partial product
+MULTIPLICAND_TEMP_INDEX = 1
+PRODUCT_TEMP_INDEX = 2
+# the longest sequence of vm commands that replaces a multiplication by a constant. A Math.multiply call runs a
+# loop over the 16 bits of the word, which costs far more Hack instructions than this many vm commands
+MAX_MULTIPLY_COMMANDS = 64
+FIRST_DOUBLING_COST = 2  # push x, add
+DOUBLING_COST = 4  # pop p, push p, push p, add
+ADDITION_COST = 2  # push x, add
+SET_BIT = "1"
+
+
+class CodeGenerator:
+    """
+    Writes the vm code of a subroutine's abstract syntax tree (see JackAST) using a VMWriter.
+    The code is the same as the code the compilation engine writes while parsing.
+    """
+    def __init__(self, writer, optimizations=frozenset()):
+        """
+        Creates a code generator
+        :param writer: the VMWriter to write the code with
+        :param optimizations: a set of the names of the enabled optimizations
+        """
+        self.__writer = writer
+        self.__label_counter = 0
+        self.__optimizations = optimizations
+        self.__pool_class_name = None  # the class of the pool of the string constants, None if they are not pooled
+        self.__strength_reduction = STRENGTH_REDUCTION in optimizations
+        self.__branch_conditions = BRANCH_CONDITIONS in optimizations
+        self.__loop_rotation = LOOP_ROTATION in optimizations
+        self.__array_access = ARRAY_ACCESS in optimizations
+        # the key of the address in pointer 1 (see get_pointer_key), or None if it isn't known
+        self.__that_key = None
+        # the method that writes each kind of node
+        self.__statement_writers = {LetStatement: self.__write_let, IfStatement: self.__write_if,
+                                    WhileStatement: self.__write_while, DoStatement: self.__write_do,
+                                    ReturnStatement: self.__write_return}
+        self.__expression_writers = {IntegerConstant: self.__write_integer_constant,
+                                     StringConstant: self.__write_string_constant,
+                                     KeywordConstant: self.__write_keyword_constant,
+                                     VariableAccess: self.__write_variable, ArrayAccess: self.__write_array_access,
+                                     UnaryOperation: self.__write_unary_operation,
+                                     BinaryOperation: self.__write_binary_operation,
+                                     SubroutineCall: self.__write_call}
+
+    def generate(self, subroutine, first_label):
+        """
+        Writes the code of the given subroutine
+        :param subroutine: a Subroutine node
+        :param first_label: the number of the first label to use
+        :return: the number of the label that follows the labels the subroutine used
+        """
+        self.__label_counter = first_label
+        self.__pool_class_name = get_pool_class_name(subroutine.class_name, self.__optimizations)
+        self.__writer.write_function(subroutine.class_name, subroutine.name, subroutine.locals_amount)
+        if subroutine.kind == CONSTRUCTOR_KIND:
+            # creates the object
+            self.__writer.write_push(CONSTANT_SEGMENT, subroutine.fields_amount)
+            self.__writer.write_call(ALLOC_FUNCTION, ALLOC_ARGS_NUM)
+            self.__writer.write_pop(POINTER_SEGMENT, THIS_POINTER_INDEX)
+        elif subroutine.kind == METHOD_KIND:
+            # this is the first argument of a method
+            self.__writer.write_push(ARG_SEGMENT_KEYWORD, 0)
+            self.__writer.write_pop(POINTER_SEGMENT, THIS_POINTER_INDEX)
+        self.__write_statements(subroutine.statements)
+        return self.__label_counter
+
+    def __new_label(self):
+        """
+        :return: the number of a new label
+        """
+        label = self.__label_counter
+        self.__label_counter += 1
+        return label
+
+    def __write_statements(self, statements):
+        """
+        Writes the code of a list of statements
+        :param statements: a list of statement nodes
+        """
+        for statement in statements:
+            self.__that_key = None  # the that pointer is reused only within a statement
+            self.__statement_writers[type(statement)](statement)
+
+    def __write_label(self, label):
+        """
+        Writes a label. The code after the label may be jumped to with any address in pointer 1
+        :param label: the number of the label
+        """
+        self.__that_key = None
+        self.__writer.write_label(label)
+
+    def __write_let(self, statement):
+        """
+        Writes the code of a let statement
+        :param statement: a LetStatement node
+        """
+        target = statement.target
+        if type(target) is ArrayAccess and self.__array_access:
+            self.__write_array_assignment(statement)
+        elif type(target) is ArrayAccess:
+            self.__write_element_address(target)
+            self.__write_expression(statement.value)
+            # assigns the value through the that segment
+            self.__writer.write_pop(TEMP_SEGMENT, 0)
+            self.__writer.write_pop(POINTER_SEGMENT, THAT_POINTER_INDEX)
+            self.__writer.write_push(TEMP_SEGMENT, 0)
+            self.__writer.write_pop(THAT_SEGMENT, 0)
+        else:
+            self.__write_expression(statement.value)
+            self.__writer.write_pop(target.kind, target.index)
+
+    def __write_array_assignment(self, statement):
+        """
+        Writes the code of a let statement that assigns an array element, with the address of the element set in
+        pointer 1 before the value is computed, unless computing the value sets pointer 1 too. Then the value is
+        computed first if both the value and the index have no side effects, and is kept in temp 0 otherwise.
+        :param statement: a LetStatement node whose target is an ArrayAccess node
+        """
+        target = statement.target
+        if not writes_that_pointer(statement.value, get_pointer_key(target)):
+            offset = self.__write_that_pointer(target)
+            self.__write_expression(statement.value)
+        elif is_pure(target.index) and is_pure(statement.value):
+            self.__write_expression(statement.value)
+            offset = self.__write_that_pointer(target)
+        else:
+            offset = get_element_offset(target)
+            self.__write_variable(target.array)
+            if offset is None:
+                self.__write_expression(target.index)
+                self.__writer.write_arithmetic(PLUS)
+                offset = 0
+            self.__write_expression(statement.value)
+            self.__writer.write_pop(TEMP_SEGMENT, 0)
+            self.__writer.write_pop(POINTER_SEGMENT, THAT_POINTER_INDEX)
+            self.__writer.write_push(TEMP_SEGMENT, 0)
+            self.__that_key = None
+        self.__writer.write_pop(THAT_SEGMENT, offset)
+
+    def __write_if(self, statement):
+        """
+        Writes the code of an if statement
+        :param statement: an IfStatement node
+        """
+        else_label = self.__new_label()
+        self.__write_condition(statement.condition, else_label)  # if the condition is false, goto the else label
+        self.__write_statements(statement.then_statements)
+        end_if_label = self.__new_label()
+        self.__writer.write_goto(end_if_label)
+        self.__write_label(else_label)
+        if statement.else_statements is not None:
+            self.__write_statements(statement.else_statements)
+        self.__write_label(end_if_label)
+
+    def __write_while(self, statement):
+        """
+        Writes the code of a while statement
+        :param statement: a WhileStatement node
+        """
+        # without branch conditions, testing that a value which may not be a boolean is true costs more commands
+        # than the jump that rotation saves
+        if self.__loop_rotation and (self.__branch_conditions or is_boolean(statement.condition)):
+            self.__write_rotated_while(statement)
+            return
+        start_loop_label = self.__new_label()
+        self.__write_label(start_loop_label)
+        end_loop_label = self.__new_label()
+        self.__write_condition(statement.condition, end_loop_label)  # if the condition is false, goto the end
+        self.__write_statements(statement.statements)
+        self.__writer.write_goto(start_loop_label)
+        self.__write_label(end_loop_label)
+
+    def __write_rotated_while(self, statement):
+        """
+        Writes the code of a while statement with the condition at the bottom of the loop: the loop is entered with
+        a jump to the condition, and each iteration ends with a single conditional jump back to the body
+        :param statement: a WhileStatement node
+        """
+        body_label = self.__new_label()
+        condition_label = self.__new_label()
+        self.__writer.write_goto(condition_label)
+        self.__write_label(body_label)
+        self.__write_statements(statement.statements)
+        self.__write_label(condition_label)
+        if self.__branch_conditions:
+            self.__write_branch(statement.condition, body_label, True)
+        else:
+            self.__write_jump(statement.condition, body_label, True)
+
+    def __write_condition(self, condition, false_label):
+        """
+        Writes the code that jumps to the given label unless the condition is true. A condition is true only if its
+        value is -1 (true), as in the code that computes the value and tests it with not and if-goto.
+        :param condition: the condition expression node
+        :param false_label: the number of the label to jump to when the condition isn't true
+        """
+        if self.__branch_conditions:
+            self.__write_branch(condition, false_label, False)
+            return
+        self.__write_expression(condition)
+        self.__writer.write_arithmetic(NOT_OPERATOR, True)
+        self.__writer.write_if(false_label)
+
+    def __write_branch(self, condition, label, jump_if_true):
+        """
+        Writes the code that jumps to the given label if the condition is true (or if it isn't), and continues to
+        the next command otherwise. Comparisons jump directly on their result, and the operands of &, | and ~ are
+        tested one by one, skipping the right operand of & and | when the left one decides the condition - if the
+        right operand has no side effects.
+        :param condition: the condition expression node
+        :param label: the number of the label to jump to
+        :param jump_if_true: whether to jump when the condition is true or when it isn't
+        """
+        condition_type = type(condition)
+        value = get_constant_value(condition)
+        if value is not None:
+            # a constant condition jumps always or never
+            if (value == TRUE_VALUE) == jump_if_true:
+                self.__writer.write_goto(label)
+            return
+
+        if condition_type is BinaryOperation and condition.op in COMPARISON_OPERATORS:
+            self.__write_expression(condition.left)
+            self.__write_expression(condition.right)
+            if condition.op == EQUAL_OPERATOR and not jump_if_true:
+                # x != y is x - y != 0, and if-goto jumps on any value but 0
+                self.__writer.write_arithmetic(MINUS)
+            else:
+                self.__writer.write_arithmetic(condition.op)
+                if not jump_if_true:
+                    self.__writer.write_arithmetic(NOT_OPERATOR, True)
+            self.__writer.write_if(label)
+            return
+
+        if condition_type is BinaryOperation and is_pure(condition.right) and \
+                (condition.op == AND_OPERATOR or (condition.op == OR_OPERATOR and is_boolean(condition))):
+            # x & y is true iff both operands are true. x | y is true iff either is true, when both are booleans
+            if (condition.op == AND_OPERATOR) != jump_if_true:
+                # each of the operands decides the jump
+                self.__write_branch(condition.left, label, jump_if_true)
+                self.__write_branch(condition.right, label, jump_if_true)
+            else:
+                # the left operand may decide not to jump
+                skip_label = self.__new_label()
+                self.__write_branch(condition.left, skip_label, not jump_if_true)
+                self.__write_branch(condition.right, label, jump_if_true)
+                self.__write_label(skip_label)
+            return
+
+        if condition_type is UnaryOperation and condition.op == NOT_OPERATOR:
+            # ~x is true iff x is 0
+            if not jump_if_true:
+                self.__write_expression(condition.operand)
+                self.__writer.write_if(label)
+                return
+            if is_boolean(condition.operand):
+                self.__write_branch(condition.operand, label, False)
+                return
+
+        self.__write_jump(condition, label, jump_if_true)
+
+    def __write_jump(self, condition, label, jump_if_true):
+        """
+        Writes the code that computes the value of the condition, and jumps to the given label if the condition is
+        true (or if it isn't)
+        :param condition: the condition expression node
+        :param label: the number of the label to jump to
+        :param jump_if_true: whether to jump when the condition is true or when it isn't
+        """
+        self.__write_expression(condition)
+        if jump_if_true and is_boolean(condition):
+            self.__writer.write_if(label)
+            return
+        self.__writer.write_arithmetic(NOT_OPERATOR, True)
+        if jump_if_true:
+            # jumps if not x is 0
+            self.__writer.write_push(CONSTANT_SEGMENT, FALSE_VALUE)
+            self.__writer.write_arithmetic(EQUAL_OPERATOR)
+        self.__writer.write_if(label)
+
+    def __write_do(self, statement):
+        """
+        Writes the code of a do statement
+        :param statement: a DoStatement node
+        """
+        self.__write_call(statement.call)
+        self.__writer.write_pop(TEMP_SEGMENT, 0)  # drops the returned value
+
+    def __write_return(self, statement):
+        """
+        Writes the code of a return statement
+        :param statement: a ReturnStatement node
+        """
+        if statement.value is None:
+            self.__writer.write_push(CONSTANT_SEGMENT, 0)  # a junk return value
+        else:
+            self.__write_expression(statement.value)
+        self.__writer.write_return()
+
+    def __write_expression(self, expression):
+        """
+        Writes the code that pushes the value of an expression
+        :param expression: an expression node
+        """
+        self.__expression_writers[type(expression)](expression)
+
+    def __write_integer_constant(self, expression):
+        """
+        :param expression: an IntegerConstant node. Folded constants may be negative
+        """
+        value = expression.value
+        if value >= 0:
+            self.__writer.write_push(CONSTANT_SEGMENT, value)
+        elif value == MIN_CONSTANT:
+            # 32768 can't be pushed, but -32768 is ~32767
+            self.__writer.write_push(CONSTANT_SEGMENT, MAX_CONSTANT)
+            self.__writer.write_arithmetic(NOT_OPERATOR, True)
+        else:
+            self.__writer.write_push(CONSTANT_SEGMENT, -value)
+            self.__writer.write_arithmetic(MINUS, True)
+
+    def __write_string_constant(self, expression):
+        """
+        Writes the code that creates a string object with the characters of the constant, or that gets it from the
+        string pool
+        :param expression: a StringConstant node
+        """
+        if self.__pool_class_name is not None:
+            self.__writer.write_call(get_pool_function(self.__pool_class_name, expression.value), 0)
+        else:
+            write_string_construction(self.__writer, escape_string(expression.value))
+        self.__that_key = None  # the called functions may assign the variables of the address
+
+    def __write_keyword_constant(self, expression):
+        """
+        :param expression: a KeywordConstant node
+        """
+        if expression.keyword == THIS_CONSTANT:
+            self.__writer.write_push(POINTER_SEGMENT, THIS_POINTER_INDEX)
+        elif expression.keyword == TRUE_CONSTANT:  # -1
+            self.__writer.write_push(CONSTANT_SEGMENT, 1)
+            self.__writer.write_arithmetic(MINUS, True)
+        else:  # false and null are 0
+            self.__writer.write_push(CONSTANT_SEGMENT, 0)
+
+    def __write_variable(self, expression):
+        """
+        :param expression: a VariableAccess node
+        """
+        self.__writer.write_push(expression.kind, expression.index)
+
+    def __write_element_address(self, expression):
+        """
+        Writes the code that pushes the address of an array element
+        :param expression: an ArrayAccess node
+        """
+        self.__write_variable(expression.array)
+        self.__write_expression(expression.index)
+        self.__writer.write_arithmetic(PLUS)
+
+    def __write_that_pointer(self, expression):
+        """
+        Writes the code that sets pointer 1 to the address of an array element - or to the array's address, when
+        the index is a constant - unless it is set to it already
+        :param expression: an ArrayAccess node
+        :return: the index of the element in the that segment
+        """
+        pointer_key = get_pointer_key(expression)
+        offset = get_element_offset(expression)
+        if pointer_key is None or pointer_key != self.__that_key:
+            self.__write_variable(expression.array)
+            if offset is None:
+                self.__write_expression(expression.index)
+                self.__writer.write_arithmetic(PLUS)
+            self.__writer.write_pop(POINTER_SEGMENT, THAT_POINTER_INDEX)
+            self.__that_key = pointer_key
+        return 0 if offset is None else offset
+
+    def __write_array_access(self, expression):
+        """
+        Writes the code that pushes the value of an array element
+        :param expression: an ArrayAccess node
+        """
+        if self.__array_access:
+            self.__writer.write_push(THAT_SEGMENT, self.__write_that_pointer(expression))
+            return
+        self.__write_element_address(expression)
+        self.__writer.write_pop(POINTER_SEGMENT, THAT_POINTER_INDEX)
+        self.__writer.write_push(THAT_SEGMENT, 0)
+
+    def __write_unary_operation(self, expression):
+        """
+        :param expression: a UnaryOperation node
+        """
+        self.__write_expression(expression.operand)
+        self.__writer.write_arithmetic(expression.op, True)
+
+    def __write_binary_operation(self, expression):
+        """
+        :param expression: a BinaryOperation node
+        """
+        if self.__strength_reduction and self.__write_reduced_operation(expression):
+            return
+        self.__write_expression(expression.left)
+        self.__write_expression(expression.right)
+        self.__writer.write_arithmetic(expression.op)
+
+    def __write_call(self, expression):
+        """
+        :param expression: a SubroutineCall node
+        """
+        for argument in expression.arguments:
+            self.__write_expression(argument)
+        self.__writer.write_call(expression.name, len(expression.arguments))
+        self.__that_key = None  # the called function may assign the variables of the address
+
+    def __write_reduced_operation(self, expression):
+        """
+        Writes a multiplication by a constant with additions, and a division by -1 with a negation, instead of
+        calling Math.multiply or Math.divide. There is no shift command in the vm, so division by other constants
+        is left to Math.divide.
+        :param expression: a BinaryOperation node
+        :return: True iff the operation was written
+        """
+        right_value = get_constant_value(expression.right)
+        if expression.op == MULTIPLY:
+            if right_value is not None:
+                return self.__write_multiplication(expression.left, right_value)
+            left_value = get_constant_value(expression.left)
+            if left_value is not None:
+                # the constant has no side effects, so the operands can be written in any order
+                return self.__write_multiplication(expression.right, left_value)
+        elif expression.op == DIVIDE and right_value == -1:
+            self.__write_expression(expression.left)
+            self.__writer.write_arithmetic(MINUS, True)
+            return True
+        return False
+
+    def __write_multiplication(self, multiplicand, factor):
+        """
+        Writes a multiplication by a constant as a chain of doublings and additions, following the bits of the
+        constant from the highest: the product is doubled for every bit, and the multiplicand is added for every
+        set bit.
+        :param multiplicand: the multiplied expression node
+        :param factor: the constant factor
+        :return: True iff the multiplication was written. Long chains are left to Math.multiply
+        """
+        magnitude = abs(factor)
+        if magnitude == 0 or factor == MIN_CONSTANT:
+            return False
+        is_variable = type(multiplicand) is VariableAccess
+        bits = bin(magnitude)[3:]  # the bits after the highest set bit
+        if get_multiplication_cost(bits, is_variable, factor < 0) > MAX_MULTIPLY_COMMANDS:
+            return False
+
+        # a variable is pushed again whenever it is needed. Any other multiplicand is evaluated once, into a temp
+        if is_variable:
+            multiplicand_segment, multiplicand_index = multiplicand.kind, multiplicand.index
+        else:
+            self.__write_expression(multiplicand)
+            multiplicand_segment, multiplicand_index = TEMP_SEGMENT, MULTIPLICAND_TEMP_INDEX
+            self.__writer.write_pop(multiplicand_segment, multiplicand_index)
+
+        self.__writer.write_push(multiplicand_segment, multiplicand_index)
+        is_multiplicand = True  # whether the product on the stack is the multiplicand itself
+        for bit in bits:
+            # doubles the product
+            if is_multiplicand:
+                self.__writer.write_push(multiplicand_segment, multiplicand_index)
+            else:
+                self.__writer.write_pop(TEMP_SEGMENT, PRODUCT_TEMP_INDEX)
+                self.__writer.write_push(TEMP_SEGMENT, PRODUCT_TEMP_INDEX)
+                self.__writer.write_push(TEMP_SEGMENT, PRODUCT_TEMP_INDEX)
+            self.__writer.write_arithmetic(PLUS)
+            is_multiplicand = False
+            if bit == SET_BIT:
+                self.__writer.write_push(multiplicand_segment, multiplicand_index)
+                self.__writer.write_arithmetic(PLUS)
+        if factor < 0:
+            self.__writer.write_arithmetic(MINUS, True)
+        return True
+
+
+def get_element_offset(expression):
+    """
+    :param expression: an ArrayAccess node
+    :return: the index of the element if it is a constant that the that segment can be indexed with, or None
+    """
+    value = get_constant_value(expression.index)
+    if value is not None and 0 <= value <= MAX_CONSTANT:
+        return value
+    return None
+
+
+def get_pointer_key(expression):
+    """
+    :param expression: an ArrayAccess node
+    :return: a key of the address that the code of the access sets in pointer 1: the array's address when the index
+    is a constant, and the element's address otherwise. None if the index has side effects
+    """
+    array_key = get_expression_key(expression.array)
+    if get_element_offset(expression) is not None:
+        return array_key
+    if not is_pure(expression.index):
+        return None
+    return array_key, get_expression_key(expression.index)
+
+
+def writes_that_pointer(expression, pointer_key):
+    """
+    :param expression: an expression node
+    :param pointer_key: the key of the address in pointer 1 before the expression is computed (see get_pointer_key),
+    or None if it isn't known
+    :return: True iff the code of the expression may set pointer 1 to another address
+    """
+    return get_that_effect(expression, pointer_key)[1]
+
+
+def get_that_effect(expression, pointer_key):
+    """
+    Follows the code of an expression in the order it is written, as the code generator reuses the address in
+    pointer 1
+    :param expression: an expression node
+    :param pointer_key: the key of the address in pointer 1 before the expression is computed, or None
+    :return: a tuple of the key of the address in pointer 1 after the expression is computed, and whether pointer 1
+    was set
+    """
+    expression_type = type(expression)
+    if expression_type is ArrayAccess:
+        access_key = get_pointer_key(expression)
+        if access_key is not None and access_key == pointer_key:
+            return pointer_key, False
+        if get_element_offset(expression) is None:
+            get_that_effect(expression.index, pointer_key)
+        return access_key, True
+    is_set = False
+    if expression_type is BinaryOperation:
+        pointer_key, is_left_set = get_that_effect(expression.left, pointer_key)
+        pointer_key, is_set = get_that_effect(expression.right, pointer_key)
+        is_set = is_set or is_left_set
+    elif expression_type is UnaryOperation:
+        pointer_key, is_set = get_that_effect(expression.operand, pointer_key)
+    elif expression_type is SubroutineCall:
+        for argument in expression.arguments:
+            pointer_key, is_argument_set = get_that_effect(argument, pointer_key)
+            is_set = is_set or is_argument_set
+        pointer_key = None  # calls restore pointer 1 when they return, but may assign the variables of the address
+    elif expression_type is StringConstant:
+        pointer_key = None
+    return pointer_key, is_set
+
+
+def get_multiplication_cost(bits, is_variable, is_negative):
+    """
+    :param bits: the bits of the constant factor after its highest set bit
+    :param is_variable: whether or not the multiplicand is a variable, which doesn't have to be kept in a temp
+    :param is_negative: whether or not the factor is negative
+    :return: the number of vm commands of the multiplication chain (not counting the multiplicand's evaluation)
+    """
+    cost = 1  # pushes the multiplicand
+    if not is_variable:
+        cost += 1  # pops the multiplicand into its temp
+    if bits:
+        cost += FIRST_DOUBLING_COST + (len(bits) - 1) * DOUBLING_COST + bits.count(SET_BIT) * ADDITION_COST
+    if is_negative:
+        cost += 1
+    return cost
@@ -1,16 +1,30 @@
+import json
+
 from JackTokenizer import JackTokenizer, KEYWORD_TYPE, SYMBOL_TYPE, \
-    INTEGER_CONST_TYPE, STRING_CONST_TYPE, IDENTIFIER_TYPE, TAG_CLOSER
+    INTEGER_CONST_TYPE, STRING_CONST_TYPE, IDENTIFIER_TYPE, TAG_CLOSER, IDENTIFIER_CODE
 from SymbolTable import CLASS_VAR_DEC_KEYWORDS
 from VMWriter import VMWriter, CONSTANT_SEGMENT, LOCAL_SEGMENT, ARG_SEGMENT, STATIC_SEGMENT,\
     POINTER_SEGMENT, TEMP_SEGMENT, THAT_SEGMENT, THIS_SEGMENT
 from SymbolTable import SymbolTable, STATIC_SEGMENT_KEYWORD, FIELD_SEGMENT_KEYWORD, ARG_SEGMENT_KEYWORD, \
     VAR_SEGMENT_KEYWORD
+from SubroutineCache import make_key, relocate_labels
+from CodeGenerator import CodeGenerator
+from ASTOptimizer import ASTOptimizer, CONSTANT_FOLDING, LOOP_INVARIANT_MOTION, COMMON_SUBEXPRESSIONS
+from CodeGenerator import STRENGTH_REDUCTION, BRANCH_CONDITIONS, LOOP_ROTATION, ARRAY_ACCESS
+from Peephole import PeepholeOptimizer, PEEPHOLE
+from LocalCoalescing import LocalCoalescer, LOCAL_COALESCING
+from ProjectIndex import SUBROUTINES_KEY, KIND_KEY, ARITY_KEY
+from StringPool import StringPool, get_pool_class_name, get_pool_function
+from JackAST import Subroutine, LetStatement, IfStatement, WhileStatement, DoStatement, ReturnStatement, \
+    IntegerConstant, StringConstant, KeywordConstant, VariableAccess, ArrayAccess, UnaryOperation, BinaryOperation, \
+    SubroutineCall
 
 OP_LIST = ['+', '-', '*', '/', '&', '|', '<', '>', '=']
 UNARY_OP_LIST = ['-', '~']
 METHOD_DEC_KEYWORD = 'method'
 CONSTRUCTOR_DEC_KEYWORD = 'constructor'
-SUBROUTINE_DEC_KEYWORDS = [CONSTRUCTOR_DEC_KEYWORD, 'function', METHOD_DEC_KEYWORD]
+FUNCTION_DEC_KEYWORD = 'function'
+SUBROUTINE_DEC_KEYWORDS = [CONSTRUCTOR_DEC_KEYWORD, FUNCTION_DEC_KEYWORD, METHOD_DEC_KEYWORD]
 VAR_KEYWORDS = [VAR_SEGMENT_KEYWORD]
 TYPE_LIST = ["int", "char", "boolean"]
 LET_KEYWORD = "let"
@@ -47,6 +61,24 @@ STRING_CONSTRUCT_NUM_ARGS = 1
 STRING_APPEND = "String.appendChar"
 STRING_APPEND_NUM_ARGS = 2
 CONSTRUCTOR_SUBROUTINE_NAME = "new"
+OPEN_BLOCK = "{"
+CLOSE_BLOCK = "}"
+TYPES_ENCODING = "latin-1"  # encodes the token type codes into a string for the cache keys
+OPTIMIZATIONS_SEP = ","
+# the optimizations that work on the abstract syntax tree
+AST_OPTIMIZATIONS = frozenset((CONSTANT_FOLDING, STRENGTH_REDUCTION, BRANCH_CONDITIONS, LOOP_ROTATION,
+                               ARRAY_ACCESS, LOOP_INVARIANT_MOTION, COMMON_SUBEXPRESSIONS))
+UNDECLARED_SUBROUTINE_ERROR = "in {caller}: {callee} is not declared"
+METHOD_AS_FUNCTION_ERROR = "in {caller}: the method {callee} is called without an object"
+NOT_METHOD_ERROR = "in {caller}: the {kind} {callee} is called as a method"
+ARITY_ERROR = "in {caller}: {callee} is called with {arguments} arguments, but it has {parameters} parameters"
+POSITION_ERROR_FORMAT = "line {line}, column {column}: {error}"
+
+
+class CompilationError(Exception):
+    """
+    An error in the compiled jack code, found by checking it against the declarations of the other classes
+    """
 
 
 class CompilationEngine:
@@ -59,24 +91,73 @@ class CompilationEngine:
     indeed xxx is the next syntactic element of the input.
     The module outputs to the output stream, the correspond VM code.
     """
-    def __init__(self, input_stream, output_stream):
+    def __init__(self, input_stream, output_stream, subroutine_cache=None, writer_class=VMWriter, use_ast=False,
+                 optimizations=frozenset(), class_index=None):
         """
         Creates a new compilation engine with the
         given input and output. The next routine
         called must be compileClass().
+        :param subroutine_cache: an optional SubroutineCache. Subroutines found in it are not compiled again
+        :param writer_class: the class of the writer of the output: VMWriter for text or BinaryVMWriter for bytecode
+        :param use_ast: whether or not to parse each subroutine into an abstract syntax tree and write its code from
+        the tree with a CodeGenerator, instead of writing the code while parsing. The code is the same
+        :param optimizations: a set of the names of the optimizations to apply. The optimizations that work on the
+        abstract syntax tree turn use_ast on
+        :param class_index: an optional dictionary from the name of each class of the program to its declarations
+        (see ProjectIndex). The calls of the subroutines of these classes are checked against their declarations,
+        and a CompilationError is raised if they don't match
         """
         self.__prefix = ""
         self.__tokenizer = JackTokenizer(input_stream)
-        self.__writer = VMWriter(output_stream)
+        self.__peephole_optimizer = None
+        self.__local_coalescer = None
+        vm_optimizers = []
+        if LOCAL_COALESCING in optimizations:
+            # first, so the peephole optimizer cleans up after it (a copy between two variables that share a slot)
+            self.__local_coalescer = LocalCoalescer()
+            vm_optimizers.append(self.__local_coalescer)
+        if PEEPHOLE in optimizations:
+            self.__peephole_optimizer = PeepholeOptimizer()
+            vm_optimizers.append(self.__peephole_optimizer)
+        self.__writer = writer_class(output_stream, optimizers=vm_optimizers)
         self.__symbol_table = SymbolTable()
         self.__label_counter = 0
         self.__class_name = None
+        self.__subroutine_name = None
+        self.__class_index = class_index
+        self.__pool_class_name = None  # the class of the pool of the string constants, None if they are not pooled
+        self.__subroutine_cache = subroutine_cache
+        self.__class_key = None  # the part of the cache keys that depends on the class level declarations
+        self.__class_identifiers = None  # the class name and the identifiers of the class level declarations
+        self.__optimizations = optimizations
+        self.__code_generator = None
+        self.__optimizer = None
+        if use_ast or optimizations & AST_OPTIMIZATIONS:
+            self.__code_generator = CodeGenerator(self.__writer, optimizations)
+            self.__optimizer = ASTOptimizer(optimizations)
 
     def compile(self):
         """
         Compiles the whole file
         """
         self.__compile_class()
+        self.__writer.close()
+
+    def get_saved_commands(self):
+        """
+        :return: the number of vm commands the peephole optimizer removed
+        """
+        if self.__peephole_optimizer is None:
+            return 0
+        return self.__peephole_optimizer.get_saved_commands()
+
+    def get_saved_locals(self):
+        """
+        :return: the number of local variables the local variables coalescer removed from the frames
+        """
+        if self.__local_coalescer is None:
+            return 0
+        return self.__local_coalescer.get_saved_locals()
 
     def __compile_class(self):
         """
@@ -87,14 +168,30 @@ class CompilationEngine:
         self.__check_keyword_symbol(KEYWORD_TYPE)  # "class"
         self.__check_keyword_symbol(IDENTIFIER_TYPE)  # className
         self.__class_name = self.__tokenizer.get_value()  # saves the class's name for its type when creating this
+        self.__pool_class_name = get_pool_class_name(self.__class_name, self.__optimizations)
         self.__check_keyword_symbol(SYMBOL_TYPE)  # "{"
         while self.__compile_class_var_dec():
             continue
         while self.__compile_subroutine(False):
+            self.__writer.flush()  # writes the subroutine's code
             self.__advance_tokenizer()
+        if self.__pool_class_name == self.__class_name:
+            self.__compile_string_pool()
 
         self.__check_keyword_symbol(SYMBOL_TYPE, make_advance=False)  # block closer "}"
 
+    def __compile_string_pool(self):
+        """
+        Writes the functions of the class's string pool, which return the string constants of the class. Their
+        static variables follow the static variables of the class
+        """
+        string_pool = StringPool(self.__class_name)
+        for string in self.__tokenizer.find_values(STRING_CONST_TYPE):
+            string_pool.add(string)
+        self.__label_counter = string_pool.write_functions(self.__writer,
+                                                           self.__symbol_table.var_count(STATIC_SEGMENT_KEYWORD),
+                                                           self.__label_counter)
+
     def __compile_class_var_dec(self, make_advance=True):
         """
         Compiles a static declaration or a field declaration
@@ -132,6 +229,74 @@ class CompilationEngine:
             # It is not a subroutine
             return False
 
+        if self.__subroutine_cache is not None:
+            self.__compile_cached_subroutine()
+        else:
+            self.__compile_subroutine_declaration()
+
+        return True
+
+    def __compile_cached_subroutine(self):
+        """
+        Compiles a complete method, function, or constructor using the subroutine cache. If the subroutine is in the
+        cache, its code is written with the label numbers shifted to follow the labels written so far, and the
+        tokenizer is moved to the end of the subroutine. Otherwise the subroutine is compiled and added to the cache.
+        Assumes the tokenizer is set on the subroutine keyword.
+        """
+        start = self.__tokenizer.mark()
+        end = self.__tokenizer.find_closing(start, OPEN_BLOCK, CLOSE_BLOCK)
+        if end is None:
+            # the subroutine doesn't end - compiles it without the cache
+            self.__compile_subroutine_declaration()
+            return
+
+        if self.__class_key is None:
+            # all the tokens before the first subroutine: the class name and the static and field declarations
+            types, values = self.__tokenizer.get_span(0, start - 1)
+            # the optimizations change the code, so they are a part of the key
+            self.__class_key = make_key(OPTIMIZATIONS_SEP.join(sorted(self.__optimizations)),
+                                        types.decode(TYPES_ENCODING), *values)
+            self.__class_identifiers = get_identifiers(types, values)
+        types, values = self.__tokenizer.get_span(start, end)
+        key = make_key(self.__class_key, self.__get_index_key(get_identifiers(types, values)),
+                       types.decode(TYPES_ENCODING), *values)
+
+        cached_entry = self.__subroutine_cache.get(key)
+        if cached_entry is not None:
+            code, labels_amount = cached_entry
+            self.__writer.write_code(relocate_labels(code, self.__label_counter))
+            self.__label_counter += labels_amount
+            self.__tokenizer.reset(end)  # the tokenizer is left on the block closer "}"
+            return
+
+        # compiles the subroutine - its code stays in the writer's buffer until the subroutine ends, so it can be cached
+        first_label = self.__label_counter
+        self.__compile_subroutine_declaration()
+        code = self.__writer.get_code()
+        self.__subroutine_cache.put(key, relocate_labels(code, -first_label), self.__label_counter - first_label)
+
+    def __get_index_key(self, identifiers):
+        """
+        The declarations of the called subroutines change the checks of the calls, so they are a part of the cache
+        key of a subroutine. A called subroutine is named in the subroutine, and its class is either named in the
+        subroutine, named as the type of a field or a static variable, or the compiled class itself
+        :param identifiers: the set of the identifiers in the subroutine
+        :return: the part of the cache key of the subroutine that depends on the class index
+        """
+        if not self.__class_index:
+            return ""
+        declarations = {}
+        for class_name in (identifiers | self.__class_identifiers) & self.__class_index.keys():
+            subroutines = self.__class_index[class_name][SUBROUTINES_KEY]
+            declarations[class_name] = {subroutine_name: subroutines[subroutine_name]
+                                        for subroutine_name in identifiers & subroutines.keys()}
+        return json.dumps(declarations, sort_keys=True)
+
+    def __compile_subroutine_declaration(self):
+        """
+        Compiles a complete method, function, or constructor.
+        Assumes the tokenizer is set on the subroutine keyword.
+        """
         self.__symbol_table.start_subroutine()  # creates new subroutine table
 
         is_constructor = False
@@ -145,6 +310,7 @@ class CompilationEngine:
             self.__check_type(False)
         self.__check_keyword_symbol(IDENTIFIER_TYPE)  # subroutineName
         func_name = self.__tokenizer.get_value()  # saves the function's mame
+        self.__subroutine_name = func_name
         self.__check_keyword_symbol(SYMBOL_TYPE)  # "("
 
         self.__compile_parameter_list()
@@ -152,8 +318,6 @@ class CompilationEngine:
         self.__check_keyword_symbol(SYMBOL_TYPE, make_advance=False)  # ")"
         self.__compile_subroutine_body(func_name, is_constructor)
 
-        return True
-
     def __compile_subroutine_body(self, subroutine_name, is_constructor):
         """
         Compiles a subroutine body
@@ -168,6 +332,10 @@ class CompilationEngine:
             vars_amount += current_dec_var_amount  # adds the last amount of vars that were declared
             current_dec_var_amount = self.__compile_var_dec()
 
+        if self.__code_generator is not None:
+            self.__generate_subroutine_body(subroutine_name, is_constructor, vars_amount)
+            return
+
         self.__writer.write_function(self.__class_name, subroutine_name, vars_amount)  # writes the function's title
         # creates the object in case of a constructor
         if is_constructor:
@@ -494,6 +662,10 @@ class CompilationEngine:
         compiles a string constant
         """
         str_const = self.__tokenizer.get_value()
+        if self.__pool_class_name is not None:
+            # the pool function returns the string, built once
+            self.__writer.write_call(get_pool_function(self.__pool_class_name, str_const), 0)
+            return
 
         # fixing escaped characters
         str_const = str_const.replace("\t", "\\t")
@@ -524,6 +696,7 @@ class CompilationEngine:
         num_args = 0
         call_name = ""
         identifier = self.__tokenizer.get_value()
+        call_offset = self.__tokenizer.get_offset()
         # checks if the next token is '(' : regular method call
         if self.__check_keyword_symbol(SYMBOL_TYPE, [OPEN_BRACKET]):
             call_name += self.__class_name + CALL_CLASS_METHOD_MARK + identifier
@@ -555,14 +728,45 @@ class CompilationEngine:
             return False
 
         # pushing all args
+        is_method_call = num_args == 1
         num_args += self.__compile_expression_list()
         self.__check_keyword_symbol(SYMBOL_TYPE, make_advance=False)  # ')'
+        self.__check_call(call_name, is_method_call, num_args, call_offset)
         # calling the function
         self.__writer.write_call(call_name, num_args)
 
         self.__advance_tokenizer()
         return True
 
+    def __check_call(self, call_name, is_method_call, arguments_amount, call_offset):
+        """
+        Checks a subroutine call against the declaration of the called subroutine, if its class is in the class index
+        :param call_name: the full name of the called subroutine (ClassName.subroutineName)
+        :param is_method_call: whether or not the subroutine is called on an object
+        :param arguments_amount: the number of the arguments of the call, including the object of a method call
+        :param call_offset: the offset of the call in the source, for the error message
+        """
+        if self.__class_index is None:
+            return
+        class_name, subroutine_name = call_name.split(CALL_CLASS_METHOD_MARK)
+        if class_name not in self.__class_index:
+            return  # a class of the operating system, or of another program
+        caller = self.__class_name + CALL_CLASS_METHOD_MARK + self.__subroutine_name
+        subroutine = self.__class_index[class_name][SUBROUTINES_KEY].get(subroutine_name)
+        error = None
+        if subroutine is None:
+            error = UNDECLARED_SUBROUTINE_ERROR.format(caller=caller, callee=call_name)
+        elif subroutine[KIND_KEY] == METHOD_DEC_KEYWORD and not is_method_call:
+            error = METHOD_AS_FUNCTION_ERROR.format(caller=caller, callee=call_name)
+        elif is_method_call and subroutine[KIND_KEY] != METHOD_DEC_KEYWORD:
+            error = NOT_METHOD_ERROR.format(caller=caller, kind=subroutine[KIND_KEY], callee=call_name)
+        elif arguments_amount - is_method_call != subroutine[ARITY_KEY]:
+            error = ARITY_ERROR.format(caller=caller, callee=call_name, arguments=arguments_amount - is_method_call,
+                                       parameters=subroutine[ARITY_KEY])
+        if error is not None:
+            line, column = self.__tokenizer.get_line_and_column(call_offset)
+            raise CompilationError(POSITION_ERROR_FORMAT.format(line=line, column=column, error=error))
+
     def __compile_expression_list(self):
         """
         compiles an expression list
@@ -587,6 +791,312 @@ class CompilationEngine:
 
         return exp_counter
 
+    def __generate_subroutine_body(self, subroutine_name, is_constructor, vars_amount):
+        """
+        Parses the statements of a subroutine body into an abstract syntax tree, and writes the subroutine's code
+        from the tree. Only the tree of the current subroutine is kept in memory.
+        Assumes the tokenizer is set on the first token after the variable declarations.
+        :param subroutine_name: The name of the current subroutine (function/method/constructor's name)
+        :param is_constructor: whether or not the subroutine is a constructor
+        :param vars_amount: the number of locals the function needs
+        """
+        if is_constructor:
+            kind = CONSTRUCTOR_DEC_KEYWORD
+        elif self.__symbol_table.get_index_of(THIS_CONSTANT) is not None:
+            kind = METHOD_DEC_KEYWORD
+        else:
+            kind = FUNCTION_DEC_KEYWORD
+        subroutine = Subroutine(self.__class_name, subroutine_name, kind, vars_amount,
+                                self.__symbol_table.var_count(FIELD_SEGMENT_KEYWORD), self.__parse_statements())
+        self.__check_keyword_symbol(SYMBOL_TYPE, make_advance=False)  # '}'
+
+        self.__optimizer.optimize(subroutine)
+        self.__label_counter = self.__code_generator.generate(subroutine, self.__label_counter)
+
+    def __parse_statements(self):
+        """
+        Parses the statements inside a block.
+        Assumes the tokenizer is advanced for the first call.
+        :return: a list of the statement nodes
+        """
+        statements = []
+        while self.__check_keyword_symbol(KEYWORD_TYPE, STATEMENTS_LIST, False):
+            # checking which statement to parse
+            if self.__tokenizer.get_value() == LET_KEYWORD:
+                statements.append(self.__parse_let())
+            elif self.__tokenizer.get_value() == DO_KEYWORD:
+                statements.append(self.__parse_do())
+            elif self.__tokenizer.get_value() == WHILE_KEYWORD:
+                statements.append(self.__parse_while())
+            elif self.__tokenizer.get_value() == RETURN_KEYWORD:
+                statements.append(self.__parse_return())
+            else:
+                statements.append(self.__parse_if())
+        return statements
+
+    def __parse_do(self):
+        """
+        Parses a do statement.
+        Assumes the tokenizer is advanced for the first call.
+        Advance the tokenizer at the end
+        :return: a DoStatement node
+        """
+        self.__check_keyword_symbol(KEYWORD_TYPE, make_advance=False)  # 'do'
+
+        self.__check_keyword_symbol(IDENTIFIER_TYPE)  # identifier that would be operate on
+        call = self.__parse_subroutine_call()
+        self.__check_keyword_symbol(SYMBOL_TYPE, make_advance=False)  # ';'
+
+        self.__advance_tokenizer()
+        return DoStatement(call)
+
+    def __parse_let(self):
+        """
+        Parses a let statement.
+        Assumes the tokenizer is advanced for the first call.
+        Advance the tokenizer at the end.
+        :return: a LetStatement node
+        """
+        self.__check_keyword_symbol(KEYWORD_TYPE, make_advance=False)  # 'let'
+
+        self.__check_keyword_symbol(IDENTIFIER_TYPE)  # varName
+        target = self.__get_variable(self.__tokenizer.get_value())
+
+        # parses the left side of the equation
+        if self.__check_keyword_symbol(SYMBOL_TYPE, [OPEN_ARRAY_ACCESS_BRACKET]):  # array access, if not: =
+            target = ArrayAccess(target, self.__parse_array_index())
+            self.__check_keyword_symbol(SYMBOL_TYPE)  # '='
+
+        # parses the right side of the equation
+        self.__advance_tokenizer()  # advance the tokenizer for the expression
+        value = self.__parse_expression()
+        self.__check_keyword_symbol(SYMBOL_TYPE, make_advance=False)  # ';'
+        self.__advance_tokenizer()
+
+        return LetStatement(target, value)
+
+    def __parse_while(self):
+        """
+        Parses a while statement.
+        Assumes the tokenizer is advanced for the first call.
+        Advance the tokenizer at the end.
+        :return: a WhileStatement node
+        """
+        self.__check_keyword_symbol(KEYWORD_TYPE, make_advance=False)  # 'while'
+        self.__check_keyword_symbol(SYMBOL_TYPE)  # '('
+
+        # advance the tokenizer for the expression
+        self.__advance_tokenizer()
+        condition = self.__parse_expression()
+        self.__check_keyword_symbol(SYMBOL_TYPE, make_advance=False)  # ')'
+
+        self.__check_keyword_symbol(SYMBOL_TYPE)  # '{'
+        # advance the tokenizer for the statements
+        self.__advance_tokenizer()
+        statements = self.__parse_statements()
+        self.__check_keyword_symbol(SYMBOL_TYPE, make_advance=False)  # '}'
+
+        self.__advance_tokenizer()
+        return WhileStatement(condition, statements)
+
+    def __parse_return(self):
+        """
+        Parses a return statement.
+        Assumes the tokenizer is advanced for the first call.
+        Advance the tokenizer at the end.
+        :return: a ReturnStatement node
+        """
+        self.__check_keyword_symbol(KEYWORD_TYPE, make_advance=False)  # 'return'
+
+        value = None  # return void
+        if not self.__check_keyword_symbol(SYMBOL_TYPE, [END_LINE_MARK]):
+            if self.__tokenizer.get_value() == THIS_CONSTANT and \
+                            self.__symbol_table.get_type_of(THIS_CONSTANT) is None:
+                # returning this in the constructor
+                value = KeywordConstant(THIS_CONSTANT)
+                self.__advance_tokenizer()
+            else:
+                # returning an expression
+                value = self.__parse_expression()
+            self.__check_keyword_symbol(SYMBOL_TYPE, make_advance=False)  # ';'
+
+        self.__advance_tokenizer()
+        return ReturnStatement(value)
+
+    def __parse_if(self):
+        """
+        Parses an if statement, possibly with a trailing else clause.
+        Assumes the tokenizer is advanced for the first call.
+        Advance the tokenizer at the end.
+        :return: an IfStatement node
+        """
+        self.__check_keyword_symbol(KEYWORD_TYPE, make_advance=False)  # 'if'
+
+        self.__check_keyword_symbol(SYMBOL_TYPE)  # '('
+        # advance the tokenizer for the expression
+        self.__advance_tokenizer()
+        condition = self.__parse_expression()
+        self.__check_keyword_symbol(SYMBOL_TYPE, make_advance=False)  # ')'
+
+        self.__check_keyword_symbol(SYMBOL_TYPE)  # '{'
+        # advance the tokenizer for the statements
+        self.__advance_tokenizer()
+        then_statements = self.__parse_statements()
+        self.__check_keyword_symbol(SYMBOL_TYPE, make_advance=False)  # '}'
+
+        else_statements = None
+        if self.__check_keyword_symbol(KEYWORD_TYPE, [ELSE_KEYWORD]):  # 'else'
+            self.__check_keyword_symbol(SYMBOL_TYPE)  # '{'
+            # advance the tokenizer for the statements
+            self.__advance_tokenizer()
+            else_statements = self.__parse_statements()
+            self.__check_keyword_symbol(SYMBOL_TYPE, make_advance=False)  # '}'
+            self.__advance_tokenizer()
+
+        return IfStatement(condition, then_statements, else_statements)
+
+    def __parse_expression(self):
+        """
+        Parses an expression. The operators have no precedence - they are applied from left to right.
+        Assumes the tokenizer is advanced for the first call.
+        Advances the tokenizer at the end
+        :return: an expression node
+        """
+        expression = self.__parse_term()
+
+        # parses all the op + term that exists
+        while self.__check_op(False):
+            op = self.__tokenizer.get_value()
+            self.__advance_tokenizer()
+            expression = BinaryOperation(op, expression, self.__parse_term())
+
+        return expression
+
+    def __parse_term(self):
+        """
+        Parses a term
+        Assumes the tokenizer is advanced for the first call.
+        Advances the tokenizer at the end
+        :return: an expression node
+        """
+        # integer constant
+        if self.__tokenizer.get_token_type() == INTEGER_CONST_TYPE:
+            term = IntegerConstant(int(self.__tokenizer.get_value()))
+            self.__advance_tokenizer()
+        # string constant
+        elif self.__tokenizer.get_token_type() in STRING_CONST_TYPE:
+            term = StringConstant(self.__tokenizer.get_value())
+            self.__advance_tokenizer()
+        # keyword constant
+        elif self.__check_keyword_symbol(KEYWORD_TYPE, KEYWORD_CONSTANT_LIST, False):
+            term = KeywordConstant(self.__tokenizer.get_value())
+            self.__advance_tokenizer()
+        # (expression)
+        elif self.__check_keyword_symbol(SYMBOL_TYPE, [OPEN_BRACKET], False):
+            self.__advance_tokenizer()
+            term = self.__parse_expression()
+            self.__check_keyword_symbol(SYMBOL_TYPE, make_advance=False)  # ')'
+            self.__advance_tokenizer()
+        # unaryOp + term
+        elif self.__check_unary_op(False):
+            op = self.__tokenizer.get_value()
+            self.__advance_tokenizer()
+            term = UnaryOperation(op, self.__parse_term())
+        # varName / varName[expression] / subroutineCall- in any case, starts with identifier
+        else:
+            identifier_name = self.__tokenizer.get_value()
+            term = self.__parse_subroutine_call()
+            if term is not None:
+                return term
+            term = self.__get_variable(identifier_name)
+            # varName[expression]
+            if self.__check_keyword_symbol(SYMBOL_TYPE, [OPEN_ARRAY_ACCESS_BRACKET], False):
+                term = ArrayAccess(term, self.__parse_array_index())
+                self.__advance_tokenizer()
+
+        return term
+
+    def __parse_array_index(self):
+        """
+        Parses the index of varName[expression].
+        Assumes the tokenizer is set on the '[', and leaves it on the ']'
+        :return: the index expression node
+        """
+        self.__advance_tokenizer()
+        index = self.__parse_expression()
+        self.__check_keyword_symbol(SYMBOL_TYPE, make_advance=False)  # ']'
+        return index
+
+    def __get_variable(self, var_name):
+        """
+        :param var_name: the name of a variable
+        :return: a VariableAccess node of the variable, resolved by the symbol table
+        """
+        return VariableAccess(self.__symbol_table.get_kind_of(var_name), self.__symbol_table.get_index_of(var_name))
+
+    def __parse_subroutine_call(self):
+        """
+        Checks if the next tokens are a subroutine call. If so, parses the call.
+        Advances the tokenizer at the end
+        :return: a SubroutineCall node, or None if the next tokens are not a subroutine call
+        """
+        arguments = []
+        call_name = ""
+        identifier = self.__tokenizer.get_value()
+        call_offset = self.__tokenizer.get_offset()
+        # checks if the next token is '(' : regular method call
+        if self.__check_keyword_symbol(SYMBOL_TYPE, [OPEN_BRACKET]):
+            call_name += self.__class_name + CALL_CLASS_METHOD_MARK + identifier
+            # the extra 'this' arg
+            if self.__symbol_table.get_index_of(THIS_CONSTANT) is not None:
+                arguments.append(self.__get_variable(THIS_CONSTANT))
+            else:
+                arguments.append(KeywordConstant(THIS_CONSTANT))
+        # checks if the next token is '.' : function/method call
+        elif self.__check_keyword_symbol(SYMBOL_TYPE, [CALL_CLASS_METHOD_MARK], False):
+            # a variable- method call
+            if self.__symbol_table.get_index_of(identifier) is not None:
+                call_name += self.__symbol_table.get_type_of(identifier)
+                arguments.append(self.__get_variable(identifier))  # the extra 'this' arg
+            # function/ constructor call
+            else:
+                call_name += identifier
+
+            self.__advance_tokenizer()
+            func_name = self.__tokenizer.get_value()
+            call_name += CALL_CLASS_METHOD_MARK + func_name
+            self.__check_keyword_symbol(SYMBOL_TYPE)  # '('
+        # if the next token is not ( or . : not a subroutine call
+        else:
+            return None
+
+        is_method_call = len(arguments) == 1
+        arguments += self.__parse_expression_list()
+        self.__check_keyword_symbol(SYMBOL_TYPE, make_advance=False)  # ')'
+        self.__check_call(call_name, is_method_call, len(arguments), call_offset)
+
+        self.__advance_tokenizer()
+        return SubroutineCall(call_name, arguments)
+
+    def __parse_expression_list(self):
+        """
+        Parses an expression list
+        :return: a list of the expression nodes
+        """
+        expressions = []
+        self.__advance_tokenizer()
+
+        # if the expression list is not empty: parse all the expression
+        if self.__tokenizer.get_value() != CLOSE_BRACKET:
+            expressions.append(self.__parse_expression())
+
+            # checks for more expressions separated with comma
+            while self.__check_keyword_symbol(SYMBOL_TYPE, [ADDITIONAL_VAR_OPTIONAL_MARK], False):
+                self.__advance_tokenizer()
+                expressions.append(self.__parse_expression())
+
+        return expressions
+
     def __check_keyword_symbol(self, token_type, value_list=None, make_advance=True):
         """
         checks if the current token is from token_type (which is keyword or symbol), and it's value is one of the
@@ -641,3 +1151,12 @@ class CompilationEngine:
         """
         self.__tokenizer.has_more_tokens()  # when there must be more tokens, otherwise the input is invalid
         self.__tokenizer.advance()
+
+
+def get_identifiers(types, values):
+    """
+    :param types: the type codes of a span of tokens (see JackTokenizer.get_span)
+    :param values: the values of the tokens
+    :return: the set of the identifiers among the tokens
+    """
+    return {value for type_code, value in zip(types, values) if type_code == IDENTIFIER_CODE}
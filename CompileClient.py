@@ -0,0 +1,99 @@
+###########
+# imports #
+###########
+import sys
+import os
+import json
+import socket
+
+#############
+# constants #
+#############
+SOCKET_ENVIRONMENT_VARIABLE = "JACK_COMPILE_SERVER"
+DEFAULT_SOCKET_FORMAT = "/tmp/jackcompiler-{uid}.sock"
+CWD_KEY = "cwd"
+ARGUMENTS_KEY = "args"
+ERRORS_KEY = "errors"
+REPORT_KEY = "report"
+EXIT_CODE_KEY = "exit"
+RUN_LOCALLY_KEY = "local"  # set in the response when the request must run in the client's process
+MESSAGE_END = b"\n"
+ENCODING = "utf-8"
+RECEIVE_SIZE = 65536
+
+
+def get_socket_path():
+    """
+    :return: the path of the compile server's socket - taken from the JACK_COMPILE_SERVER environment variable, or
+    a default path of the current user
+    """
+    return os.environ.get(SOCKET_ENVIRONMENT_VARIABLE) or DEFAULT_SOCKET_FORMAT.format(uid=os.getuid())
+
+
+def send_message(connection, message):
+    """
+    Sends a message: a json object in a single line
+    :param connection: a connected socket
+    :param message: a dictionary
+    """
+    connection.sendall(json.dumps(message).encode(ENCODING) + MESSAGE_END)
+
+
+def receive_message(connection):
+    """
+    Receives a message sent by send_message
+    :param connection: a connected socket
+    :return: the message dictionary
+    """
+    data = b""
+    while not data.endswith(MESSAGE_END):
+        chunk = connection.recv(RECEIVE_SIZE)
+        if not chunk:
+            raise ConnectionError("the connection was closed before the whole message arrived")
+        data += chunk
+    return json.loads(data.decode(ENCODING))
+
+
+def request_build(arguments, socket_path):
+    """
+    Asks the compile server to run the compiler with the given arguments
+    :param arguments: the command line arguments of the compiler, without the program name
+    :param socket_path: the path of the server's socket
+    :return: the list of error messages, the exit code and the lines of the build report, or None if the server
+    asks to run the compiler in this process (the watch and stream modes, and arguments it can't parse)
+    """
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as connection:
+        connection.connect(socket_path)
+        send_message(connection, {CWD_KEY: os.getcwd(), ARGUMENTS_KEY: arguments})
+        response = receive_message(connection)
+    if response.get(RUN_LOCALLY_KEY):
+        return None
+    return response[ERRORS_KEY], response[EXIT_CODE_KEY], response.get(REPORT_KEY, [])
+
+
+def main(arguments):
+    """
+    Runs the compiler with the given command line arguments on the compile server. If there is no server running,
+    runs the compiler in this process instead, as it does for the modes the server doesn't run.
+    :param arguments: the command line arguments, without the program name
+    :return: the exit code
+    """
+    try:
+        result = request_build(arguments, get_socket_path())
+    except OSError:
+        result = None  # no server is listening
+    if result is None:
+        import JackCompiler
+        return JackCompiler.main(arguments)
+
+    errors, exit_code, report = result
+    for line in report:
+        print(line)
+    for error_message in errors:
+        print(error_message, file=sys.stderr)
+    return exit_code
+
+
+# main part
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
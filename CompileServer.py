@@ -0,0 +1,143 @@
+###########
+# imports #
+###########
+import sys
+import os
+import io
+import argparse
+import contextlib
+import signal
+import socket
+import threading
+import socketserver
+
+import JackCompiler
+from CompileClient import get_socket_path, send_message, receive_message, CWD_KEY, ARGUMENTS_KEY, ERRORS_KEY, \
+    EXIT_CODE_KEY, REPORT_KEY, RUN_LOCALLY_KEY
+
+#############
+# constants #
+#############
+SERVER_RUNNING_ERROR = "a compile server is already listening on {socket_path}"
+
+
+class CompileService:
+    """
+    Runs builds for the compile server, and keeps the warm state between them: the loaded compiler modules, the
+    subroutine cache of every file that was compiled and the project index of every directory that was built.
+    """
+    def __init__(self):
+        """
+        Creates a compile service with empty caches
+        """
+        self.__warm_caches = {}
+        self.__warm_indexes = {}
+        self.__lock = threading.Lock()  # builds run one at a time, since they share the caches and the outputs
+
+    def build(self, arguments, cwd):
+        """
+        Runs the compiler with the given command line arguments
+        :param arguments: the command line arguments of the compiler, without the program name
+        :param cwd: the working directory the relative paths in the arguments are relative to
+        :return: the list of error messages, the exit code and the lines of the build report, or None if the
+        client should run the compiler itself: in the watch and stream modes, and when the arguments can't be parsed
+        (so that the client prints the usage message)
+        """
+        try:
+            # the client prints the usage message when it runs the compiler itself. The lock keeps the redirection
+            # of the process's output away from a running build
+            with self.__lock, contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+                args = JackCompiler.parse_arguments(arguments)
+        except SystemExit:
+            return None
+        if args.watch or args.stream:
+            return None
+        args.paths = [os.path.join(cwd, path) for path in args.paths]
+        if args.link is not None:
+            args.link = os.path.join(cwd, args.link)
+
+        report = []
+        with self.__lock:
+            errors = JackCompiler.build(args, self.__warm_caches, report, self.__warm_indexes)
+        return errors, JackCompiler.ERROR_EXIT_CODE if errors else JackCompiler.SUCCESS_EXIT_CODE, report
+
+
+class CompileRequestHandler(socketserver.StreamRequestHandler):
+    """
+    Handles a single compile request: reads the arguments, runs the build and sends back the result
+    """
+    def handle(self):
+        """
+        Handles the request
+        """
+        try:
+            request = receive_message(self.request)
+        except ConnectionError:
+            return  # a connection that only checked that the server is running
+        result = self.server.service.build(request[ARGUMENTS_KEY], request[CWD_KEY])
+        if result is None:
+            send_message(self.request, {RUN_LOCALLY_KEY: True})
+            return
+        errors, exit_code, report = result
+        send_message(self.request, {ERRORS_KEY: errors, EXIT_CODE_KEY: exit_code, REPORT_KEY: report})
+
+
+class CompileServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """
+    A long running compile server that listens on a unix socket
+    """
+    daemon_threads = True
+
+    def __init__(self, socket_path):
+        """
+        Creates the server and binds it to the given socket path. A stale socket file (of a server that is no longer
+        running) is removed first.
+        :param socket_path: the path of the unix socket
+        """
+        if os.path.exists(socket_path):
+            if is_listening(socket_path):
+                raise OSError(SERVER_RUNNING_ERROR.format(socket_path=socket_path))
+            os.remove(socket_path)
+        super().__init__(socket_path, CompileRequestHandler)
+        self.service = CompileService()
+
+
+def is_listening(socket_path):
+    """
+    :param socket_path: the path of a unix socket
+    :return: True if a server accepts connections on the socket
+    """
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as connection:
+        try:
+            connection.connect(socket_path)
+        except OSError:
+            return False
+    return True
+
+
+def parse_arguments(arguments):
+    """
+    :param arguments: the command line arguments, without the program name
+    :return: the parsed arguments
+    """
+    parser = argparse.ArgumentParser(description="Runs a compile server for jack files")
+    parser.add_argument("-s", "--socket", default=get_socket_path(), help="the path of the unix socket")
+    return parser.parse_args(arguments)
+
+
+# main part
+if __name__ == '__main__':
+    args = parse_arguments(sys.argv[1:])
+    signal.signal(signal.SIGTERM, lambda signal_number, frame: sys.exit())  # cleans up when terminated
+    try:
+        compile_server = CompileServer(args.socket)
+    except OSError as error:
+        print(error, file=sys.stderr)
+        sys.exit(JackCompiler.ERROR_EXIT_CODE)
+    with compile_server as server:
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            os.remove(args.socket)
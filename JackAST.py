@@ -0,0 +1,222 @@
+# The nodes of the abstract syntax tree of a jack subroutine. The compilation engine builds the tree of one subroutine
+# at a time (with the variables already resolved by the symbol table), and the CodeGenerator writes its vm code.
+# The nodes use __slots__, so a tree costs little more memory than the tokens it was parsed from.
+
+
+class Subroutine:
+    """
+    A constructor, function or method, with its statements
+    """
+    __slots__ = ("class_name", "name", "kind", "locals_amount", "fields_amount", "statements")
+
+    def __init__(self, class_name, name, kind, locals_amount, fields_amount, statements):
+        """
+        :param class_name: the name of the subroutine's class
+        :param name: the name of the subroutine
+        :param kind: constructor, function or method
+        :param locals_amount: the number of local variables of the subroutine
+        :param fields_amount: the number of fields of the class (the size of the object a constructor allocates)
+        :param statements: a list of the statements of the subroutine
+        """
+        self.class_name = class_name
+        self.name = name
+        self.kind = kind
+        self.locals_amount = locals_amount
+        self.fields_amount = fields_amount
+        self.statements = statements
+
+
+##############
+# statements #
+##############
+class LetStatement:
+    """
+    let target = value;
+    """
+    __slots__ = ("target", "value")
+
+    def __init__(self, target, value):
+        """
+        :param target: the assigned VariableAccess or ArrayAccess
+        :param value: the assigned expression
+        """
+        self.target = target
+        self.value = value
+
+
+class IfStatement:
+    """
+    if (condition) {then_statements} else {else_statements}
+    """
+    __slots__ = ("condition", "then_statements", "else_statements")
+
+    def __init__(self, condition, then_statements, else_statements):
+        """
+        :param condition: the condition expression
+        :param then_statements: a list of the statements to run when the condition is true
+        :param else_statements: a list of the statements of the else clause, or None if there is no else clause
+        """
+        self.condition = condition
+        self.then_statements = then_statements
+        self.else_statements = else_statements
+
+
+class WhileStatement:
+    """
+    while (condition) {statements}
+    """
+    __slots__ = ("condition", "statements")
+
+    def __init__(self, condition, statements):
+        """
+        :param condition: the condition expression
+        :param statements: a list of the statements of the loop body
+        """
+        self.condition = condition
+        self.statements = statements
+
+
+class DoStatement:
+    """
+    do call;
+    """
+    __slots__ = ("call",)
+
+    def __init__(self, call):
+        """
+        :param call: the SubroutineCall
+        """
+        self.call = call
+
+
+class ReturnStatement:
+    """
+    return value;
+    """
+    __slots__ = ("value",)
+
+    def __init__(self, value):
+        """
+        :param value: the returned expression, or None for a void return
+        """
+        self.value = value
+
+
+###############
+# expressions #
+###############
+class IntegerConstant:
+    """
+    An integer constant, between 0 and 32767
+    """
+    __slots__ = ("value",)
+
+    def __init__(self, value):
+        """
+        :param value: the integer value
+        """
+        self.value = value
+
+
+class StringConstant:
+    """
+    A string constant
+    """
+    __slots__ = ("value",)
+
+    def __init__(self, value):
+        """
+        :param value: the string, as it appears in the source
+        """
+        self.value = value
+
+
+class KeywordConstant:
+    """
+    true, false, null or this
+    """
+    __slots__ = ("keyword",)
+
+    def __init__(self, keyword):
+        """
+        :param keyword: the keyword
+        """
+        self.keyword = keyword
+
+
+class VariableAccess:
+    """
+    A variable, resolved to its kind and index by the symbol table
+    """
+    __slots__ = ("kind", "index")
+
+    def __init__(self, kind, index):
+        """
+        :param kind: the kind of the variable (static, field, arg, var)
+        :param index: the index of the variable in its segment
+        """
+        self.kind = kind
+        self.index = index
+
+
+class ArrayAccess:
+    """
+    array[index]
+    """
+    __slots__ = ("array", "index")
+
+    def __init__(self, array, index):
+        """
+        :param array: the VariableAccess holding the array's address
+        :param index: the index expression
+        """
+        self.array = array
+        self.index = index
+
+
+class UnaryOperation:
+    """
+    A unary operator applied to an operand: -operand or ~operand
+    """
+    __slots__ = ("op", "operand")
+
+    def __init__(self, op, operand):
+        """
+        :param op: the operator symbol
+        :param operand: the operand expression
+        """
+        self.op = op
+        self.operand = operand
+
+
+class BinaryOperation:
+    """
+    A binary operator applied to two operands. Jack has no operator precedence, so "a + b * c" is parsed as
+    (a + b) * c
+    """
+    __slots__ = ("op", "left", "right")
+
+    def __init__(self, op, left, right):
+        """
+        :param op: the operator symbol
+        :param left: the left operand expression
+        :param right: the right operand expression
+        """
+        self.op = op
+        self.left = left
+        self.right = right
+
+
+class SubroutineCall:
+    """
+    A call of a function, method or constructor
+    """
+    __slots__ = ("name", "arguments")
+
+    def __init__(self, name, arguments):
+        """
+        :param name: the full name of the called function (ClassName.subroutineName)
+        :param arguments: a list of the argument expressions. For a method call, the first is the object
+        """
+        self.name = name
+        self.arguments = arguments
@@ -3,27 +3,662 @@
 ###########
 import sys
 import os
+import io
+import json
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor
 
 from CompilationEngine import CompilationEngine
+from JackTokenizer import JackTokenizer, STRING_CONST_TYPE
+from BuildManifest import BuildManifest, hash_source
+from ProjectIndex import ProjectIndex, scan_class, NAME_KEY
+from SubroutineCache import SubroutineCache
+from VMWriter import VMWriter, LINE_BREAK, VM_SUFFIX
+from VMBytecode import BinaryVMWriter, BinaryVMReader, BYTECODE_SUFFIX
+from Linker import Linker, split_commands
+from ASTOptimizer import CONSTANT_FOLDING, LOOP_INVARIANT_MOTION, COMMON_SUBEXPRESSIONS
+from CodeGenerator import STRENGTH_REDUCTION, BRANCH_CONDITIONS, LOOP_ROTATION, ARRAY_ACCESS
+from Peephole import PeepholeOptimizer, PEEPHOLE
+from LocalCoalescing import LOCAL_COALESCING
+from StringPool import StringPool, STRING_POOL, SHARED_STRING_POOL, SHARED_POOL_CLASS_NAME
 
 #############
 # constants #
 #############
-PATH_POS = 1  # the arguments position for the file path
-VM_SUFFIX = ".vm"
 JACK_SUFFIX = ".jack"
 WRITING_MODE = "w"
+BINARY_WRITING_MODE = "wb"
+READING_MODE = "r"
+BINARY_READING_MODE = "rb"
+TEXT_FORMAT = "text"
+BINARY_FORMAT = "binary"
+FORMAT_WRITERS = {TEXT_FORMAT: VMWriter, BINARY_FORMAT: BinaryVMWriter}
+FORMAT_SUFFIXES = {TEXT_FORMAT: VM_SUFFIX, BINARY_FORMAT: BYTECODE_SUFFIX}
+FORMAT_OPTION = "format"
+AST_OPTION = "ast"
+OPTIMIZATIONS_OPTION = "optimizations"
+# the optimizations of each optimization level
+OPTIMIZATION_LEVELS = ((), (CONSTANT_FOLDING, STRENGTH_REDUCTION, BRANCH_CONDITIONS, LOOP_ROTATION, ARRAY_ACCESS,
+                           LOOP_INVARIANT_MOTION, COMMON_SUBEXPRESSIONS, LOCAL_COALESCING, PEEPHOLE))
+# the optimizations that no level applies, since they change the behavior of programs: a pooled string constant is
+# the same string object every time, so a program that modifies it sees the modification the next time
+OPT_IN_OPTIMIZATIONS = (STRING_POOL, SHARED_STRING_POOL)
+ALL_OPTIMIZATIONS = sorted(set(OPT_IN_OPTIMIZATIONS).union(*OPTIMIZATION_LEVELS))
+DEFAULT_OPTIMIZATION_LEVEL = 0
+OPTIMIZATION_LEVEL_HELP_FORMAT = "{level} for {optimizations}"
+NO_OPTIMIZATIONS_HELP = "none"
+COMPILED_FILES_STATISTIC = "compiled_files"
+SAVED_COMMANDS_STATISTIC = "saved_commands"
+CACHE_HITS_STATISTIC = "cache_hits"
+SAVED_LOCALS_STATISTIC = "saved_locals"
+STATISTICS_FORMAT = "{compiled_files} files compiled, {cache_hits} subroutines taken from the subroutine cache, " \
+                    "{saved_commands} vm commands saved by the peephole optimizer, {saved_locals} local variables " \
+                    "saved by local coalescing"
+COMPILER_VERSION = "1.1"  # recorded in the build manifests - change it whenever the compiler output changes
 FILE_NAME_POSITION = -1
+TEMP_FILE_FORMAT = "{file}.{pid}.tmp"
+DEFAULT_JOBS = 1
+ALL_CORES_JOBS = 0  # the jobs value that means one worker per core
+CHUNKS_PER_WORKER = 4  # how many chunks of files each worker gets, for balancing the work between workers
+ERROR_FORMAT = "{file}: {error_type}: {error}"
+ERROR_EXIT_CODE = 1
+CACHE_DIRECTORY_NAME = ".jackcache"
+CACHE_FILE_SUFFIX = ".json"
+CACHE_VERSION_KEY = "version"
+CACHE_OPTIONS_KEY = "options"
+CACHE_SUBROUTINES_KEY = "subroutines"
+DEFAULT_WATCH_INTERVAL = 0.5  # seconds between two checks for changed files in watch mode
+SUCCESS_EXIT_CODE = 0
+DEFAULT_STREAM_DELIMITER = "//---"  # a comment line both in jack and in vm, so the streams stay valid code
+STREAM_INPUT_NAME = "<stdin> class {index}"
+STREAM_FORMAT_ERROR = "--stream writes vm text only, it can't be combined with --format " + BINARY_FORMAT
+SHARED_CACHE_MAX_ENTRIES = 100000  # the limit of subroutines kept by the cache shared by compile_source calls
+LINK_REPORT_FORMAT = "linked {kept_functions} of {functions} functions: {removed_functions} unreachable functions " \
+                     "removed, {inlined_calls} calls inlined ({commands} vm commands before linking, " \
+                     "{linked_commands} after)"
+DEFAULT_INLINE_SIZE = 0  # the largest function the linker inlines - no function by default
+LINK_REPLACES_OUTPUT_ERROR = "the linked code would replace the compiled code"
+POOL_CLASS_EXISTS_ERROR = "the directory has a {class_name} class, which the shared string pool would replace"
 
 
-def translate_file(input_file, output_file):
+def translate_file(input_file, output_file, subroutine_cache=None, options=None, class_index=None):
     """
     Translates the given input jack file to the given output vm file
     :param input_file: the input jack file
-    :param output_file: the output vm file
+    :param output_file: the output vm file. A binary stream for the binary format
+    :param subroutine_cache: an optional SubroutineCache to reuse the code of unchanged subroutines
+    :param options: the dictionary of the options that affect the output (see get_build_options). The default is
+    the default options
+    :param class_index: an optional dictionary from the name of each class of the program to its declarations, to
+    check the calls against (see ProjectIndex)
+    :return: the number of vm commands the peephole optimizer saved and the number of local variables the local
+    variables coalescer removed
     """
-    compilation_engine = CompilationEngine(input_file, output_file)
+    options = options or get_build_options()
+    compilation_engine = CompilationEngine(input_file, output_file, subroutine_cache,
+                                           FORMAT_WRITERS[options[FORMAT_OPTION]], options[AST_OPTION],
+                                           frozenset(options[OPTIMIZATIONS_OPTION]), class_index)
     compilation_engine.compile()
+    return compilation_engine.get_saved_commands(), compilation_engine.get_saved_locals()
+
+
+def get_build_options(output_format=TEXT_FORMAT, use_ast=False, optimizations=()):
+    """
+    :param output_format: the format of the output: text or binary
+    :param use_ast: whether or not to write the code of each subroutine from its abstract syntax tree
+    :param optimizations: the names of the optimizations to apply (see get_optimizations)
+    :return: a dictionary of the options that affect the compiler output, to be recorded in the build manifests
+    """
+    return {FORMAT_OPTION: output_format, AST_OPTION: use_ast, OPTIMIZATIONS_OPTION: sorted(optimizations)}
+
+
+def get_optimizations(optimization_level=DEFAULT_OPTIMIZATION_LEVEL, enabled=(), disabled=()):
+    """
+    :param optimization_level: the optimization level - an index into OPTIMIZATION_LEVELS
+    :param enabled: the names of optimizations to apply in addition to the level's
+    :param disabled: the names of optimizations of the level not to apply
+    :return: a set of the names of the optimizations to apply
+    """
+    return (set(OPTIMIZATION_LEVELS[optimization_level]) | set(enabled)) - set(disabled)
+
+
+def create_output_stream(options):
+    """
+    :param options: the dictionary of the options that affect the output
+    :return: an in-memory stream for the output of the compiler - binary for the binary format
+    """
+    if options[FORMAT_OPTION] == BINARY_FORMAT:
+        return io.BytesIO()
+    return io.StringIO()
+
+
+# the subroutine cache shared by the in-memory compilations, so a source compiled again reuses its subroutines
+shared_subroutine_cache = SubroutineCache(max_entries=SHARED_CACHE_MAX_ENTRIES)
+
+
+def compile_source(source, subroutine_cache=shared_subroutine_cache, options=None, class_index=None):
+    """
+    Compiles the jack code of a single class in memory, without touching the filesystem
+    :param source: the jack code
+    :param subroutine_cache: the SubroutineCache to reuse the code of already compiled subroutines. The default is
+    a bounded cache shared by all the calls. None compiles every subroutine
+    :param options: the dictionary of the options that affect the output (see get_build_options)
+    :param class_index: an optional dictionary from the name of each class of the program to its declarations, to
+    check the calls against (see get_class_index)
+    :return: the vm code of the class - bytes for the binary format
+    """
+    options = options or get_build_options()
+    output = create_output_stream(options)
+    translate_file(io.StringIO(source), output, subroutine_cache, options, class_index)
+    return output.getvalue()
+
+
+def get_string_constants(source):
+    """
+    :param source: the jack code of a class
+    :return: a list of the string constants of the class, in the order they appear
+    """
+    return JackTokenizer(io.StringIO(source)).find_values(STRING_CONST_TYPE)
+
+
+def compile_string_pool(strings, options=None):
+    """
+    Compiles the string pool that is shared by several classes (see StringPool)
+    :param strings: an iterable of the string constants of the classes
+    :param options: the dictionary of the options that affect the output (see get_build_options)
+    :return: the vm code of the pool class - bytes for the binary format
+    """
+    options = options or get_build_options()
+    string_pool = StringPool(SHARED_POOL_CLASS_NAME)
+    for string in strings:
+        string_pool.add(string)
+    output = create_output_stream(options)
+    writer = FORMAT_WRITERS[options[FORMAT_OPTION]](output)
+    string_pool.write_functions(writer, 0, 0)
+    writer.close()
+    return output.getvalue()
+
+
+def get_class_index(sources):
+    """
+    :param sources: an iterable of the jack code of classes
+    :return: a dictionary from the name of each class to its declarations (see ProjectIndex)
+    """
+    class_index = {}
+    for source in sources:
+        class_entry = scan_class(source)
+        if class_entry is not None:
+            class_index[class_entry[NAME_KEY]] = class_entry
+    return class_index
+
+
+def compile_many(sources, jobs=DEFAULT_JOBS, subroutine_cache=shared_subroutine_cache, options=None):
+    """
+    Compiles the jack code of several classes in memory, without touching the filesystem.
+    The calls between the classes are checked against the declarations of the called subroutines.
+    An error in any of the sources is raised.
+    :param sources: a dictionary from a name (for example the class name) to the jack code of a class
+    :param jobs: the number of worker processes. 0 means one worker per core. The workers don't share the cache
+    :param subroutine_cache: the SubroutineCache to use when the sources are compiled in this process
+    :param options: the dictionary of the options that affect the output (see get_build_options)
+    :return: a dictionary from each name to the vm code of its class. With the shared string pool, the code of the
+    pool class is added under its class name
+    """
+    options = options or get_build_options()
+    names = list(sources)
+    class_index = get_class_index(sources.values())
+    if jobs == ALL_CORES_JOBS:
+        jobs = os.cpu_count() or DEFAULT_JOBS
+    if min(jobs, len(names)) <= DEFAULT_JOBS:
+        codes = {name: compile_source(sources[name], subroutine_cache, options, class_index) for name in names}
+    else:
+        with ProcessPoolExecutor(min(jobs, len(names))) as pool:
+            codes = dict(zip(names, pool.map(compile_source, [sources[name] for name in names], [None] * len(names),
+                                             [options] * len(names), [class_index] * len(names))))
+    if SHARED_STRING_POOL in options[OPTIMIZATIONS_OPTION]:
+        codes[SHARED_POOL_CLASS_NAME] = compile_string_pool((string for name in names
+                                                             for string in get_string_constants(sources[name])),
+                                                            options)
+    return codes
+
+
+def read_stream_classes(input_stream, delimiter=DEFAULT_STREAM_DELIMITER):
+    """
+    Splits a stream of concatenated jack classes. Only one class is held in memory at a time.
+    :param input_stream: a text stream of jack classes, separated by delimiter lines
+    :param delimiter: the line that separates two classes
+    :return: a generator of the jack code of each class
+    """
+    lines = []
+    for line in input_stream:
+        if line.strip() != delimiter:
+            lines.append(line)
+            continue
+        source = "".join(lines)
+        lines = []
+        if source.strip():
+            yield source
+    source = "".join(lines)
+    if source.strip():
+        yield source
+
+
+def translate_stream(input_stream, output_stream, delimiter=DEFAULT_STREAM_DELIMITER, options=None):
+    """
+    Compiles a stream of concatenated jack classes into a stream of vm code. The vm code of each class is written
+    as soon as the class is compiled, followed by the delimiter line, so the consumer can tell the classes apart.
+    A class that fails to compile is reported and skipped.
+    :param input_stream: a text stream of jack classes, separated by delimiter lines
+    :param output_stream: the text stream to write the vm code into
+    :param delimiter: the line that separates two classes, in the input and in the output
+    :param options: the dictionary of the options that affect the output (see get_build_options). Only the text
+    format can be written to the stream. With the shared string pool, the code of the pool class is written after
+    all the classes
+    :return: a list of the error messages
+    """
+    options = options or get_build_options()
+    errors = []
+    strings = []  # the string constants of the compiled classes, for the shared string pool
+    for index, source in enumerate(read_stream_classes(input_stream, delimiter)):
+        try:
+            code = compile_source(source, options=options)
+        except Exception as error:
+            errors.append(ERROR_FORMAT.format(file=STREAM_INPUT_NAME.format(index=index + 1),
+                                              error_type=type(error).__name__, error=error))
+            continue
+        output_stream.write(code + delimiter + LINE_BREAK)
+        output_stream.flush()
+        if SHARED_STRING_POOL in options[OPTIMIZATIONS_OPTION]:
+            strings.extend(get_string_constants(source))
+    if SHARED_STRING_POOL in options[OPTIMIZATIONS_OPTION]:
+        output_stream.write(compile_string_pool(strings, options) + delimiter + LINE_BREAK)
+        output_stream.flush()
+    return errors
+
+
+def get_output_file_name(jack_file, output_format=TEXT_FORMAT):
+    """
+    :param jack_file: the path of a jack file
+    :param output_format: the format of the output: text or binary
+    :return: the path of the matching vm file (or bytecode file), in the same directory
+    """
+    return jack_file[:-len(JACK_SUFFIX)] + FORMAT_SUFFIXES[output_format]
+
+
+def write_atomically(file_name, content):
+    """
+    Writes the content into the file. The content is written into a temporary file in the same directory, which
+    then replaces the file, so readers never see a partially written file.
+    :param file_name: the path of the file to write
+    :param content: the text (or bytes) to write
+    """
+    # a file name unique to this process, so parallel builds don't write into each other's temporary files
+    temp_name = TEMP_FILE_FORMAT.format(file=file_name, pid=os.getpid())
+    try:
+        with open(temp_name, BINARY_WRITING_MODE if isinstance(content, bytes) else WRITING_MODE) as temp_file:
+            temp_file.write(content)
+        os.replace(temp_name, file_name)
+    except BaseException:
+        if os.path.exists(temp_name):
+            os.remove(temp_name)
+        raise
+
+
+def write_if_changed(file_name, content):
+    """
+    Writes the content into the file atomically, unless the file already has this content. This way the
+    modification time of an unchanged output is kept.
+    :param file_name: the path of the file to write
+    :param content: the text (or bytes) to write
+    :return: True iff the file was written
+    """
+    try:
+        with open(file_name, BINARY_READING_MODE if isinstance(content, bytes) else READING_MODE) as existing_file:
+            if existing_file.read() == content:
+                return False
+    except OSError:
+        pass  # there is no such file yet
+    write_atomically(file_name, content)
+    return True
+
+
+def get_cache_file_name(jack_file):
+    """
+    :param jack_file: the path of a jack file
+    :return: the path of the file that keeps the subroutine cache of the jack file
+    """
+    directory, base_name = os.path.split(jack_file)
+    return os.path.join(directory, CACHE_DIRECTORY_NAME, base_name + CACHE_FILE_SUFFIX)
+
+
+def load_subroutine_cache(jack_file, options):
+    """
+    :param jack_file: the path of a jack file
+    :param options: the dictionary of the options that affect the output
+    :return: a SubroutineCache with the subroutines cached when the jack file was last compiled with the same
+    compiler version and options
+    """
+    try:
+        with open(get_cache_file_name(jack_file)) as cache_file:
+            content = json.load(cache_file)
+    except (OSError, ValueError):
+        return SubroutineCache()  # no cache yet (or a broken one)
+    if content.get(CACHE_VERSION_KEY) != COMPILER_VERSION or content.get(CACHE_OPTIONS_KEY) != options:
+        return SubroutineCache()
+    return SubroutineCache({key: tuple(entry) for key, entry in content.get(CACHE_SUBROUTINES_KEY, {}).items()})
+
+
+def save_subroutine_cache(jack_file, subroutine_cache, options):
+    """
+    Saves the subroutines used by the last compilation of the jack file, if any of them was compiled
+    :param jack_file: the path of a jack file
+    :param subroutine_cache: the SubroutineCache the jack file was compiled with
+    :param options: the dictionary of the options the jack file was compiled with
+    """
+    if not subroutine_cache.get_misses():
+        return  # all the subroutines came from the saved cache
+    cache_file_name = get_cache_file_name(jack_file)
+    os.makedirs(os.path.dirname(cache_file_name), exist_ok=True)
+    write_atomically(cache_file_name, json.dumps({CACHE_VERSION_KEY: COMPILER_VERSION,
+                                                  CACHE_OPTIONS_KEY: options,
+                                                  CACHE_SUBROUTINES_KEY: subroutine_cache.get_used_entries()}))
+
+
+def compile_jack_file(jack_file, options, use_cache=True, warm_caches=None, class_index=None):
+    """
+    Translates the given jack file into a vm file with the same name in the same directory.
+    Any failure is reported back instead of raised, so a bad file doesn't stop the rest of the batch.
+    :param jack_file: the path of the jack file
+    :param options: the dictionary of the options that affect the output (see get_build_options)
+    :param use_cache: whether or not to reuse the code of the subroutines that didn't change since the last build
+    :param warm_caches: an optional dictionary of the subroutine cache of each jack file (and options), kept in
+    memory by a long running process between builds. It saves loading the cache files
+    :param class_index: an optional dictionary from the name of each class of the program to its declarations, to
+    check the calls against (see ProjectIndex)
+    :return: a tuple of an error message (None if the file was translated successfully), the hash of the
+    compiled source, the modification time and size of the compiled source and a dictionary of the statistics of
+    the file: the number of vm commands the peephole optimizer saved, of the local variables the local variables
+    coalescer removed and of the subroutines taken from the subroutine cache
+    """
+    try:
+        with open(jack_file, BINARY_READING_MODE) as input_file:
+            source_stat = os.fstat(input_file.fileno())
+            source = input_file.read()
+        output = create_output_stream(options)
+        subroutine_cache = None
+        warm_cache_key = (jack_file, json.dumps(options, sort_keys=True))
+        if use_cache:
+            if warm_caches is not None and warm_cache_key in warm_caches:
+                subroutine_cache = warm_caches[warm_cache_key]
+            else:
+                subroutine_cache = load_subroutine_cache(jack_file, options)
+        # decodes the source the same way a file opened in text mode does
+        saved_commands, saved_locals = translate_file(io.TextIOWrapper(io.BytesIO(source)), output,
+                                                      subroutine_cache, options, class_index)
+        file_statistics = {SAVED_COMMANDS_STATISTIC: saved_commands, SAVED_LOCALS_STATISTIC: saved_locals,
+                           CACHE_HITS_STATISTIC: subroutine_cache.get_hits() if use_cache else 0}
+        write_if_changed(get_output_file_name(jack_file, options[FORMAT_OPTION]), output.getvalue())
+        if use_cache:
+            save_subroutine_cache(jack_file, subroutine_cache, options)
+            if warm_caches is not None:
+                warm_caches[warm_cache_key] = SubroutineCache(subroutine_cache.get_used_entries())
+    except Exception as error:
+        return ERROR_FORMAT.format(file=jack_file, error_type=type(error).__name__, error=error), None, None, None, {}
+    return None, hash_source(source), source_stat.st_mtime_ns, source_stat.st_size, file_statistics
+
+
+def write_shared_string_pool(directory, options):
+    """
+    Writes the vm file of the string pool shared by the jack files of a directory (see StringPool). The pool has
+    the strings of all the jack files of the directory, including the ones that aren't built this time, since
+    their vm files call it too
+    :param directory: the directory
+    :param options: the dictionary of the options that affect the output
+    """
+    pool_jack_file = os.path.join(directory, SHARED_POOL_CLASS_NAME + JACK_SUFFIX)
+    if os.path.exists(pool_jack_file):
+        raise ValueError(POOL_CLASS_EXISTS_ERROR.format(class_name=SHARED_POOL_CLASS_NAME))
+    strings = []
+    for jack_file in find_jack_files([directory or os.curdir]):
+        with open(jack_file) as input_file:
+            strings.extend(get_string_constants(input_file.read()))
+    write_if_changed(get_output_file_name(pool_jack_file, options[FORMAT_OPTION]),
+                     compile_string_pool(strings, options))
+
+
+def find_jack_files(paths, recursive=False):
+    """
+    Collects the jack files from the given paths
+    :param paths: paths of jack files and directories
+    :param recursive: whether or not to look for jack files in sub directories
+    :return: a list of the paths of the jack files
+    """
+    jack_files = []
+    for path in paths:
+        if not os.path.isdir(path):
+            jack_files.append(path)  # a single file
+        elif recursive:
+            for directory, sub_directories, files_list in os.walk(path):
+                sub_directories.sort()
+                jack_files.extend(os.path.join(directory, directory_file) for directory_file in sorted(files_list)
+                                  if directory_file.endswith(JACK_SUFFIX))
+        else:
+            jack_files.extend(os.path.join(path, directory_file) for directory_file in sorted(os.listdir(path))
+                              if directory_file.endswith(JACK_SUFFIX))
+    return jack_files
+
+
+def compile_jack_files(jack_files, options, jobs, use_cache, warm_caches=None, class_indexes=None):
+    """
+    Translates each of the given jack files into a vm file. The files are independent, so with more than one job
+    they are spread across worker processes.
+    :param jack_files: the paths of the jack files
+    :param options: the dictionary of the options that affect the output
+    :param jobs: the number of worker processes. 0 means one worker per core
+    :param use_cache: whether or not to reuse the code of the subroutines that didn't change since the last build
+    :param warm_caches: an optional dictionary of subroutine caches kept in memory (see compile_jack_file). It is
+    used only when the files are compiled in this process
+    :param class_indexes: an optional dictionary from each directory to the declarations of the classes in it (see
+    ProjectIndex.get_classes), to check the calls of the files in the directory against
+    :return: a list of the results of compile_jack_file, in the order of the files
+    """
+    if jobs == ALL_CORES_JOBS:
+        jobs = os.cpu_count() or DEFAULT_JOBS
+    jobs = min(jobs, len(jack_files))
+    class_indexes = class_indexes or {}
+    files_class_indexes = [class_indexes.get(os.path.dirname(jack_file)) for jack_file in jack_files]
+
+    if jobs <= DEFAULT_JOBS:
+        return [compile_jack_file(jack_file, options, use_cache, warm_caches, class_index)
+                for jack_file, class_index in zip(jack_files, files_class_indexes)]
+
+    chunk_size = max(1, len(jack_files) // (jobs * CHUNKS_PER_WORKER))
+    with ProcessPoolExecutor(jobs) as pool:
+        return list(pool.map(compile_jack_file, jack_files, [options] * len(jack_files),
+                             [use_cache] * len(jack_files), [None] * len(jack_files), files_class_indexes,
+                             chunksize=chunk_size))
+
+
+def translate_files(jack_files, jobs=DEFAULT_JOBS, force=False, use_cache=True, warm_caches=None, options=None,
+                    statistics=None, use_index=True, warm_indexes=None):
+    """
+    Translates the given jack files into vm files. Each directory keeps a build manifest, and the files whose
+    source didn't change since they were last compiled (with the same compiler version and options) are skipped.
+    In the files that are compiled, the subroutines that didn't change are taken from the subroutine cache.
+    Each directory also keeps a project index of the declarations of all its classes, and the calls of each
+    compiled file are checked against it. When the declarations of a class change, all the files of its directory
+    are compiled again.
+    :param jack_files: the paths of the jack files
+    :param jobs: the number of worker processes. 0 means one worker per core
+    :param force: whether or not to compile all the files, even the ones that are up to date
+    :param use_cache: whether or not to use the subroutine cache
+    :param warm_caches: an optional dictionary of subroutine caches kept in memory (see compile_jack_file)
+    :param options: the dictionary of the options that affect the output (see get_build_options). The default is
+    the default options
+    :param statistics: an optional dictionary to add the build statistics to: the number of compiled files, of the
+    subroutines taken from the subroutine cache, of the vm commands the peephole optimizer saved and of the local
+    variables the local variables coalescer removed
+    :param use_index: whether or not to keep the project indexes and check the calls between the classes
+    :param warm_indexes: an optional dictionary of the ProjectIndex of each directory, kept in memory by a long
+    running process between builds. It saves loading the index files; only the entries of the changed files are
+    scanned again
+    :return: a list of the error messages of the files that failed
+    """
+    options = options or get_build_options()
+    manifests = {}  # the manifest of each directory
+    indexes = {}  # the project index of each directory
+    # the directories where the declarations of a class changed. Their files are checked again, but only the
+    # subroutines that call a changed class miss the subroutine cache
+    changed_directories = set()
+    out_of_date_files = []
+    for jack_file in jack_files:
+        directory = os.path.dirname(jack_file)
+        if directory not in manifests:
+            manifests[directory] = BuildManifest(directory, COMPILER_VERSION, options)
+            if use_index:
+                warm_index = warm_indexes.get(directory) if warm_indexes is not None else None
+                indexes[directory], is_changed = update_project_index(directory, warm_index)
+                if warm_indexes is not None:
+                    warm_indexes[directory] = indexes[directory]
+                if is_changed:
+                    changed_directories.add(directory)
+        output_file = get_output_file_name(jack_file, options[FORMAT_OPTION])
+        if force or directory in changed_directories or \
+                not manifests[directory].is_up_to_date(jack_file, output_file):
+            out_of_date_files.append(jack_file)
+
+    errors = []
+    results = compile_jack_files(out_of_date_files, options, jobs, use_cache, warm_caches,
+                                 {directory: index.get_classes() for directory, index in indexes.items()})
+    for jack_file, (error, source_hash, mtime, size, file_statistics) in zip(out_of_date_files, results):
+        manifest = manifests[os.path.dirname(jack_file)]
+        if error is None:
+            manifest.record(jack_file, source_hash, mtime, size)
+            if statistics is not None:
+                statistics[COMPILED_FILES_STATISTIC] = statistics.get(COMPILED_FILES_STATISTIC, 0) + 1
+                for name, value in file_statistics.items():
+                    statistics[name] = statistics.get(name, 0) + value
+        else:
+            errors.append(error)
+            manifest.forget(jack_file)
+
+    if SHARED_STRING_POOL in options[OPTIMIZATIONS_OPTION]:
+        # the pool is written again when any of the files of its directory was compiled, since its strings may
+        # have changed
+        compiled_directories = {os.path.dirname(jack_file) for jack_file in out_of_date_files}
+        for directory in manifests:
+            pool_file = get_output_file_name(os.path.join(directory, SHARED_POOL_CLASS_NAME + JACK_SUFFIX),
+                                             options[FORMAT_OPTION])
+            if directory not in compiled_directories and os.path.exists(pool_file):
+                continue
+            try:
+                write_shared_string_pool(directory, options)
+            except Exception as error:
+                errors.append(ERROR_FORMAT.format(file=pool_file, error_type=type(error).__name__, error=error))
+
+    for manifest in list(manifests.values()) + list(indexes.values()):
+        if manifest.is_modified():
+            write_atomically(manifest.get_path(), manifest.dumps())
+    return errors
+
+
+def update_project_index(directory, project_index=None):
+    """
+    Brings the project index of a directory up to date with the jack files in it
+    :param directory: the directory
+    :param project_index: the ProjectIndex of the directory, if it is already loaded. By default it is loaded from
+    the index file
+    :return: a tuple of the ProjectIndex of the directory, and whether the declarations of its classes changed
+    """
+    if project_index is None:
+        project_index = ProjectIndex(directory)
+    is_changed = False
+    for jack_file in find_jack_files([directory or os.curdir]):
+        is_changed = project_index.update(jack_file) or is_changed
+    is_changed = project_index.forget_removed_files() or is_changed
+    return project_index, is_changed
+
+
+def read_vm_commands(file_name, output_format=TEXT_FORMAT):
+    """
+    :param file_name: the path of a vm file (or bytecode file)
+    :param output_format: the format of the file: text or binary
+    :return: a list of the vm commands in the file, without line breaks
+    """
+    if output_format == BINARY_FORMAT:
+        with BinaryVMReader(file_name) as reader:
+            return split_commands(reader.to_text())
+    with open(file_name) as vm_file:
+        return split_commands(vm_file.read())
+
+
+def write_vm_commands(file_name, commands, output_format=TEXT_FORMAT):
+    """
+    Writes vm commands into a vm file (or bytecode file), unless the file already has this content
+    :param file_name: the path of the file
+    :param commands: a list of vm commands, without line breaks
+    :param output_format: the format of the file: text or binary
+    """
+    output = create_output_stream(get_build_options(output_format))
+    writer = FORMAT_WRITERS[output_format](output)
+    writer.write_commands(commands)
+    writer.close()
+    write_if_changed(file_name, output.getvalue())
+
+
+def link_files(jack_files, link_path, options=None, inline_size=DEFAULT_INLINE_SIZE):
+    """
+    Links the compiled vm files of the given jack files (see Linker): the calls of small functions are inlined, and
+    only the functions that can be reached from the entry of the program are kept
+    :param jack_files: the paths of the jack files of the program, which were compiled already
+    :param link_path: the path of a vm file (or bytecode file) to bundle the kept functions into, or of a directory
+    to write a pruned vm file of each class into
+    :param options: the dictionary of the options the jack files were compiled with (see get_build_options)
+    :param inline_size: the largest number of commands of a function whose calls are inlined (0 for none)
+    :return: the line of the link report
+    """
+    options = options or get_build_options()
+    output_format = options[FORMAT_OPTION]
+    vm_files = [get_output_file_name(jack_file, output_format) for jack_file in jack_files]
+    if SHARED_STRING_POOL in options[OPTIMIZATIONS_OPTION]:
+        for directory in sorted({os.path.dirname(jack_file) for jack_file in jack_files}):
+            vm_files.append(get_output_file_name(os.path.join(directory, SHARED_POOL_CLASS_NAME + JACK_SUFFIX),
+                                                 output_format))
+
+    is_bundle = link_path.endswith(FORMAT_SUFFIXES[output_format])
+    if os.path.abspath(link_path) in {os.path.abspath(vm_file if is_bundle else os.path.dirname(vm_file))
+                                      for vm_file in vm_files}:
+        raise ValueError(LINK_REPLACES_OUTPUT_ERROR)
+
+    linker = Linker()
+    for vm_file in vm_files:
+        class_name = os.path.basename(vm_file)[:-len(FORMAT_SUFFIXES[output_format])]
+        linker.add_class(class_name, read_vm_commands(vm_file, output_format))
+    commands_amount = linker.get_commands_amount()
+    inlined_calls = linker.inline_functions(inline_size, PeepholeOptimizer()
+                                            if PEEPHOLE in options[OPTIMIZATIONS_OPTION] else None)
+    reachable_functions = linker.get_reachable_functions()
+
+    if is_bundle:
+        os.makedirs(os.path.dirname(link_path) or os.curdir, exist_ok=True)
+        write_vm_commands(link_path, linker.get_bundle_commands(reachable_functions), output_format)
+    else:
+        os.makedirs(link_path, exist_ok=True)
+        classes_commands = linker.get_classes_commands(reachable_functions)
+        for vm_file in vm_files:
+            class_name = os.path.basename(vm_file)[:-len(FORMAT_SUFFIXES[output_format])]
+            linked_file = os.path.join(link_path, os.path.basename(vm_file))
+            if class_name in classes_commands:
+                write_vm_commands(linked_file, classes_commands[class_name], output_format)
+            elif os.path.exists(linked_file):
+                os.remove(linked_file)  # none of the class's functions is reachable any more
+
+    functions_amount = linker.get_functions_amount()
+    return LINK_REPORT_FORMAT.format(kept_functions=len(reachable_functions), functions=functions_amount,
+                                     removed_functions=functions_amount - len(reachable_functions),
+                                     inlined_calls=inlined_calls, commands=commands_amount,
+                                     linked_commands=linker.get_commands_amount(reachable_functions))
 
 
 def translate_single_file(file_name):
@@ -31,39 +666,187 @@ def translate_single_file(file_name):
     The function gets a JACK file and translates it to vm code. It creates an vm file with the same
     name in the same directory that contains the jack code.
     :param file_name: the name of the jack file to be translated
+    :return: a list of the error messages
     """
-    # opening the vm file
-    with open(file_name) as input_file:
-        # figuring the output file name- replacing vm suffix to asm
-        output_file_name = file_name.replace(JACK_SUFFIX, VM_SUFFIX)
-        # opening the output file in writing mode
-        with open(output_file_name, WRITING_MODE) as output_file:
-            # translating the file
-            translate_file(input_file, output_file)
+    return translate_files([file_name])
 
 
-def translate_directory(directory_full_path):
+def translate_directory(directory_full_path, jobs=DEFAULT_JOBS, recursive=False, force=False):
     """
     The function gets a directory name and translates each jack file in it to a vm file with the name of the.
     :param directory_full_path: the name of the given directory
+    :param jobs: the number of worker processes
+    :param recursive: whether or not to translate the jack files in sub directories too
+    :param force: whether or not to compile the files that are up to date too
+    :return: a list of the error messages
     """
-    files_list = os.listdir(directory_full_path)  # list of all the files' name in the given directory
-    for directory_file in files_list:
-        if JACK_SUFFIX == directory_file[-len(JACK_SUFFIX):]:  # if the file is a jack file
-            jack_file = os.path.join(directory_full_path, directory_file)  # creates a full path of the jack file
-            output_file_name = os.path.join(directory_full_path, directory_file[:-len(JACK_SUFFIX)] + VM_SUFFIX)
-            with open(jack_file) as input_file:
-                with open(output_file_name, WRITING_MODE) as output_file:
-                    translate_file(input_file, output_file)
+    return translate_files(find_jack_files([directory_full_path], recursive), jobs, force)
+
+
+def get_optimization_levels_help():
+    """
+    :return: a description of the optimizations of each optimization level, for the command line help
+    """
+    return "; ".join(OPTIMIZATION_LEVEL_HELP_FORMAT.format(
+        level=level, optimizations=", ".join(optimizations) or NO_OPTIMIZATIONS_HELP)
+        for level, optimizations in enumerate(OPTIMIZATION_LEVELS))
+
+
+def parse_arguments(arguments):
+    """
+    :param arguments: the command line arguments, without the program name
+    :return: the parsed arguments
+    """
+    parser = argparse.ArgumentParser(description="Compiles jack files and directories into vm files")
+    parser.add_argument("paths", nargs="*", help="jack files or directories of jack files")
+    parser.add_argument("-j", "--jobs", type=int, default=DEFAULT_JOBS,
+                        help="number of worker processes (0 for one per core)")
+    parser.add_argument("-r", "--recursive", action="store_true", help="compile sub directories too")
+    parser.add_argument("-f", "--force", action="store_true", help="compile even the files that are up to date")
+    parser.add_argument("--no-cache", dest="use_cache", action="store_false",
+                        help="compile every subroutine instead of reusing the cached ones")
+    parser.add_argument("--no-index", dest="use_index", action="store_false",
+                        help="don't keep the project index, and don't check the calls between the classes")
+    parser.add_argument("-w", "--watch", action="store_true",
+                        help="keep running and compile the files again whenever they change")
+    parser.add_argument("--format", choices=sorted(FORMAT_WRITERS), default=TEXT_FORMAT,
+                        help="the output format: vm text files or vm bytecode (.vmb) files (default: %(default)s)")
+    parser.add_argument("--ast", action="store_true",
+                        help="parse each subroutine into an abstract syntax tree and write its code from the tree")
+    parser.add_argument("-O", type=int, choices=range(len(OPTIMIZATION_LEVELS)), default=DEFAULT_OPTIMIZATION_LEVEL,
+                        dest="optimization_level", metavar="LEVEL",
+                        help="the optimization level: " + get_optimization_levels_help() + " (default: %(default)s)")
+    parser.add_argument("--enable", action="append", choices=ALL_OPTIMIZATIONS, default=[], metavar="OPTIMIZATION",
+                        help="applies an optimization in addition to the optimization level's. One of: " +
+                             ", ".join(ALL_OPTIMIZATIONS))
+    parser.add_argument("--disable", action="append", choices=ALL_OPTIMIZATIONS, default=[], metavar="OPTIMIZATION",
+                        help="doesn't apply an optimization of the optimization level")
+    parser.add_argument("--stats", action="store_true",
+                        help="print the number of compiled files, of the subroutines taken from the subroutine "
+                             "cache, of the vm commands the peephole optimizer saved and of the local variables "
+                             "local coalescing saved")
+    parser.add_argument("--link", metavar="PATH",
+                        help="link the compiled classes, keeping only the functions reachable from the program's "
+                             "entry: into one bundled file if PATH ends with the output suffix (.vm or .vmb), and "
+                             "into a pruned file for each class in the directory PATH otherwise")
+    parser.add_argument("--inline", type=int, default=DEFAULT_INLINE_SIZE, dest="inline_size", metavar="SIZE",
+                        help="when linking, replace the calls of functions of at most SIZE vm commands that call no "
+                             "other function with their code (default: %(default)s, no function)")
+    parser.add_argument("--stream", action="store_true",
+                        help="compile the jack classes read from stdin and write their vm code to stdout")
+    parser.add_argument("--delimiter", default=DEFAULT_STREAM_DELIMITER,
+                        help="the line that separates the classes in stream mode (default: %(default)s)")
+    args = parser.parse_args(arguments)
+    if args.stream and args.format != TEXT_FORMAT:
+        parser.error(STREAM_FORMAT_ERROR)
+    return args
+
+
+def get_arguments_optimizations(args):
+    """
+    :param args: the parsed command line arguments
+    :return: a set of the names of the optimizations the arguments ask for
+    """
+    return get_optimizations(args.optimization_level, args.enable, args.disable)
+
+
+def build(args, warm_caches=None, report=None, warm_indexes=None):
+    """
+    Translates all the given files and the jack files in the given directories, and links them if the arguments
+    ask for it
+    :param args: the parsed command line arguments
+    :param warm_caches: an optional dictionary of subroutine caches kept in memory (see compile_jack_file)
+    :param report: an optional list to add the lines of the build report to, when the arguments ask for one
+    :param warm_indexes: an optional dictionary of project indexes kept in memory (see translate_files)
+    :return: a list of the error messages
+    """
+    statistics = {COMPILED_FILES_STATISTIC: 0, SAVED_COMMANDS_STATISTIC: 0, CACHE_HITS_STATISTIC: 0,
+                  SAVED_LOCALS_STATISTIC: 0}
+    jack_files = find_jack_files(args.paths, args.recursive)
+    options = get_build_options(args.format, args.ast, get_arguments_optimizations(args))
+    errors = translate_files(jack_files, args.jobs, args.force, args.use_cache, warm_caches, options, statistics,
+                             args.use_index, warm_indexes)
+    if args.stats and report is not None:
+        report.append(STATISTICS_FORMAT.format(**statistics))
+    if args.link is not None and not errors:
+        # the program is linked only when all of its classes compiled
+        try:
+            link_report = link_files(jack_files, args.link, options, args.inline_size)
+        except (OSError, ValueError) as error:
+            errors.append(ERROR_FORMAT.format(file=args.link, error_type=type(error).__name__, error=error))
+        else:
+            if report is not None:
+                report.append(link_report)
+    return errors
+
+
+def get_sources_state(args):
+    """
+    :param args: the parsed command line arguments
+    :return: the modification time and size of each of the jack files to compile
+    """
+    state = {}
+    for jack_file in find_jack_files(args.paths, args.recursive):
+        try:
+            source_stat = os.stat(jack_file)
+            state[jack_file] = (source_stat.st_mtime_ns, source_stat.st_size)
+        except OSError:
+            state[jack_file] = None  # the file was removed
+    return state
+
+
+def watch(args, interval=DEFAULT_WATCH_INTERVAL):
+    """
+    Builds the given paths, and then keeps building them again whenever a jack file is saved, added or removed.
+    The subroutine caches and the project indexes are kept in memory between the builds. Runs until interrupted.
+    :param args: the parsed command line arguments
+    :param interval: the number of seconds between two checks for changed files
+    """
+    warm_caches = {}
+    warm_indexes = {}
+    sources_state = None
+    while True:
+        current_state = get_sources_state(args)
+        if current_state != sources_state:
+            sources_state = current_state
+            report = []
+            for error_message in build(args, warm_caches, report, warm_indexes):
+                print(error_message, file=sys.stderr)
+            for line in report:
+                print(line)
+            args.force = False  # only the first build is forced
+        time.sleep(interval)
 
-# main part
-if __name__ == '__main__':
-    if len(sys.argv) < PATH_POS + 1:
-        sys.exit()  # There is not an input
 
-    # checks if the given path is a directory or a file
-    path = sys.argv[PATH_POS]
-    if os.path.isdir(path):
-        translate_directory(path)  # translates all vm files in the directory
+def main(arguments):
+    """
+    Runs the compiler with the given command line arguments
+    :param arguments: the command line arguments, without the program name
+    :return: the exit code
+    """
+    args = parse_arguments(arguments)
+    if args.stream:
+        options = get_build_options(use_ast=args.ast, optimizations=get_arguments_optimizations(args))
+        errors = translate_stream(sys.stdin, sys.stdout, args.delimiter, options)
+    elif not args.paths:
+        return SUCCESS_EXIT_CODE  # There is not an input
+    elif args.watch:
+        try:
+            watch(args)
+        except KeyboardInterrupt:
+            pass
+        return SUCCESS_EXIT_CODE
     else:
-        translate_single_file(path)  # translates the given vm file
+        report = []
+        errors = build(args, report=report)
+        for line in report:
+            print(line)
+
+    for error_message in errors:
+        print(error_message, file=sys.stderr)
+    return ERROR_EXIT_CODE if errors else SUCCESS_EXIT_CODE
+
+
+# main part
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
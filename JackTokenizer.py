@@ -1,3 +1,7 @@
+import re
+import sys
+from array import array
+
 KEYWORD_TYPE = "keyword"
 SYMBOL_TYPE = "symbol"
 INTEGER_CONST_TYPE = "integerConstant"
@@ -6,169 +10,186 @@ IDENTIFIER_TYPE = "identifier"
 KEYWORD_LIST = ['class', 'constructor', 'function', 'method', 'field', 'static', 'var', 'int', 'char', 'boolean',
                 'void', 'true', 'false', 'null', 'this', 'let', 'do', 'if', 'else', 'while', 'return']
 SYMBOL_LIST = ['{', '}', '(', ')', '[', ']', '.', ',', ';', '+', '-', '*', '/', '&', '|', '<', '>', '=', '~']
-EOF_MARK = ''
+KEYWORD_SET = frozenset(KEYWORD_LIST)
+# the token types, indexed by their compact type code
+TOKEN_TYPES = (KEYWORD_TYPE, SYMBOL_TYPE, INTEGER_CONST_TYPE, STRING_CONST_TYPE, IDENTIFIER_TYPE)
+TYPE_CODES = {token_type: code for code, token_type in enumerate(TOKEN_TYPES)}
+KEYWORD_CODE = TYPE_CODES[KEYWORD_TYPE]
+IDENTIFIER_CODE = TYPE_CODES[IDENTIFIER_TYPE]
+TYPE_CODES_ARRAY_TYPE = "B"  # unsigned char per token
+OFFSETS_ARRAY_TYPE = "L"  # unsigned int per token
+BEFORE_FIRST_TOKEN = -1  # the stream position before the first advance
 TAG_CLOSER = "/"
 TAG_END_OF_LINE = "\n"
 TAG_DELIMITER = " "
-NUMBER_OF_READING_BYTES = 1
 STRING_CONST_MARK = "\""
-COMMENT_SYMBOLS = ["/", "*"]
 BLOCK_COMMENT_START_MARK = "/*"
 BLOCK_COMMENT_END_MARK = "*/"
 LINE_COMMENT_MARK = "//"
+SKIP_GROUP = "skip"
+WORD_GROUP = "word"
+SYMBOLS_CLASS = "".join(re.escape(symbol) for symbol in SYMBOL_LIST)
+# A single pattern that splits the whole input into tokens. The group that matched names the token's type.
+# Whitespace and comments are matched by the skip group, and keywords and identifiers share the word group.
+# A word is anything that starts with a non digit and runs until a symbol or a whitespace.
+TOKEN_PATTERN = re.compile(
+    r"(?P<" + SKIP_GROUP + r">\s+|" + re.escape(LINE_COMMENT_MARK) + r"[^\n]*|" +
+    re.escape(BLOCK_COMMENT_START_MARK) + r".*?" + re.escape(BLOCK_COMMENT_END_MARK) + r")" +
+    r"|" + STRING_CONST_MARK + r"(?P<" + STRING_CONST_TYPE + r">[^" + STRING_CONST_MARK + r"]*)" +
+    STRING_CONST_MARK +
+    r"|(?P<" + INTEGER_CONST_TYPE + r">\d+)" +
+    r"|(?P<" + SYMBOL_TYPE + r">[" + SYMBOLS_CLASS + r"])" +
+    r"|(?P<" + WORD_GROUP + r">[^\s\d" + STRING_CONST_MARK + SYMBOLS_CLASS + r"][^\s" + SYMBOLS_CLASS + r"]*)",
+    re.DOTALL)
 
 
 class JackTokenizer:
     """
     Removes all comments and white space from the input stream and breaks it into Jacklanguage
     tokens, as specified by the Jack grammar.
+    The whole input is read at once and scanned with a single compiled pattern. The tokens are kept as a compact
+    columnar stream: type codes in an array, interned values in a list and source offsets in an array. The stream
+    supports lookahead of any number of tokens (peek) and going back to a saved position (mark/reset), so it can be
+    reused by several passes without tokenizing again.
     """
     def __init__(self, input_stream):
         """
         Creates a tokenizer object with the given input stream
         :param input_stream: a stream contained a jack code
         """
-        self.__file = input_stream
-        self.__current_token = None
-        self.__next_token = None
-        self.__token_type = None
-        self.__next_token_type = None
+        self.__types = array(TYPE_CODES_ARRAY_TYPE)
+        self.__values = []
+        self.__offsets = array(OFFSETS_ARRAY_TYPE)
+        self.__position = BEFORE_FIRST_TOKEN
+        self.__source = input_stream.read()  # kept to find the line of an offset, for error messages
+        self.__scan(self.__source)
+
+    def __scan(self, source):
+        """
+        Splits the given source into tokens and appends them to the stream
+        :param source: a jack code
+        """
+        types = self.__types
+        values = self.__values
+        offsets = self.__offsets
+        for match in TOKEN_PATTERN.finditer(source):
+            token_type = match.lastgroup
+            if token_type == SKIP_GROUP:
+                continue  # whitespace or a comment
+            value = match.group(token_type)
+            if token_type == WORD_GROUP:
+                # a word is either a keyword or an identifier
+                types.append(KEYWORD_CODE if value in KEYWORD_SET else IDENTIFIER_CODE)
+            else:
+                types.append(TYPE_CODES[token_type])
+            values.append(sys.intern(value))
+            offsets.append(match.start())
 
     def has_more_tokens(self):
         """
         Checks if the are more tokens
         :return: True iff there is another token to read
         """
-        # there is a next token
-        if self.__next_token_type:
-            return True
-
-        # Search for the next token which is not an empty line, comment or an EOF.
-        while not self.__next_token_type:  # while the next token type is empty
-            self.__next_token = self.__file.read(NUMBER_OF_READING_BYTES)
-            while self.__next_token.isspace():  # skips on whitespaces
-                self.__next_token = self.__file.read(NUMBER_OF_READING_BYTES)
-            if self.__next_token == EOF_MARK:
-                return False  # no more tokens
-            self.__process_next_token()
-
-        return True
+        return self.__position + 1 < len(self.__types)
 
     def advance(self):
         """
         Gets the next token from the input and makes it the current token. This method should only
         be called if hasMoreTokens() is true. Initially there is no current token.
         """
-        self.__current_token = self.__next_token
-        self.__token_type = self.__next_token_type
-        self.__next_token = None
-        self.__next_token_type = None
-        if (self.__token_type != STRING_CONST_TYPE and self.__token_type != SYMBOL_TYPE) or \
-                (self.__token_type == SYMBOL_TYPE and len(self.__current_token) > 1):
-            # the token contains extra chars
-            next_char = self.__current_token[-1]
-            self.__current_token = self.__current_token[:-1]
-            if not next_char.isspace() and next_char != EOF_MARK:
-                # the next char should be ignored- processes it
-                self.__next_token = next_char
-                self.__process_next_token()
-
-    def __process_next_token(self):
-        """
-        Processes the next token, checks for its type.
-        In case of a string constant - gets its full content and set the next token type
-        In case of a integer constant - gets its full content, sets the next token type,
-            and includes the next char after the integer constant into the next token value
-        In case of a symbol - sets the next token type. The symbol might contain an extra char
-        In case of a keyword or an identifier - gets its full content, sets the next token type,
-            and includes the next char after the keyword/identifier into the next token value
-        """
-        if self.__next_token is None:
-            return
-        if self.__next_token == STRING_CONST_MARK:
-            # next token is a string constant
-            self.__get_string_constant_value()
-            self.__next_token_type = STRING_CONST_TYPE
-        elif self.__next_token.isdigit():
-            # next token is a int constant
-            self.__get_integer_constant_value()
-            self.__next_token_type = INTEGER_CONST_TYPE
-        elif self.__next_token in SYMBOL_LIST:
-            if not self.__process_comment():
-                # a symbol that is not a comment
-                self.__next_token_type = SYMBOL_TYPE
-        else:
-            self.__get_keyword_identifier_value()
+        self.__position += 1
 
     def get_token_type(self):
         """
         :return: the token type
         """
-        return self.__token_type
+        return TOKEN_TYPES[self.__types[self.__position]]
 
     def get_value(self):
         """
         :return: the token value
         """
-        return self.__current_token
-
-    def __get_string_constant_value(self):
-        """
-        Gets the full string constant value into the next token
-        """
-        self.__next_token = ""  # clears the string constant mark
-        next_char = self.__file.read(NUMBER_OF_READING_BYTES)
-        while next_char != STRING_CONST_MARK:  # search for the rest of the string constant
-            self.__next_token += next_char
-            next_char = self.__file.read(NUMBER_OF_READING_BYTES)
-
-    def __get_integer_constant_value(self):
-        """
-        Gets the full integer content value into the next token, and includes the next char after the
-        integer constant
-        """
-        next_char = self.__file.read(NUMBER_OF_READING_BYTES)
-        while next_char.isdigit():  # search for the rest of the string constant
-            self.__next_token += next_char
-            next_char = self.__file.read(NUMBER_OF_READING_BYTES)
-        # keeps the delimiter char. The next char can't be empty since a valid jack file
-        # ends with a bracket and not a digit
-        self.__next_token += next_char
-
-    def __get_keyword_identifier_value(self):
-        """
-        Gets the full keyword/identifier value into the next token, and includes the delimiter next char.
-        Sets the token type to be either keyword or an identifier
-        """
-        next_char = self.__file.read(NUMBER_OF_READING_BYTES)
-        # The next char must be a symbol or whitespace. It can't be empty since a valid jack file ends
-        # with a bracket
-        while next_char not in SYMBOL_LIST and not next_char.isspace():
-            self.__next_token += next_char
-            next_char = self.__file.read(NUMBER_OF_READING_BYTES)
-        if self.__next_token in KEYWORD_LIST:
-            self.__next_token_type = KEYWORD_TYPE
-        else:
-            self.__next_token_type = IDENTIFIER_TYPE
-        self.__next_token += next_char  # keeps the delimiter char after identifying the token type
-
-    def __process_comment(self):
-        """
-        Checks if the next token is a comment, and if so increment the stream to skip the comment
-        :return: True if it was a comment, False other wise
-        """
-        if self.__next_token not in COMMENT_SYMBOLS:
-            return False
-        # adds byte to check if it is a comment
-        self.__next_token += self.__file.read(NUMBER_OF_READING_BYTES)
-        if self.__next_token == LINE_COMMENT_MARK:
-            self.__file.readline()  # skip the line
-            return True
-        if self.__next_token == BLOCK_COMMENT_START_MARK:
-            # searches for the end of the comment mark
-            next_char = self.__file.read(len(BLOCK_COMMENT_END_MARK))
-            while next_char != BLOCK_COMMENT_END_MARK:
-                next_char = next_char[1:]
-                next_char += self.__file.read(NUMBER_OF_READING_BYTES)
-            return True
-        return False
+        return self.__values[self.__position]
+
+    def get_offset(self):
+        """
+        :return: the offset of the current token in the source
+        """
+        return self.__offsets[self.__position]
+
+    def get_line_and_column(self, offset):
+        """
+        :param offset: an offset in the source, as returned by get_offset
+        :return: the line number and the column number of the offset, both counted from 1
+        """
+        line_start = self.__source.rfind(TAG_END_OF_LINE, 0, offset) + 1
+        return self.__source.count(TAG_END_OF_LINE, 0, offset) + 1, offset - line_start + 1
+
+    def peek(self, k=1):
+        """
+        Looks at a token ahead of the current one, without advancing
+        :param k: how many tokens ahead to look. Default value is 1, the next token
+        :return: the type and the value of the token, or (None, None) if there is no such token
+        """
+        position = self.__position + k
+        if position < 0 or position >= len(self.__types):
+            return None, None
+        return TOKEN_TYPES[self.__types[position]], self.__values[position]
+
+    def mark(self):
+        """
+        :return: the current position in the stream, to be passed later to reset
+        """
+        return self.__position
+
+    def reset(self, position=BEFORE_FIRST_TOKEN):
+        """
+        Goes back (or forward) to the given position in the stream
+        :param position: a position returned by mark. Default value is the beginning of the stream
+        """
+        self.__position = position
+
+    def find_closing(self, position, opener, closer):
+        """
+        Finds the symbol that closes the first opener symbol at or after the given position
+        :param position: a position in the stream
+        :param opener: the opening symbol, for example "{"
+        :param closer: the matching closing symbol, for example "}"
+        :return: the position of the closing symbol, or None if there is no such symbol
+        """
+        symbol_code = TYPE_CODES[SYMBOL_TYPE]
+        types = self.__types
+        values = self.__values
+        depth = 0
+        for current in range(max(position, 0), len(types)):
+            if types[current] != symbol_code:
+                continue
+            if values[current] == opener:
+                depth += 1
+            elif values[current] == closer and depth:
+                depth -= 1
+                if not depth:
+                    return current
+        return None
+
+    def get_span(self, start, end):
+        """
+        :param start: the position of the first token of the span
+        :param end: the position of the last token of the span
+        :return: the type codes of the tokens in the span (as bytes) and a list of their values
+        """
+        return self.__types[start:end + 1].tobytes(), self.__values[start:end + 1]
+
+    def find_values(self, token_type):
+        """
+        :param token_type: a token type
+        :return: a list of the values of all the tokens of the given type, in the order they appear in the stream
+        """
+        type_code = TYPE_CODES[token_type]
+        return [value for code, value in zip(self.__types, self.__values) if code == type_code]
+
+    def tokens_count(self):
+        """
+        :return: the number of tokens in the stream
+        """
+        return len(self.__types)
@@ -0,0 +1,288 @@
+from VMWriter import FUNCTION_COMMAND, CALL_COMMAND, PUSH_COMMAND, POP_COMMAND, LABEL_COMMAND, GOTO_COMMAND, \
+    IF_COMMAND, RETURN_COMMAND, STATIC_SEGMENT, ARG_SEGMENT, LOCAL_SEGMENT, POINTER_SEGMENT, CONSTANT_SEGMENT, \
+    THIS_SEGMENT, THAT_SEGMENT, COMMAND_SEP, LINE_BREAK
+
+# the functions a program starts from: the bootstrap code calls Sys.init, which calls Main.main. Without a Sys
+# class (when the operating system is built into the vm emulator), the program starts from Main.main
+ENTRY_FUNCTIONS = ("Sys.init", "Main.main")
+FUNCTION_PREFIX = FUNCTION_COMMAND + COMMAND_SEP
+CALL_PREFIX = CALL_COMMAND + COMMAND_SEP
+STATIC_COMMAND_PREFIXES = (PUSH_COMMAND + COMMAND_SEP + STATIC_SEGMENT + COMMAND_SEP,
+                           POP_COMMAND + COMMAND_SEP + STATIC_SEGMENT + COMMAND_SEP)
+LABEL_COMMANDS = (LABEL_COMMAND, GOTO_COMMAND, IF_COMMAND)
+NAME_POSITION = 1
+SEGMENT_POSITION = 1
+INDEX_POSITION = 2
+# the pointer each of the this and that segments is based on
+POINTER_SEGMENTS = {THIS_SEGMENT: "0", THAT_SEGMENT: "1"}
+LOCALS_POSITION = 2
+ARGUMENTS_POSITION = 2
+# the labels of an inlined function are renamed for each call it replaces, so they don't clash with the labels of
+# the calling function (a vm label is local to its function)
+INLINE_LABEL_FORMAT = "INLINE{site}.{label}"
+INLINE_END_LABEL = "END"
+NO_ENTRY_ERROR = "the program has none of the entry functions " + ", ".join(ENTRY_FUNCTIONS)
+DUPLICATE_FUNCTION_ERROR = "the function {function} is defined by both {first_class} and {second_class}"
+
+
+class Linker:
+    """
+    Links the vm code of the classes of a program. The call graph is built from the call commands, and only the
+    functions that can be reached from the entry functions are kept - jack has no function pointers, so the call
+    commands are all the ways a function can be reached. Calls of functions that are not in the program (the
+    functions of the operating system) are left as they are.
+    The kept functions are written either as one bundled vm file, where the static variables of each class are
+    moved after those of the classes before it (the vm translator gives each file its own static variables), or as
+    pruned vm code for each class.
+    """
+    def __init__(self):
+        """
+        Creates a linker with no classes
+        """
+        self.__classes = {}  # the names of the functions of each class, in the order they are defined
+        self.__functions = {}  # the commands of each function, starting with its function command
+        self.__function_classes = {}  # the class of each function
+
+    def add_class(self, class_name, commands):
+        """
+        Adds the code of a class to the program
+        :param class_name: the name of the class (the name of its vm file)
+        :param commands: a list of the vm commands of the class, without line breaks
+        """
+        function_names = self.__classes.setdefault(class_name, [])
+        function_commands = None
+        for command in commands:
+            if command.startswith(FUNCTION_PREFIX):
+                function_name = command.split(COMMAND_SEP)[NAME_POSITION]
+                if function_name in self.__functions:
+                    raise ValueError(DUPLICATE_FUNCTION_ERROR.format(
+                        function=function_name, first_class=self.__function_classes[function_name],
+                        second_class=class_name))
+                function_commands = self.__functions[function_name] = []
+                self.__function_classes[function_name] = class_name
+                function_names.append(function_name)
+            if function_commands is not None:
+                function_commands.append(command)
+
+    def get_functions_amount(self):
+        """
+        :return: the number of functions in the program
+        """
+        return len(self.__functions)
+
+    def get_commands_amount(self, function_names=None):
+        """
+        :param function_names: the names of the functions to count. The default is all the functions
+        :return: the number of vm commands of the functions
+        """
+        if function_names is None:
+            function_names = self.__functions
+        return sum(len(self.__functions[function_name]) for function_name in function_names)
+
+    def inline_functions(self, max_size, optimizer=None):
+        """
+        Replaces the calls of small leaf functions with their code. A function is inlined if it has at most max_size
+        commands, calls no function and ends with a return. Its arguments and local variables are moved into extra
+        local variables of the calling function, its labels are renamed, and pointer 0 and pointer 1 are saved
+        before its code and restored after it when it sets them and the calling function uses them (as the return
+        command restores them). A function
+        that uses static variables is inlined only into the functions of its own class, since the static variables
+        belong to the vm file.
+        :param max_size: the maximal number of commands of an inlined function (without the function command).
+        0 disables inlining
+        :param optimizer: a PeepholeOptimizer to optimize the functions with inlined calls again with, or None
+        :return: the number of the calls that were inlined
+        """
+        inlined_functions = {function_name: commands for function_name, commands in self.__functions.items()
+                             if is_inlinable(commands, max_size)}
+        inlined_calls = 0
+        for function_name, commands in self.__functions.items():
+            if not any(command.startswith(CALL_PREFIX) for command in commands):
+                continue
+            class_name = self.__function_classes[function_name]
+            function_command = commands[0].split(COMMAND_SEP)
+            first_local = int(function_command[LOCALS_POSITION])
+            locals_amount = first_local
+            first_site = inlined_calls
+            used_pointers = get_used_pointers(commands)
+            inlined_commands = [commands[0]]
+            for command in commands[1:]:
+                if command.startswith(CALL_PREFIX):
+                    call_command = command.split(COMMAND_SEP)
+                    called_function = call_command[NAME_POSITION]
+                    called_commands = inlined_functions.get(called_function)
+                    if called_commands is not None and (self.__function_classes[called_function] == class_name or
+                                                        not uses_static_variables(called_commands)):
+                        locals_amount = max(locals_amount, first_local + write_inlined_call(
+                            inlined_commands, called_commands, int(call_command[ARGUMENTS_POSITION]), first_local,
+                            used_pointers, inlined_calls))
+                        inlined_calls += 1
+                        continue
+                inlined_commands.append(command)
+            if inlined_calls == first_site:
+                continue  # no call was inlined
+            function_command[LOCALS_POSITION] = str(locals_amount)
+            inlined_commands[0] = COMMAND_SEP.join(function_command)
+            if optimizer is not None:
+                inlined_commands = optimizer.optimize(inlined_commands)
+            self.__functions[function_name] = inlined_commands
+        return inlined_calls
+
+    def get_reachable_functions(self):
+        """
+        :return: a set of the names of the functions that can be reached from the entry functions
+        """
+        roots = [function_name for function_name in ENTRY_FUNCTIONS if function_name in self.__functions]
+        if not roots:
+            raise ValueError(NO_ENTRY_ERROR)
+        reachable_functions = set(roots)
+        pending_functions = list(roots)
+        while pending_functions:
+            for command in self.__functions[pending_functions.pop()]:
+                if command.startswith(CALL_PREFIX):
+                    called_function = command.split(COMMAND_SEP)[NAME_POSITION]
+                    if called_function in self.__functions and called_function not in reachable_functions:
+                        reachable_functions.add(called_function)
+                        pending_functions.append(called_function)
+        return reachable_functions
+
+    def get_classes_commands(self, function_names):
+        """
+        :param function_names: a set of the names of the functions to keep
+        :return: a dictionary from the name of each class with kept functions to a list of its kept commands
+        """
+        classes_commands = {}
+        for class_name, class_functions in self.__classes.items():
+            commands = [command for function_name in class_functions if function_name in function_names
+                        for command in self.__functions[function_name]]
+            if commands:
+                classes_commands[class_name] = commands
+        return classes_commands
+
+    def get_bundle_commands(self, function_names):
+        """
+        :param function_names: a set of the names of the functions to keep
+        :return: a list of the kept commands of all the classes, with the static variables of each class moved after
+        the static variables of the classes before it. Only the static variables the kept functions use are counted
+        """
+        commands = []
+        first_static_index = 0
+        for class_name, class_functions in self.__classes.items():
+            statics_amount = 0
+            for function_name in class_functions:
+                if function_name not in function_names:
+                    continue
+                for command in self.__functions[function_name]:
+                    if command.startswith(STATIC_COMMAND_PREFIXES):
+                        index_position = command.rindex(COMMAND_SEP) + 1
+                        static_index = int(command[index_position:])
+                        statics_amount = max(statics_amount, static_index + 1)
+                        command = command[:index_position] + str(first_static_index + static_index)
+                    commands.append(command)
+            first_static_index += statics_amount
+        return commands
+
+
+def is_inlinable(commands, max_size):
+    """
+    :param commands: the commands of a function, starting with its function command
+    :param max_size: the maximal number of commands of an inlined function
+    :return: True iff the calls of the function can be replaced with its code
+    """
+    return len(commands) - 1 <= max_size and commands[-1] == RETURN_COMMAND and \
+        not any(command.startswith(CALL_PREFIX) for command in commands)
+
+
+def uses_static_variables(commands):
+    """
+    :param commands: a list of vm commands
+    :return: True iff any of the commands pushes or pops a static variable
+    """
+    return any(command.startswith(STATIC_COMMAND_PREFIXES) for command in commands)
+
+
+def get_used_pointers(commands):
+    """
+    :param commands: a list of vm commands
+    :return: a set of the pointers (as strings) the commands use, directly or through the this and that segments
+    """
+    used_pointers = set()
+    for command in commands:
+        parts = command.split(COMMAND_SEP)
+        if parts[0] in (PUSH_COMMAND, POP_COMMAND):
+            if parts[SEGMENT_POSITION] == POINTER_SEGMENT:
+                used_pointers.add(parts[INDEX_POSITION])
+            elif parts[SEGMENT_POSITION] in POINTER_SEGMENTS:
+                used_pointers.add(POINTER_SEGMENTS[parts[SEGMENT_POSITION]])
+    return used_pointers
+
+
+def write_inlined_call(inlined_commands, called_commands, arguments_amount, first_local, used_pointers, site):
+    """
+    Appends the code of a called function in place of its call command
+    :param inlined_commands: the list of the commands of the calling function, to append to
+    :param called_commands: the commands of the called function, starting with its function command
+    :param arguments_amount: the number of arguments of the call
+    :param first_local: the index of the first local variable of the calling function that the code may use
+    :param used_pointers: a set of the pointers the calling function uses, which are saved if the code sets them
+    :param site: a number that is unique to the call, for renaming the labels
+    :return: the number of local variables the code used
+    """
+    body = called_commands[1:-1]  # without the function command and the final return
+    locals_amount = int(called_commands[0].split(COMMAND_SEP)[LOCALS_POSITION])
+    # the arguments are stored in the extra local variables, followed by the local variables of the called function
+    # and the saved pointers
+    segment_bases = {ARG_SEGMENT: first_local, LOCAL_SEGMENT: first_local + arguments_amount}
+    saved_pointers = sorted({command.split(COMMAND_SEP)[INDEX_POSITION] for command in body
+                             if command.startswith(POP_COMMAND + COMMAND_SEP + POINTER_SEGMENT + COMMAND_SEP)} &
+                            used_pointers)
+    first_saved_pointer = first_local + arguments_amount + locals_amount
+    for offset, pointer in enumerate(saved_pointers, first_saved_pointer):
+        inlined_commands.append(COMMAND_SEP.join((PUSH_COMMAND, POINTER_SEGMENT, pointer)))
+        inlined_commands.append(COMMAND_SEP.join((POP_COMMAND, LOCAL_SEGMENT, str(offset))))
+
+    # the last argument is on the top of the stack. When the first command pushes the first argument, and nothing
+    # else uses it, the first argument is left on the stack for it
+    first_argument = COMMAND_SEP.join((PUSH_COMMAND, ARG_SEGMENT, "0"))
+    argument_commands = [command for command in body if command.split(COMMAND_SEP)[SEGMENT_POSITION:] ==
+                         [ARG_SEGMENT, "0"]]
+    keeps_first_argument = arguments_amount > 0 and body[:1] == [first_argument] and len(argument_commands) == 1
+    for argument in reversed(range(1 if keeps_first_argument else 0, arguments_amount)):
+        inlined_commands.append(COMMAND_SEP.join((POP_COMMAND, LOCAL_SEGMENT, str(first_local + argument))))
+    if keeps_first_argument:
+        body = body[1:]
+    # the vm initializes the local variables of a function to 0
+    for local in range(locals_amount):
+        inlined_commands.append(COMMAND_SEP.join((PUSH_COMMAND, CONSTANT_SEGMENT, "0")))
+        inlined_commands.append(COMMAND_SEP.join((POP_COMMAND, LOCAL_SEGMENT,
+                                                  str(segment_bases[LOCAL_SEGMENT] + local))))
+
+    end_label = INLINE_LABEL_FORMAT.format(site=site, label=INLINE_END_LABEL)
+    has_end_label = False
+    for command in body:
+        parts = command.split(COMMAND_SEP)
+        if parts[0] in (PUSH_COMMAND, POP_COMMAND) and parts[SEGMENT_POSITION] in segment_bases:
+            command = COMMAND_SEP.join((parts[0], LOCAL_SEGMENT,
+                                        str(segment_bases[parts[SEGMENT_POSITION]] + int(parts[INDEX_POSITION]))))
+        elif parts[0] in LABEL_COMMANDS:
+            command = COMMAND_SEP.join((parts[0], INLINE_LABEL_FORMAT.format(site=site, label=parts[NAME_POSITION])))
+        elif command == RETURN_COMMAND:
+            # returns before the end jump to the end
+            command = COMMAND_SEP.join((GOTO_COMMAND, end_label))
+            has_end_label = True
+        inlined_commands.append(command)
+    if has_end_label:
+        inlined_commands.append(COMMAND_SEP.join((LABEL_COMMAND, end_label)))
+
+    for offset, pointer in reversed(list(enumerate(saved_pointers, first_saved_pointer))):
+        inlined_commands.append(COMMAND_SEP.join((PUSH_COMMAND, LOCAL_SEGMENT, str(offset))))
+        inlined_commands.append(COMMAND_SEP.join((POP_COMMAND, POINTER_SEGMENT, pointer)))
+    return arguments_amount + locals_amount + len(saved_pointers)
+
+
+def split_commands(code):
+    """
+    :param code: vm code, as the compiler writes it
+    :return: a list of the vm commands of the code, without line breaks
+    """
+    return [command for command in code.split(LINE_BREAK) if command]
@@ -0,0 +1,195 @@
+from VMWriter import PUSH_COMMAND, POP_COMMAND, RETURN_COMMAND, LOCAL_SEGMENT, COMMAND_SEP
+from Peephole import DROP_VALUE, LABEL_PREFIX, GOTO_PREFIX, IF_PREFIX, FUNCTION_PREFIX
+
+# the names of the optimizations
+LOCAL_COALESCING = "local-coalescing"
+
+PUSH_PREFIX = PUSH_COMMAND + COMMAND_SEP
+PUSH_LOCAL_PREFIX = PUSH_COMMAND + COMMAND_SEP + LOCAL_SEGMENT + COMMAND_SEP
+POP_LOCAL_PREFIX = POP_COMMAND + COMMAND_SEP + LOCAL_SEGMENT + COMMAND_SEP
+LOCALS_POSITION = 2
+
+
+class LocalCoalescer:
+    """
+    Shrinks the frames of the functions in vm code, by the live ranges of their local variables. A local variable is
+    live between a store and the reads of the stored value. Local variables whose live ranges don't overlap share a
+    local slot, so the function command declares fewer local variables (the vm pushes a 0 for each of them on every
+    call). A store of a value that is never read is removed: the value is dropped instead, or not pushed at all
+    when it comes straight from a push command. A local variable that is never read gets no slot.
+    A local variable that is read before it is stored to reads the 0 the vm initialized it with, so it keeps its
+    slot to itself from the start of the function.
+    """
+    def __init__(self):
+        """
+        Creates a local variables coalescer
+        """
+        self.__saved_locals = 0
+
+    def get_saved_locals(self):
+        """
+        :return: the number of local variables removed from the frames so far
+        """
+        return self.__saved_locals
+
+    def optimize(self, commands):
+        """
+        :param commands: a list of vm commands, made of whole functions, without line breaks
+        :return: the optimized list of commands
+        """
+        optimized_commands = []
+        function_start = None
+        for index, command in enumerate(commands):
+            if command.startswith(FUNCTION_PREFIX):
+                if function_start is not None:
+                    optimized_commands.extend(self.__optimize_function(commands[function_start:index]))
+                function_start = index
+            elif function_start is None:
+                optimized_commands.append(command)  # not in a function
+        if function_start is not None:
+            optimized_commands.extend(self.__optimize_function(commands[function_start:]))
+        return optimized_commands
+
+    def __optimize_function(self, commands):
+        """
+        :param commands: the commands of a function, starting with its function command
+        :return: the optimized list of commands
+        """
+        function_command = commands[0].split(COMMAND_SEP)
+        locals_amount = int(function_command[LOCALS_POSITION])
+        body = commands[1:]
+        if locals_amount == 0 or not body:
+            return commands
+
+        uses, stores = get_local_accesses(body)
+        live_in, live_out = get_liveness(body, uses, stores)
+        slots = get_slots(uses, stores, live_in, live_out, locals_amount)
+
+        slots_amount = max(slots.values(), default=-1) + 1
+        self.__saved_locals += locals_amount - slots_amount
+        function_command[LOCALS_POSITION] = str(slots_amount)
+        optimized_commands = [COMMAND_SEP.join(function_command)]
+        for index, command in enumerate(body):
+            if stores[index]:
+                if not stores[index] & live_out[index]:
+                    # the stored value is never read
+                    if optimized_commands[-1].startswith(PUSH_PREFIX):
+                        optimized_commands.pop()
+                    else:
+                        optimized_commands.append(DROP_VALUE)
+                    continue
+                command = POP_LOCAL_PREFIX + str(slots[get_local(stores[index])])
+            elif uses[index]:
+                command = PUSH_LOCAL_PREFIX + str(slots[get_local(uses[index])])
+            optimized_commands.append(command)
+        return optimized_commands
+
+
+def get_local(local_bit):
+    """
+    :param local_bit: a set of local variables with a single local variable, as a bit mask
+    :return: the index of the local variable
+    """
+    return local_bit.bit_length() - 1
+
+
+def get_local_accesses(body):
+    """
+    :param body: the commands of a function, without its function command
+    :return: two lists with a bit mask for each command: of the local variable it reads, and of the local variable
+    it stores to
+    """
+    uses = [0] * len(body)
+    stores = [0] * len(body)
+    for index, command in enumerate(body):
+        if command.startswith(PUSH_LOCAL_PREFIX):
+            uses[index] = 1 << int(command[len(PUSH_LOCAL_PREFIX):])
+        elif command.startswith(POP_LOCAL_PREFIX):
+            stores[index] = 1 << int(command[len(POP_LOCAL_PREFIX):])
+    return uses, stores
+
+
+def get_successors(body):
+    """
+    :param body: the commands of a function, without its function command
+    :return: a list of the indexes of the commands that may run after each command
+    """
+    labels = {command[len(LABEL_PREFIX):]: index for index, command in enumerate(body)
+              if command.startswith(LABEL_PREFIX)}
+    successors = []
+    for index, command in enumerate(body):
+        if command.startswith(GOTO_PREFIX):
+            command_successors = [labels[command[len(GOTO_PREFIX):]]]
+        elif command.startswith(IF_PREFIX):
+            command_successors = [index + 1, labels[command[len(IF_PREFIX):]]]
+        elif command == RETURN_COMMAND:
+            command_successors = []
+        else:
+            command_successors = [index + 1]
+        successors.append([successor for successor in command_successors if successor < len(body)])
+    return successors
+
+
+def get_liveness(body, uses, stores):
+    """
+    Finds the local variables that are live before and after each command: the local variables whose current
+    value may be read later
+    :param body: the commands of a function, without its function command
+    :param uses: a bit mask for each command of the local variable it reads
+    :param stores: a bit mask for each command of the local variable it stores to
+    :return: two lists with a bit mask of the live local variables for each command: before it and after it
+    """
+    successors = get_successors(body)
+    live_in = [0] * len(body)
+    live_out = [0] * len(body)
+    is_changed = True
+    while is_changed:
+        is_changed = False
+        for index in reversed(range(len(body))):
+            command_live_out = 0
+            for successor in successors[index]:
+                command_live_out |= live_in[successor]
+            command_live_in = uses[index] | (command_live_out & ~stores[index])
+            if command_live_in != live_in[index] or command_live_out != live_out[index]:
+                live_in[index] = command_live_in
+                live_out[index] = command_live_out
+                is_changed = True
+    return live_in, live_out
+
+
+def get_slots(uses, stores, live_in, live_out, locals_amount):
+    """
+    Assigns the local variables that are read to slots, so that local variables that interfere - one is stored to
+    while the other is live, or both are live at the start of the function, where the vm sets them to 0 - get
+    different slots
+    :param uses: a bit mask for each command of the local variable it reads
+    :param stores: a bit mask for each command of the local variable it stores to
+    :param live_in: a bit mask for each command of the local variables that are live before it
+    :param live_out: a bit mask for each command of the local variables that are live after it
+    :param locals_amount: the number of local variables of the function
+    :return: a dictionary from the index of each local variable that is read to the index of its slot
+    """
+    interferences = [0] * locals_amount  # a bit mask for each local variable of the variables it interferes with
+    for store, command_live_out in zip(stores, live_out):
+        if store & command_live_out:
+            local = get_local(store)
+            interferences[local] |= command_live_out & ~store
+            for other_local in range(locals_amount):
+                if command_live_out & ~store & (1 << other_local):
+                    interferences[other_local] |= store
+    for local in range(locals_amount):
+        if live_in[0] & (1 << local):
+            interferences[local] |= live_in[0] & ~(1 << local)
+
+    read_locals = 0
+    for use in uses:
+        read_locals |= use
+    slots = {}
+    for local in range(locals_amount):
+        if read_locals & (1 << local):
+            used_slots = {slots[other_local] for other_local in slots if interferences[local] & (1 << other_local)}
+            slot = 0
+            while slot in used_slots:
+                slot += 1
+            slots[local] = slot
+    return slots
@@ -0,0 +1,206 @@
+from VMWriter import PUSH_COMMAND, POP_COMMAND, LABEL_COMMAND, GOTO_COMMAND, IF_COMMAND, RETURN_COMMAND, \
+    FUNCTION_COMMAND, CONSTANT_SEGMENT, TEMP_SEGMENT, COMMAND_SEP, UNARY_OP_DICT, BINARY_OP_DICT
+
+# the names of the optimizations
+PEEPHOLE = "peephole"
+
+NOT_COMMAND = UNARY_OP_DICT["~"]
+NEG_COMMAND = UNARY_OP_DICT["-"]
+ADD_COMMAND = BINARY_OP_DICT["+"]
+SUB_COMMAND = BINARY_OP_DICT["-"]
+OR_COMMAND = BINARY_OP_DICT["|"]
+EQ_COMMAND = BINARY_OP_DICT["="]
+LT_COMMAND = BINARY_OP_DICT["<"]
+GT_COMMAND = BINARY_OP_DICT[">"]
+PUSH_CONSTANT_PREFIX = PUSH_COMMAND + COMMAND_SEP + CONSTANT_SEGMENT + COMMAND_SEP
+PUSH_ZERO = PUSH_CONSTANT_PREFIX + "0"
+DROP_VALUE = POP_COMMAND + COMMAND_SEP + TEMP_SEGMENT + COMMAND_SEP + "0"
+MAX_CONSTANT = 32767
+# the commands that are cancelled by a second command like them
+SELF_INVERSE_COMMANDS = (NOT_COMMAND, NEG_COMMAND)
+# the commands that leave their first operand as is when the second operand is 0
+ZERO_IDENTITY_COMMANDS = (ADD_COMMAND, SUB_COMMAND, OR_COMMAND)
+# the commands after which the next command runs only if it is jumped to
+JUMP_COMMANDS = (GOTO_COMMAND, RETURN_COMMAND)
+LABEL_PREFIX = LABEL_COMMAND + COMMAND_SEP
+GOTO_PREFIX = GOTO_COMMAND + COMMAND_SEP
+IF_PREFIX = IF_COMMAND + COMMAND_SEP
+FUNCTION_PREFIX = FUNCTION_COMMAND + COMMAND_SEP
+
+
+class PeepholeOptimizer:
+    """
+    Rewrites wasteful patterns in the vm code of a subroutine, before it is written to the output stream:
+    - a sliding window over the commands cancels push/pop pairs on the same location, not/not and neg/neg pairs,
+      and additions of 0, and inverts the negated conditions of branches: "eq, not, if-goto" becomes "sub, if-goto",
+      and "push constant c, lt, not, if-goto" (x >= c) becomes "push constant c-1, gt, if-goto" (and the same for gt)
+    - the control flow pass removes unreachable code after goto and return, jumps to the next command, and labels
+      that are never jumped to, and threads jumps to a label that only jumps on
+    The rewrites are repeated until nothing changes.
+    """
+    def __init__(self):
+        """
+        Creates a peephole optimizer
+        """
+        self.__saved_commands = 0
+
+    def get_saved_commands(self):
+        """
+        :return: the number of vm commands removed so far
+        """
+        return self.__saved_commands
+
+    def optimize(self, commands):
+        """
+        :param commands: a list of vm commands, without line breaks
+        :return: the optimized list of commands
+        """
+        commands_amount = len(commands)
+        while True:
+            optimized_commands = optimize_control_flow(optimize_window(commands))
+            if optimized_commands == commands:
+                break
+            commands = optimized_commands
+        self.__saved_commands += commands_amount - len(commands)
+        return commands
+
+
+def get_constant(command):
+    """
+    :param command: a vm command
+    :return: the pushed number if the command pushes a constant, or None otherwise
+    """
+    if command.startswith(PUSH_CONSTANT_PREFIX):
+        return int(command[len(PUSH_CONSTANT_PREFIX):])
+    return None
+
+
+def rewrite_tail(commands):
+    """
+    Rewrites the last commands of the list if they match one of the window patterns
+    :param commands: a list of vm commands
+    :return: True iff the list was rewritten
+    """
+    last = commands[-1]
+    if len(commands) >= 2:
+        previous = commands[-2]
+        # push x, pop x
+        if last.startswith(POP_COMMAND) and previous.startswith(PUSH_COMMAND) and \
+                last[len(POP_COMMAND):] == previous[len(PUSH_COMMAND):]:
+            del commands[-2:]
+            return True
+        # not, not / neg, neg
+        if last in SELF_INVERSE_COMMANDS and previous == last:
+            del commands[-2:]
+            return True
+        # push constant 0, add
+        if last in ZERO_IDENTITY_COMMANDS and previous == PUSH_ZERO:
+            del commands[-2:]
+            return True
+
+    if len(commands) >= 3 and last.startswith(IF_PREFIX) and commands[-2] == NOT_COMMAND:
+        comparison = commands[-3]
+        # x != y is x - y != 0, and if-goto jumps on any value but 0
+        if comparison == EQ_COMMAND:
+            commands[-3:] = [SUB_COMMAND, last]
+            return True
+        # x >= c is x > c - 1, and x <= c is x < c + 1
+        if len(commands) >= 4 and comparison in (LT_COMMAND, GT_COMMAND):
+            constant = get_constant(commands[-4])
+            if constant is not None:
+                if comparison == LT_COMMAND and constant > 0:
+                    commands[-4:] = [PUSH_CONSTANT_PREFIX + str(constant - 1), GT_COMMAND, last]
+                    return True
+                if comparison == GT_COMMAND and constant < MAX_CONSTANT:
+                    commands[-4:] = [PUSH_CONSTANT_PREFIX + str(constant + 1), LT_COMMAND, last]
+                    return True
+    return False
+
+
+def optimize_window(commands):
+    """
+    Applies the window patterns. Each command is appended to the output and the tail of the output is rewritten
+    as long as it matches a pattern, so a rewrite can expose another one
+    :param commands: a list of vm commands
+    :return: the rewritten list of commands
+    """
+    optimized_commands = []
+    for command in commands:
+        optimized_commands.append(command)
+        while optimized_commands and rewrite_tail(optimized_commands):
+            continue
+    return optimized_commands
+
+
+def optimize_control_flow(commands):
+    """
+    Removes unreachable commands, jumps to the next command and unused labels, and threads jumps to labels that
+    only jump on
+    :param commands: a list of vm commands
+    :return: the rewritten list of commands
+    """
+    # the label each label jumps on to, when the first command after it (and the labels next to it) is a goto
+    forwards = {}
+    for index, command in enumerate(commands):
+        if command.startswith(LABEL_PREFIX):
+            next_index = index + 1
+            while next_index < len(commands) and commands[next_index].startswith(LABEL_PREFIX):
+                next_index += 1
+            if next_index < len(commands) and commands[next_index].startswith(GOTO_PREFIX):
+                forwards[command[len(LABEL_PREFIX):]] = commands[next_index][len(GOTO_PREFIX):]
+
+    optimized_commands = []
+    is_reachable = True
+    for index, command in enumerate(commands):
+        if command.startswith(LABEL_PREFIX) or command.startswith(FUNCTION_PREFIX):
+            is_reachable = True
+        elif not is_reachable:
+            continue  # nothing jumps here
+        elif command.startswith(GOTO_PREFIX) or command.startswith(IF_PREFIX):
+            prefix = GOTO_PREFIX if command.startswith(GOTO_PREFIX) else IF_PREFIX
+            label = get_final_label(command[len(prefix):], forwards)
+            if label in get_next_labels(commands, index + 1):
+                # jumps to the next command
+                if prefix == IF_PREFIX:
+                    optimized_commands.append(DROP_VALUE)  # the condition is still popped
+                continue
+            command = prefix + label
+        optimized_commands.append(command)
+        if command in JUMP_COMMANDS or command.startswith(GOTO_PREFIX):
+            is_reachable = False
+
+    # removes the labels nothing jumps to
+    used_labels = set()
+    for command in optimized_commands:
+        if command.startswith(GOTO_PREFIX):
+            used_labels.add(command[len(GOTO_PREFIX):])
+        elif command.startswith(IF_PREFIX):
+            used_labels.add(command[len(IF_PREFIX):])
+    return [command for command in optimized_commands
+            if not command.startswith(LABEL_PREFIX) or command[len(LABEL_PREFIX):] in used_labels]
+
+
+def get_final_label(label, forwards):
+    """
+    :param label: a label name
+    :param forwards: the label each label jumps on to (see optimize_control_flow)
+    :return: the label a jump to the given label ends up at
+    """
+    visited = {label}
+    while label in forwards and forwards[label] not in visited:
+        label = forwards[label]
+        visited.add(label)
+    return label
+
+
+def get_next_labels(commands, index):
+    """
+    :param commands: a list of vm commands
+    :param index: an index in the list
+    :return: a set of the names of the labels at the given index and right after it
+    """
+    labels = set()
+    while index < len(commands) and commands[index].startswith(LABEL_PREFIX):
+        labels.add(commands[index][len(LABEL_PREFIX):])
+        index += 1
+    return labels
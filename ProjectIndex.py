@@ -0,0 +1,188 @@
+import os
+import io
+import json
+
+from JackTokenizer import JackTokenizer
+from BuildManifest import hash_source
+
+INDEX_FILE_NAME = ".jackindex"
+INDEX_VERSION = 1  # change it whenever the content of the class entries changes
+VERSION_KEY = "version"
+FILES_KEY = "files"
+HASH_KEY = "hash"
+MTIME_KEY = "mtime"
+SIZE_KEY = "size"
+CLASS_KEY = "class"
+# the keys of a class entry
+NAME_KEY = "name"
+STATICS_KEY = "statics"
+FIELDS_KEY = "fields"
+SUBROUTINES_KEY = "subroutines"
+# the keys of a subroutine entry
+KIND_KEY = "kind"
+RETURN_TYPE_KEY = "return_type"
+ARITY_KEY = "arity"
+CLASS_KEYWORD = "class"
+VAR_KINDS_KEYS = {"static": STATICS_KEY, "field": FIELDS_KEY}
+SUBROUTINE_KINDS = ("constructor", "function", "method")
+END_LINE_MARK = ";"
+CLOSE_BRACKET = ")"
+OPEN_BLOCK = "{"
+CLOSE_BLOCK = "}"
+TOKENS_PER_PARAMETER = 3  # type, name and the comma before the next parameter
+CLASS_BODY_START = 3  # the position of the first token after "class className {"
+FIRST_PARAMETER_OFFSET = 4  # the offset of the first parameter token from "kind returnType name ("
+
+
+class ProjectIndex:
+    """
+    The project index of a directory (the .jackindex file). Records the declarations of the class of each jack file
+    in the directory: its static variables and fields with their types, and the kind, return type and number of
+    parameters of each of its subroutines. The declarations are found by a quick pass over the tokens, which skips
+    the subroutine bodies, and a file is scanned again only when its source changed. The index lets the compiler
+    check each class against the other classes of the program.
+    """
+    def __init__(self, directory):
+        """
+        Loads the index of the given directory
+        :param directory: the directory of the jack files
+        """
+        self.__directory = directory
+        self.__path = os.path.join(directory, INDEX_FILE_NAME)
+        self.__files = {}
+        self.__is_modified = False
+
+        try:
+            with open(self.__path) as index_file:
+                content = json.load(index_file)
+        except (OSError, ValueError):
+            return  # no index yet (or a broken one) - every file is scanned
+        if content.get(VERSION_KEY) == INDEX_VERSION:
+            self.__files = content.get(FILES_KEY, {})
+
+    def get_path(self):
+        """
+        :return: the path of the index file
+        """
+        return self.__path
+
+    def is_modified(self):
+        """
+        :return: True iff the index changed since it was loaded and should be saved
+        """
+        return self.__is_modified
+
+    def update(self, jack_file):
+        """
+        Scans the jack file again if it changed since it was indexed. The size and modification time of the source
+        are checked first, and the source is hashed only if they changed.
+        :param jack_file: the path of a jack file in the directory
+        :return: True iff the declarations of the file's class changed
+        """
+        file_name = os.path.basename(jack_file)
+        entry = self.__files.get(file_name)
+        try:
+            source_stat = os.stat(jack_file)
+            if entry is not None and entry[MTIME_KEY] == source_stat.st_mtime_ns and \
+                    entry[SIZE_KEY] == source_stat.st_size:
+                return False
+            with open(jack_file, "rb") as input_file:
+                source = input_file.read()
+        except OSError:
+            return self.forget(jack_file)
+
+        source_hash = hash_source(source)
+        self.__is_modified = True
+        if entry is not None and entry[HASH_KEY] == source_hash:
+            # the file was touched only
+            entry[MTIME_KEY] = source_stat.st_mtime_ns
+            entry[SIZE_KEY] = source_stat.st_size
+            return False
+        # decodes the source the same way a file opened in text mode does
+        class_entry = scan_class(io.TextIOWrapper(io.BytesIO(source)).read())
+        self.__files[file_name] = {HASH_KEY: source_hash, MTIME_KEY: source_stat.st_mtime_ns,
+                                   SIZE_KEY: source_stat.st_size, CLASS_KEY: class_entry}
+        return entry is None or entry[CLASS_KEY] != class_entry
+
+    def forget(self, jack_file):
+        """
+        Removes the entry of the jack file
+        :param jack_file: the path of a jack file in the directory
+        :return: True iff the file had an entry
+        """
+        if self.__files.pop(os.path.basename(jack_file), None) is None:
+            return False
+        self.__is_modified = True
+        return True
+
+    def forget_removed_files(self):
+        """
+        Removes the entries of the files that no longer exist
+        :return: True iff any entry was removed
+        """
+        removed_files = [file_name for file_name in self.__files
+                         if not os.path.exists(os.path.join(self.__directory, file_name))]
+        for file_name in removed_files:
+            self.forget(file_name)
+        return bool(removed_files)
+
+    def get_classes(self):
+        """
+        :return: a dictionary from the name of each indexed class to its entry (see scan_class)
+        """
+        return {entry[CLASS_KEY][NAME_KEY]: entry[CLASS_KEY] for entry in self.__files.values()
+                if entry[CLASS_KEY] is not None}
+
+    def dumps(self):
+        """
+        Returns the content of the index file, to be saved. The index is not modified again until it changes
+        :return: the content of the index file
+        """
+        self.__is_modified = False
+        return json.dumps({VERSION_KEY: INDEX_VERSION, FILES_KEY: self.__files}, sort_keys=True)
+
+
+def scan_class(source):
+    """
+    Finds the declarations of a class, without compiling it
+    :param source: the jack code of a class
+    :return: the entry of the class: a dictionary with its name, a dictionary from the name of each static variable
+    and field to its type, and a dictionary from the name of each subroutine to its kind, return type and number
+    of parameters. None if the class declarations are not valid
+    """
+    tokenizer = JackTokenizer(io.StringIO(source))
+    tokens_amount = tokenizer.tokens_count()
+    if tokens_amount < CLASS_BODY_START:
+        return None
+    values = tokenizer.get_span(0, tokens_amount - 1)[1]
+    if values[0] != CLASS_KEYWORD:
+        return None
+
+    class_entry = {NAME_KEY: values[1], STATICS_KEY: {}, FIELDS_KEY: {}, SUBROUTINES_KEY: {}}
+    position = CLASS_BODY_START
+    try:
+        while position < tokens_amount:
+            value = values[position]
+            if value in VAR_KINDS_KEYS:
+                # static type name (, name)* ;
+                end = values.index(END_LINE_MARK, position)
+                var_type = values[position + 1]
+                for name in values[position + 2:end:2]:
+                    class_entry[VAR_KINDS_KEYS[value]][name] = var_type
+                position = end + 1
+            elif value in SUBROUTINE_KINDS:
+                # kind returnType name ( parameterList ) { body }
+                parameters_end = values.index(CLOSE_BRACKET, position)
+                parameter_tokens = parameters_end - (position + FIRST_PARAMETER_OFFSET)
+                class_entry[SUBROUTINES_KEY][values[position + 2]] = {
+                    KIND_KEY: value, RETURN_TYPE_KEY: values[position + 1],
+                    ARITY_KEY: (parameter_tokens + 1) // TOKENS_PER_PARAMETER}
+                body_end = tokenizer.find_closing(parameters_end, OPEN_BLOCK, CLOSE_BLOCK)
+                if body_end is None:
+                    return None
+                position = body_end + 1
+            else:
+                break  # the end of the class
+    except ValueError:
+        return None  # a declaration doesn't end
+    return class_entry
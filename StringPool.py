@@ -0,0 +1,124 @@
+import hashlib
+
+from VMWriter import CONSTANT_SEGMENT, STATIC_SEGMENT, FUNCTION_NAME_SEP
+
+# the names of the optimizations
+STRING_POOL = "string-pool"
+SHARED_STRING_POOL = "shared-string-pool"
+
+# the class of the pool that is shared by all the classes of a directory
+SHARED_POOL_CLASS_NAME = "StringPool"
+# the name of the function that returns a pooled string. The colon can't appear in a jack identifier, so the name
+# never clashes with a subroutine of the class
+POOL_FUNCTION_FORMAT = "string:{hash}"
+HASH_LENGTH = 16
+HASH_ENCODING = "utf-8"
+STRING_CONSTRUCTOR = "String.new"
+STRING_CONSTRUCT_NUM_ARGS = 1
+STRING_APPEND = "String.appendChar"
+STRING_APPEND_NUM_ARGS = 2
+# the characters the tokenizer un-escapes in string constants, written back as they appear in the source
+STRING_ESCAPES = (("\t", "\\t"), ("\n", "\\n"), ("\b", "\\b"), ("\r", "\\r"))
+
+
+class StringPool:
+    """
+    Interns the string constants of a class, or of all the classes of a directory. Each distinct string constant is
+    built once, by a function of the pool that creates the string on its first call, keeps it in a static variable
+    and returns the same string on every later call. A string constant in an expression is then a single call of
+    its pool function, instead of a String.new call and an appendChar call for each of its characters every time
+    the expression runs.
+    The name of each function is derived from its string, so the code that calls it doesn't depend on the other
+    strings of the pool (and can be cached).
+    """
+    def __init__(self, class_name):
+        """
+        Creates an empty pool
+        :param class_name: the name of the class the pool functions belong to
+        """
+        self.__class_name = class_name
+        self.__strings = {}  # the escaped strings of the pool, in the order they were added
+
+    def add(self, string):
+        """
+        Adds a string constant to the pool, if it isn't in it already
+        :param string: the string, as the tokenizer returns it
+        """
+        self.__strings.setdefault(escape_string(string))
+
+    def write_functions(self, writer, first_static_index, first_label):
+        """
+        Writes the pool functions, one for each string of the pool
+        :param writer: the VMWriter to write the functions with
+        :param first_static_index: the index of the first static variable that is free for the pool
+        :param first_label: the number of the first label to use
+        :return: the number of the label that follows the labels the functions used
+        """
+        label = first_label
+        for static_index, string in enumerate(self.__strings, first_static_index):
+            writer.write_function(self.__class_name, get_function_name(string), 0)
+            # the string is built on the first call only
+            writer.write_push(STATIC_SEGMENT, static_index)
+            writer.write_if(label)
+            write_string_construction(writer, string)
+            writer.write_pop(STATIC_SEGMENT, static_index)
+            writer.write_label(label)
+            writer.write_push(STATIC_SEGMENT, static_index)
+            writer.write_return()
+            writer.flush()
+            label += 1
+        return label
+
+
+def escape_string(string):
+    """
+    :param string: a string constant, as the tokenizer returns it
+    :return: the string as it appears in the source, which is the string the compiled code builds
+    """
+    for char, escaped_char in STRING_ESCAPES:
+        string = string.replace(char, escaped_char)
+    return string
+
+
+def get_function_name(string):
+    """
+    :param string: an escaped string constant
+    :return: the name (without the class name) of the pool function that returns the string
+    """
+    return POOL_FUNCTION_FORMAT.format(hash=hashlib.sha1(string.encode(HASH_ENCODING)).hexdigest()[:HASH_LENGTH])
+
+
+def get_pool_class_name(class_name, optimizations):
+    """
+    :param class_name: the name of the compiled class
+    :param optimizations: a set of the names of the enabled optimizations
+    :return: the name of the class whose pool functions return the string constants of the compiled class, or None
+    if the string constants are not pooled
+    """
+    if SHARED_STRING_POOL in optimizations:
+        return SHARED_POOL_CLASS_NAME
+    if STRING_POOL in optimizations:
+        return class_name
+    return None
+
+
+def get_pool_function(pool_class_name, string):
+    """
+    :param pool_class_name: the class of the pool
+    :param string: a string constant, as the tokenizer returns it
+    :return: the full name of the pool function that returns the string
+    """
+    return pool_class_name + FUNCTION_NAME_SEP + get_function_name(escape_string(string))
+
+
+def write_string_construction(writer, string):
+    """
+    Writes the code that creates a new string object with the characters of the string
+    :param writer: the VMWriter to write the code with
+    :param string: an escaped string constant
+    """
+    writer.write_push(CONSTANT_SEGMENT, len(string))
+    writer.write_call(STRING_CONSTRUCTOR, STRING_CONSTRUCT_NUM_ARGS)
+    for char in string:
+        writer.write_push(CONSTANT_SEGMENT, ord(char))
+        writer.write_call(STRING_APPEND, STRING_APPEND_NUM_ARGS)
@@ -0,0 +1,105 @@
+import re
+import hashlib
+import threading
+
+from VMWriter import LABEL_COMMAND, GOTO_COMMAND, IF_COMMAND, LABEL_NAME, COMMAND_SEP
+
+KEY_SEP = "\0"
+# matches the label number in every label, goto and if-goto command
+LABEL_REFERENCE_PATTERN = re.compile(r"^((?:" + "|".join(re.escape(command) for command in
+                                                         (LABEL_COMMAND, GOTO_COMMAND, IF_COMMAND)) + ")" +
+                                     re.escape(COMMAND_SEP + LABEL_NAME) + r")(\d+)$", re.MULTILINE)
+
+
+class SubroutineCache:
+    """
+    A cache of the vm code emitted for subroutines. Each entry is keyed by a hash of the subroutine's tokens and the
+    class level state the subroutine depends on, and holds the subroutine's vm code with label numbers counted from
+    zero, together with the number of labels the subroutine uses.
+    """
+    def __init__(self, entries=None, max_entries=None):
+        """
+        Creates a cache
+        :param entries: a dictionary of previously cached entries, as returned by get_used_entries
+        :param max_entries: an optional limit on the number of entries. When it is reached, the least recently used
+        entry is dropped. Meant for caches that are shared by many compilations
+        """
+        self.__entries = dict(entries or {})
+        self.__used_entries = {}
+        self.__max_entries = max_entries
+        self.__hits = 0
+        self.__misses = 0
+        self.__lock = threading.Lock()  # a cache may be shared by compilations running in several threads
+
+    def get(self, key):
+        """
+        :param key: a key created by make_key
+        :return: a tuple of the vm code and the number of labels of the subroutine, or None if it is not cached
+        """
+        with self.__lock:
+            entry = self.__entries.get(key)
+            if entry is None:
+                self.__misses += 1
+                return None
+            self.__hits += 1
+            if self.__max_entries is not None:
+                # moves the entry to the end of the dictionary, which is the most recently used end
+                del self.__entries[key]
+                self.__entries[key] = entry
+                self.__used_entries.pop(key, None)
+            self.__used_entries[key] = entry
+            return entry
+
+    def put(self, key, code, labels_amount):
+        """
+        Adds a subroutine to the cache
+        :param key: a key created by make_key
+        :param code: the vm code of the subroutine, with label numbers counted from zero
+        :param labels_amount: the number of labels the subroutine uses
+        """
+        entry = (code, labels_amount)
+        with self.__lock:
+            self.__entries[key] = entry
+            self.__used_entries[key] = entry
+            if self.__max_entries is not None and len(self.__entries) > self.__max_entries:
+                least_recently_used = next(iter(self.__entries))
+                del self.__entries[least_recently_used]
+                self.__used_entries.pop(least_recently_used, None)
+
+    def get_used_entries(self):
+        """
+        :return: the entries that were looked up or added since the cache was created. Entries of subroutines that
+        no longer exist are left out.
+        """
+        return self.__used_entries
+
+    def get_hits(self):
+        """
+        :return: the number of subroutines that were found in the cache
+        """
+        return self.__hits
+
+    def get_misses(self):
+        """
+        :return: the number of subroutines that were not found in the cache
+        """
+        return self.__misses
+
+
+def make_key(*parts):
+    """
+    :param parts: strings the cached code depends on
+    :return: a key for the cache
+    """
+    return hashlib.sha1(KEY_SEP.join(parts).encode()).hexdigest()
+
+
+def relocate_labels(code, offset):
+    """
+    :param code: vm code
+    :param offset: the number to add to every label number in the code
+    :return: the code with the label numbers shifted by the offset
+    """
+    if not offset:
+        return code
+    return LABEL_REFERENCE_PATTERN.sub(lambda match: match.group(1) + str(int(match.group(2)) + offset), code)
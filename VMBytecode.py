@@ -0,0 +1,208 @@
+import mmap
+import struct
+
+from VMWriter import VMWriter, CONSTANT_SEGMENT, LOCAL_SEGMENT, ARG_SEGMENT, STATIC_SEGMENT, POINTER_SEGMENT, \
+    TEMP_SEGMENT, THAT_SEGMENT, THIS_SEGMENT, PUSH_COMMAND, POP_COMMAND, LABEL_COMMAND, GOTO_COMMAND, IF_COMMAND, \
+    RETURN_COMMAND, FUNCTION_COMMAND, CALL_COMMAND, COMMAND_SEP, LINE_BREAK, UNARY_OP_DICT, BINARY_OP_DICT, \
+    DEFAULT_ENCODING
+
+# The binary format: a header, the instructions and then the string table, followed by the offset of the string
+# table. Each instruction is an opcode byte followed by its operands:
+#   push/pop - a segment byte and a varint index
+#   arithmetic commands - no operands
+#   label/goto/if-goto - a varint string number (the label's name)
+#   function/call - a varint string number (the function's name) and a varint number (locals/arguments)
+#   return - no operands
+# The string table is a varint count of strings, each of them a varint length followed by the encoded string.
+BYTECODE_SUFFIX = ".vmb"  # the suffix of vm bytecode files
+MAGIC = b"JVMB"
+FORMAT_VERSION = 1
+HEADER = MAGIC + bytes([FORMAT_VERSION])
+TABLE_OFFSET_FORMAT = "<I"  # the offset of the string table, at the end of the file
+TABLE_OFFSET_SIZE = struct.calcsize(TABLE_OFFSET_FORMAT)
+VARINT_DATA_BITS = 7
+VARINT_DATA_MASK = 0x7f
+VARINT_MORE_FLAG = 0x80
+SEGMENTS = (CONSTANT_SEGMENT, LOCAL_SEGMENT, ARG_SEGMENT, STATIC_SEGMENT, THIS_SEGMENT, THAT_SEGMENT,
+            POINTER_SEGMENT, TEMP_SEGMENT)
+SEGMENT_CODES = {segment: code for code, segment in enumerate(SEGMENTS)}
+ARITHMETIC_COMMANDS = tuple(BINARY_OP_DICT.values()) + tuple(UNARY_OP_DICT.values())
+# all the commands, indexed by their opcode
+COMMANDS = (PUSH_COMMAND, POP_COMMAND, LABEL_COMMAND, GOTO_COMMAND, IF_COMMAND, FUNCTION_COMMAND, CALL_COMMAND,
+            RETURN_COMMAND) + ARITHMETIC_COMMANDS
+OPCODES = {command: opcode for opcode, command in enumerate(COMMANDS)}
+SEGMENT_OPCODES = frozenset(OPCODES[command] for command in (PUSH_COMMAND, POP_COMMAND))
+NAME_OPCODES = frozenset(OPCODES[command] for command in (LABEL_COMMAND, GOTO_COMMAND, IF_COMMAND))
+NAME_NUMBER_OPCODES = frozenset(OPCODES[command] for command in (FUNCTION_COMMAND, CALL_COMMAND))
+
+
+class BinaryVMWriter(VMWriter):
+    """
+    Writes vm commands into a binary output stream, in the compact bytecode format instead of text.
+    The names of functions and labels are kept in a string table, written by close() at the end of the stream.
+    """
+    def __init__(self, output_stream, encoding=DEFAULT_ENCODING, optimizers=()):
+        """
+        Initialize a writer that writes the vm bytecode to the given binary output stream
+        :param output_stream: a binary stream to write the bytecode into
+        :param encoding: the encoding of the strings in the string table
+        :param optimizers: the optimizers to apply to the commands before they are encoded, in order
+        """
+        super().__init__(output_stream, encoding, optimizers)
+        self.__output_stream = output_stream
+        self.__encoding = encoding
+        self.__strings = {}  # the number of each string in the string table
+        self.__offset = len(HEADER)  # the number of bytes written so far
+        output_stream.write(HEADER)
+
+    def write_commands(self, commands):
+        """
+        Encodes the given vm commands and writes them to the output stream
+        :param commands: a list of vm commands, without line breaks
+        """
+        code = bytearray()
+        for command in commands:
+            parts = command.split(COMMAND_SEP)
+            opcode = OPCODES[parts[0]]
+            code.append(opcode)
+            if opcode in SEGMENT_OPCODES:
+                code.append(SEGMENT_CODES[parts[1]])
+                append_varint(code, int(parts[2]))
+            elif opcode in NAME_OPCODES:
+                append_varint(code, self.__get_string_number(parts[1]))
+            elif opcode in NAME_NUMBER_OPCODES:
+                append_varint(code, self.__get_string_number(parts[1]))
+                append_varint(code, int(parts[2]))
+        self.__output_stream.write(code)
+        self.__offset += len(code)
+
+    def close(self):
+        """
+        Flushes the remaining commands and writes the string table
+        """
+        self.flush()
+        table = bytearray()
+        append_varint(table, len(self.__strings))
+        for string in self.__strings:  # the strings are kept in the order of their numbers
+            encoded_string = string.encode(self.__encoding)
+            append_varint(table, len(encoded_string))
+            table += encoded_string
+        table += struct.pack(TABLE_OFFSET_FORMAT, self.__offset)
+        self.__output_stream.write(table)
+
+    def __get_string_number(self, string):
+        """
+        :param string: a function or label name
+        :return: the number of the string in the string table. The string is added to the table if needed
+        """
+        if string not in self.__strings:
+            self.__strings[string] = len(self.__strings)
+        return self.__strings[string]
+
+
+class BinaryVMReader:
+    """
+    Reads a vm bytecode file. The file is memory mapped, and the instructions are decoded directly from the
+    mapping while iterating, without copying the code.
+    """
+    def __init__(self, file_name, encoding=DEFAULT_ENCODING):
+        """
+        Opens the given bytecode file
+        :param file_name: the path of the bytecode file
+        :param encoding: the encoding of the strings in the string table
+        """
+        with open(file_name, "rb") as bytecode_file:
+            self.__data = mmap.mmap(bytecode_file.fileno(), 0, access=mmap.ACCESS_READ)
+        if self.__data[:len(MAGIC)] != MAGIC:
+            self.close()
+            raise ValueError("not a vm bytecode file: " + file_name)
+        self.__code_end = struct.unpack_from(TABLE_OFFSET_FORMAT, self.__data, len(self.__data) - TABLE_OFFSET_SIZE)[0]
+
+        # reads the string table
+        self.__strings = []
+        strings_amount, position = read_varint(self.__data, self.__code_end)
+        for _ in range(strings_amount):
+            length, position = read_varint(self.__data, position)
+            self.__strings.append(self.__data[position:position + length].decode(encoding))
+            position += length
+
+    def __iter__(self):
+        """
+        :return: a generator of the instructions in the file. Each instruction is a tuple of the command name and
+        its operands: the segment name and the index for push/pop, the name for label/goto/if-goto, the name and the
+        number for function/call, and no operands for the rest
+        """
+        data = self.__data
+        strings = self.__strings
+        position = len(HEADER)
+        while position < self.__code_end:
+            opcode = data[position]
+            position += 1
+            if opcode in SEGMENT_OPCODES:
+                segment = SEGMENTS[data[position]]
+                index, position = read_varint(data, position + 1)
+                yield COMMANDS[opcode], segment, index
+            elif opcode in NAME_OPCODES:
+                string_number, position = read_varint(data, position)
+                yield COMMANDS[opcode], strings[string_number]
+            elif opcode in NAME_NUMBER_OPCODES:
+                string_number, position = read_varint(data, position)
+                number, position = read_varint(data, position)
+                yield COMMANDS[opcode], strings[string_number], number
+            else:
+                yield COMMANDS[opcode],
+
+    def to_text(self):
+        """
+        :return: the vm code of the file as text, the same as the text format writes it
+        """
+        return "".join(COMMAND_SEP.join(str(part) for part in instruction) + LINE_BREAK for instruction in self)
+
+    def close(self):
+        """
+        Closes the memory mapping of the file
+        """
+        self.__data.close()
+
+    def __enter__(self):
+        """
+        :return: the reader, to be used in a with statement
+        """
+        return self
+
+    def __exit__(self, exception_type, exception_value, traceback):
+        """
+        Closes the reader at the end of a with statement
+        """
+        self.close()
+
+
+def append_varint(data, number):
+    """
+    Appends a non negative number to the data in the varint encoding: 7 bits in each byte, with the high bit set in
+    all the bytes but the last
+    :param data: a bytearray
+    :param number: a non negative number
+    """
+    while number > VARINT_DATA_MASK:
+        data.append((number & VARINT_DATA_MASK) | VARINT_MORE_FLAG)
+        number >>= VARINT_DATA_BITS
+    data.append(number)
+
+
+def read_varint(data, position):
+    """
+    Reads a number written by append_varint
+    :param data: the bytes
+    :param position: the position of the number in the data
+    :return: the number and the position after it
+    """
+    number = 0
+    shift = 0
+    while True:
+        byte = data[position]
+        position += 1
+        number |= (byte & VARINT_DATA_MASK) << shift
+        if not byte & VARINT_MORE_FLAG:
+            return number, position
+        shift += VARINT_DATA_BITS
@@ -0,0 +1,882 @@
+###########
+# imports #
+###########
+import sys
+import os
+import math
+import argparse
+
+from VMWriter import CONSTANT_SEGMENT, LOCAL_SEGMENT, ARG_SEGMENT, STATIC_SEGMENT, POINTER_SEGMENT, TEMP_SEGMENT, \
+    THAT_SEGMENT, THIS_SEGMENT, PUSH_COMMAND, POP_COMMAND, LABEL_COMMAND, GOTO_COMMAND, IF_COMMAND, RETURN_COMMAND, \
+    FUNCTION_COMMAND, CALL_COMMAND, COMMAND_SEP, UNARY_OP_DICT, BINARY_OP_DICT, VM_SUFFIX
+from VMBytecode import BinaryVMReader, BYTECODE_SUFFIX
+from Linker import ENTRY_FUNCTIONS, split_commands
+
+#############
+# constants #
+#############
+# the memory map of the Hack platform
+RAM_SIZE = 32768
+SP = 0
+LCL = 1
+ARG = 2
+THIS = 3
+THAT = 4
+TEMP_BASE = 5
+STATIC_BASE = 16
+STACK_BASE = 256
+STACK_END = 2048
+HEAP_BASE = 2048
+HEAP_END = 16384
+# the register each segment is based on, and the fixed address of the others. The local and argument registers are
+# set by the calls, while the this and that registers are set by the program, so only their accesses are checked
+INDIRECT_SEGMENTS = {LOCAL_SEGMENT: LCL, ARG_SEGMENT: ARG}
+POINTED_SEGMENTS = {THIS_SEGMENT: THIS, THAT_SEGMENT: THAT}
+DIRECT_SEGMENTS = {POINTER_SEGMENT: THIS, TEMP_SEGMENT: TEMP_BASE}
+FRAME_SIZE = 5  # the return address and the saved LCL, ARG, THIS and THAT
+RETURN_TO_HOST = -1  # the return address of the function the interpreter calls, which stops the run
+WORD_MODULUS = 1 << 16
+MAX_WORD = (1 << 15) - 1
+MIN_WORD = -(1 << 15)
+TRUE_VALUE = -1
+FALSE_VALUE = 0
+
+# the decoded instructions: an opcode and two operands. The opcodes are numbered in the order the interpreter
+# tests them, the most frequent first
+PUSH_CONSTANT = 0  # the constant
+PUSH_INDIRECT = 1  # the register of the segment and the index
+PUSH_DIRECT = 2  # the address
+POP_INDIRECT = 3
+POP_DIRECT = 4
+ADD = 5
+IF_GOTO = 6  # the address of the label
+GOTO = 7
+PUSH_POINTED = 8  # the register of the segment and the index, checked against the RAM size
+POP_POINTED = 9
+SUB = 10
+LT = 11
+GT = 12
+EQ = 13
+AND = 14
+OR = 15
+NOT = 16
+NEG = 17
+CALL = 18  # the address of the function and the number of arguments
+CALL_OS = 19  # the operating system function and the number of arguments
+FUNCTION = 20  # the number of local variables
+RETURN = 21
+ARITHMETIC_OPCODES = {BINARY_OP_DICT["+"]: ADD, BINARY_OP_DICT["-"]: SUB, BINARY_OP_DICT["<"]: LT,
+                      BINARY_OP_DICT[">"]: GT, BINARY_OP_DICT["="]: EQ, BINARY_OP_DICT["&"]: AND,
+                      BINARY_OP_DICT["|"]: OR, UNARY_OP_DICT["~"]: NOT, UNARY_OP_DICT["-"]: NEG}
+JUMP_OPCODES = {GOTO_COMMAND: GOTO, IF_COMMAND: IF_GOTO}
+
+# the error codes of the operating system (Sys.error)
+DIVIDE_BY_ZERO_ERROR = 3
+NEGATIVE_SQRT_ERROR = 4
+ALLOCATION_SIZE_ERROR = 5
+HEAP_OVERFLOW_ERROR = 6
+ARRAY_SIZE_ERROR = 2
+STRING_SIZE_ERROR = 14
+STRING_INDEX_ERROR = 15
+STRING_SET_INDEX_ERROR = 16
+STRING_FULL_ERROR = 17
+STRING_EMPTY_ERROR = 18
+STRING_SET_INT_ERROR = 19
+SYS_ERROR_FORMAT = "ERR{code}"
+# the characters of the Hack character set that are not ascii
+NEW_LINE_CHAR = 128
+BACKSPACE_CHAR = 129
+DOUBLE_QUOTE_CHAR = 34
+OUTPUT_CHARS = {NEW_LINE_CHAR: "\n"}
+# a string object: its length, its maximal length and then its characters
+STRING_MAX_LENGTH = 1
+STRING_LENGTH = 0
+STRING_CHARS = 2
+MINUS_CHAR = ord("-")
+DIGIT_CHARS = "0123456789"
+
+UNKNOWN_FUNCTION_ERROR = "{function} is neither a function of the program nor an operating system function"
+UNKNOWN_LABEL_ERROR = "the label {label} is not in the function {function}"
+OUTSIDE_FUNCTION_ERROR = "the command '{command}' is not in a function"
+DUPLICATE_FUNCTION_ERROR = "the function {function} is defined twice"
+STACK_OVERFLOW_ERROR = "stack overflow in {function}"
+ADDRESS_ERROR = "the address {address} is outside the RAM"
+COMMANDS_LIMIT_ERROR = "the program ran more than {max_commands} vm commands"
+NO_ENTRY_ERROR = "the program has none of the entry functions " + ", ".join(ENTRY_FUNCTIONS)
+REPORT_FORMAT = "{commands} vm commands executed: {jumps} jumps, {calls} calls, {os_calls} operating system calls"
+
+
+class VMError(Exception):
+    """
+    An error in a vm program that the interpreter can't run past
+    """
+
+
+class ProgramHalt(Exception):
+    """
+    Raised by the operating system functions that stop the program (Sys.halt and Sys.error)
+    """
+
+
+class VMInterpreter:
+    """
+    Runs vm code, the text the VMWriter writes (or the bytecode of the BinaryVMWriter), on the memory map of the
+    Hack platform: the stack, the frames of the calls and the objects live in a list of ints that stands for the
+    RAM, so the code behaves as it does on the cpu emulator. The commands are decoded once, when the classes are
+    loaded, into tuples of an opcode and two operands, with the labels and the called functions resolved to
+    addresses and the static variables of each class resolved to RAM addresses.
+    The operating system is made of python functions (see OS_FUNCTIONS), called with the interpreter and the list of
+    the arguments and returning the return value, and any of them can be replaced. The interpreter counts the
+    commands, jumps and calls it executes, to compare the code of different optimizations.
+    """
+    def __init__(self, os_functions=None, input_text="", max_commands=None):
+        """
+        Creates an interpreter with no code
+        :param os_functions: an optional dictionary from function names to python functions, which add to or replace
+        the operating system functions
+        :param input_text: the text the keyboard functions read
+        :param max_commands: the number of commands after which a run is stopped with a VMError, or None for no limit
+        """
+        self.__os_functions = dict(OS_FUNCTIONS)
+        if os_functions is not None:
+            self.__os_functions.update(os_functions)
+        self.__input_text = input_text
+        self.__max_commands = max_commands
+        self.__ram = [0] * RAM_SIZE
+        self.__classes = []  # the name and the commands of each loaded class, until they are decoded
+        self.__code = None  # the decoded instructions
+        self.__function_addresses = {}
+        self.__function_names = {}  # the name of the function at each function address
+        self.__output = []
+        self.__input_position = 0
+        self.__heap_top = HEAP_BASE
+        self.__free_blocks = []  # the address and the size of each freed block of the heap
+        self.__executed_commands = 0
+        self.__executed_jumps = 0
+        self.__executed_calls = 0
+        self.__os_calls = 0
+
+    def load_class(self, class_name, commands):
+        """
+        Adds the code of a class (a vm file) to the program
+        :param class_name: the name of the class, whose static variables the commands use
+        :param commands: a list of vm commands, as text without line breaks or as instruction tuples (see
+        BinaryVMReader)
+        """
+        self.__classes.append((class_name, [parse_command(command) if isinstance(command, str) else command
+                                            for command in commands]))
+        self.__code = None
+
+    def load_file(self, file_name):
+        """
+        Adds the code of a vm file (or bytecode file) to the program
+        :param file_name: the path of the file
+        """
+        class_name = os.path.splitext(os.path.basename(file_name))[0]
+        if file_name.endswith(BYTECODE_SUFFIX):
+            with BinaryVMReader(file_name) as reader:
+                self.load_class(class_name, list(reader))
+        else:
+            with open(file_name) as vm_file:
+                self.load_class(class_name, split_commands(vm_file.read()))
+
+    def load_paths(self, paths):
+        """
+        Adds the vm files (and bytecode files) of the given files and directories to the program
+        :param paths: a list of paths of files and directories
+        """
+        for path in paths:
+            if os.path.isdir(path):
+                for file_name in sorted(os.listdir(path)):
+                    if file_name.endswith((VM_SUFFIX, BYTECODE_SUFFIX)):
+                        self.load_file(os.path.join(path, file_name))
+            else:
+                self.load_file(path)
+
+    def get_output(self):
+        """
+        :return: the text the program printed
+        """
+        return "".join(self.__output)
+
+    def get_executed_commands(self):
+        """
+        :return: the number of vm commands the last run executed (labels are not executed)
+        """
+        return self.__executed_commands
+
+    def get_executed_jumps(self):
+        """
+        :return: the number of goto and if-goto commands the last run executed
+        """
+        return self.__executed_jumps
+
+    def get_executed_calls(self):
+        """
+        :return: the number of calls of functions of the program the last run executed
+        """
+        return self.__executed_calls
+
+    def get_os_calls(self):
+        """
+        :return: the number of calls of operating system functions the last run executed
+        """
+        return self.__os_calls
+
+    def get_report(self):
+        """
+        :return: a line with the counts of the last run
+        """
+        return REPORT_FORMAT.format(commands=self.__executed_commands, jumps=self.__executed_jumps,
+                                    calls=self.__executed_calls, os_calls=self.__os_calls)
+
+    def run(self):
+        """
+        Runs the program from its entry function: Sys.init, or Main.main when the program has no Sys class (the
+        operating system's Sys.init calls Main.main). The run ends when the entry function returns or the program
+        halts
+        """
+        self.__decode()
+        for function_name in ENTRY_FUNCTIONS:
+            if function_name in self.__function_addresses:
+                self.call_function(function_name, [])
+                return
+        raise VMError(NO_ENTRY_ERROR)
+
+    def call_function(self, function_name, arguments):
+        """
+        Calls a function of the program with fresh memory, and runs it until it returns or the program halts
+        :param function_name: the full name of the function
+        :param arguments: a list of the arguments
+        :return: the return value of the function, or None if the program halted
+        """
+        self.__decode()
+        if function_name not in self.__function_addresses:
+            raise VMError(UNKNOWN_FUNCTION_ERROR.format(function=function_name))
+        ram = self.__ram
+        ram[:] = [0] * RAM_SIZE
+        self.__output = []
+        self.__input_position = 0
+        self.__heap_top = HEAP_BASE
+        self.__free_blocks = []
+        self.__executed_commands = 0
+        self.__executed_jumps = 0
+        self.__executed_calls = 0
+        self.__os_calls = 0
+
+        # the frame of a call from the host, which returns to RETURN_TO_HOST
+        stack_pointer = STACK_BASE
+        for argument in arguments:
+            ram[stack_pointer] = argument
+            stack_pointer += 1
+        ram[stack_pointer] = RETURN_TO_HOST
+        ram[ARG] = stack_pointer - len(arguments)
+        ram[SP] = stack_pointer + FRAME_SIZE
+        ram[LCL] = ram[SP]
+        try:
+            self.__execute(self.__function_addresses[function_name])
+        except ProgramHalt:
+            return None
+        return ram[ram[SP] - 1]
+
+    def __decode(self):
+        """
+        Decodes the commands of the loaded classes into instructions, if they changed since they were decoded
+        """
+        if self.__code is not None:
+            return
+        code = []
+        function_addresses = {}
+        labels = {}  # the address of each label, by the function and the label name
+        jumps = []  # the address, the function and the label of each jump, resolved when all the labels are known
+        calls = []  # the address and the function of each call, resolved when all the functions are known
+        static_base = STATIC_BASE
+        for class_name, commands in self.__classes:
+            function_name = None
+            statics_amount = 0
+            for command in commands:
+                name = command[0]
+                if name == FUNCTION_COMMAND:
+                    function_name = command[1]
+                    if function_name in function_addresses:
+                        raise VMError(DUPLICATE_FUNCTION_ERROR.format(function=function_name))
+                    function_addresses[function_name] = len(code)
+                    code.append((FUNCTION, int(command[2]), 0))
+                    continue
+                if function_name is None:
+                    raise VMError(OUTSIDE_FUNCTION_ERROR.format(command=COMMAND_SEP.join(map(str, command))))
+                if name == PUSH_COMMAND or name == POP_COMMAND:
+                    segment = command[1]
+                    index = int(command[2])
+                    if segment == CONSTANT_SEGMENT:
+                        code.append((PUSH_CONSTANT, index, 0))
+                    elif segment in INDIRECT_SEGMENTS:
+                        code.append((PUSH_INDIRECT if name == PUSH_COMMAND else POP_INDIRECT,
+                                     INDIRECT_SEGMENTS[segment], index))
+                    elif segment in POINTED_SEGMENTS:
+                        code.append((PUSH_POINTED if name == PUSH_COMMAND else POP_POINTED,
+                                     POINTED_SEGMENTS[segment], index))
+                    else:
+                        if segment == STATIC_SEGMENT:
+                            address = static_base + index
+                            statics_amount = max(statics_amount, index + 1)
+                        else:
+                            address = DIRECT_SEGMENTS[segment] + index
+                        code.append((PUSH_DIRECT if name == PUSH_COMMAND else POP_DIRECT, address, 0))
+                elif name in ARITHMETIC_OPCODES:
+                    code.append((ARITHMETIC_OPCODES[name], 0, 0))
+                elif name == LABEL_COMMAND:
+                    labels[function_name, command[1]] = len(code)  # labels are not executed
+                elif name in JUMP_OPCODES:
+                    jumps.append((len(code), function_name, command[1]))
+                    code.append((JUMP_OPCODES[name], 0, 0))
+                elif name == CALL_COMMAND:
+                    calls.append((len(code), command[1]))
+                    code.append((CALL, 0, int(command[2])))
+                elif name == RETURN_COMMAND:
+                    code.append((RETURN, 0, 0))
+            static_base += statics_amount
+
+        for address, function_name, label in jumps:
+            if (function_name, label) not in labels:
+                raise VMError(UNKNOWN_LABEL_ERROR.format(label=label, function=function_name))
+            code[address] = (code[address][0], labels[function_name, label], 0)
+        for address, function_name in calls:
+            arguments_amount = code[address][2]
+            if function_name in function_addresses:
+                code[address] = (CALL, function_addresses[function_name], arguments_amount)
+            else:
+                code[address] = (CALL_OS, function_name, arguments_amount)
+        self.__code = code
+        self.__function_addresses = function_addresses
+        self.__function_names = {address: function_name for function_name, address in function_addresses.items()}
+
+    def __execute(self, address):
+        """
+        Runs the instructions from the given address until the function called from the host returns
+        :param address: the address of the first instruction to run
+        """
+        code = self.__code
+        ram = self.__ram
+        os_functions = self.__os_functions
+        max_commands = self.__max_commands
+        # the limit is checked on the calls and on the backward jumps, so every loop and recursion runs into it
+        commands_limit = math.inf if max_commands is None else max_commands
+        executed_commands = 0
+        executed_jumps = 0
+        executed_calls = 0
+        os_calls = 0
+        stack_pointer = ram[SP]
+        program_counter = address
+        try:
+            while True:
+                opcode, first, second = code[program_counter]
+                program_counter += 1
+                executed_commands += 1
+                if opcode == PUSH_CONSTANT:
+                    ram[stack_pointer] = first
+                    stack_pointer += 1
+                elif opcode == PUSH_INDIRECT:
+                    ram[stack_pointer] = ram[ram[first] + second]
+                    stack_pointer += 1
+                elif opcode == PUSH_DIRECT:
+                    ram[stack_pointer] = ram[first]
+                    stack_pointer += 1
+                elif opcode == POP_INDIRECT:
+                    stack_pointer -= 1
+                    ram[ram[first] + second] = ram[stack_pointer]
+                elif opcode == POP_DIRECT:
+                    stack_pointer -= 1
+                    ram[first] = ram[stack_pointer]
+                elif opcode == ADD:
+                    stack_pointer -= 1
+                    value = ram[stack_pointer - 1] + ram[stack_pointer]
+                    if value > MAX_WORD:
+                        value -= WORD_MODULUS
+                    elif value < MIN_WORD:
+                        value += WORD_MODULUS
+                    ram[stack_pointer - 1] = value
+                elif opcode == IF_GOTO:
+                    executed_jumps += 1
+                    stack_pointer -= 1
+                    if ram[stack_pointer]:
+                        if first < program_counter and executed_commands > commands_limit:
+                            raise VMError(COMMANDS_LIMIT_ERROR.format(max_commands=max_commands))
+                        program_counter = first
+                elif opcode == GOTO:
+                    executed_jumps += 1
+                    if first < program_counter and executed_commands > commands_limit:
+                        raise VMError(COMMANDS_LIMIT_ERROR.format(max_commands=max_commands))
+                    program_counter = first
+                elif opcode == PUSH_POINTED:
+                    pointed_address = ram[first] + second
+                    if not 0 <= pointed_address < RAM_SIZE:
+                        raise VMError(ADDRESS_ERROR.format(address=pointed_address))
+                    ram[stack_pointer] = ram[pointed_address]
+                    stack_pointer += 1
+                elif opcode == POP_POINTED:
+                    pointed_address = ram[first] + second
+                    if not 0 <= pointed_address < RAM_SIZE:
+                        raise VMError(ADDRESS_ERROR.format(address=pointed_address))
+                    stack_pointer -= 1
+                    ram[pointed_address] = ram[stack_pointer]
+                elif opcode == SUB:
+                    stack_pointer -= 1
+                    value = ram[stack_pointer - 1] - ram[stack_pointer]
+                    if value > MAX_WORD:
+                        value -= WORD_MODULUS
+                    elif value < MIN_WORD:
+                        value += WORD_MODULUS
+                    ram[stack_pointer - 1] = value
+                elif opcode == LT:
+                    stack_pointer -= 1
+                    ram[stack_pointer - 1] = TRUE_VALUE if ram[stack_pointer - 1] < ram[stack_pointer] \
+                        else FALSE_VALUE
+                elif opcode == GT:
+                    stack_pointer -= 1
+                    ram[stack_pointer - 1] = TRUE_VALUE if ram[stack_pointer - 1] > ram[stack_pointer] \
+                        else FALSE_VALUE
+                elif opcode == EQ:
+                    stack_pointer -= 1
+                    ram[stack_pointer - 1] = TRUE_VALUE if ram[stack_pointer - 1] == ram[stack_pointer] \
+                        else FALSE_VALUE
+                elif opcode == AND:
+                    stack_pointer -= 1
+                    ram[stack_pointer - 1] &= ram[stack_pointer]
+                elif opcode == OR:
+                    stack_pointer -= 1
+                    ram[stack_pointer - 1] |= ram[stack_pointer]
+                elif opcode == NOT:
+                    ram[stack_pointer - 1] = ~ram[stack_pointer - 1]
+                elif opcode == NEG:
+                    value = -ram[stack_pointer - 1]
+                    ram[stack_pointer - 1] = MIN_WORD if value > MAX_WORD else value
+                elif opcode == CALL:
+                    executed_calls += 1
+                    ram[stack_pointer] = program_counter
+                    ram[stack_pointer + 1] = ram[LCL]
+                    ram[stack_pointer + 2] = ram[ARG]
+                    ram[stack_pointer + 3] = ram[THIS]
+                    ram[stack_pointer + 4] = ram[THAT]
+                    ram[ARG] = stack_pointer - second
+                    stack_pointer += FRAME_SIZE
+                    ram[LCL] = stack_pointer
+                    program_counter = first
+                elif opcode == FUNCTION:
+                    if stack_pointer + first >= STACK_END:
+                        raise VMError(STACK_OVERFLOW_ERROR.format(
+                            function=self.__function_names[program_counter - 1]))
+                    ram[stack_pointer:stack_pointer + first] = [0] * first
+                    stack_pointer += first
+                    if executed_commands > commands_limit:
+                        raise VMError(COMMANDS_LIMIT_ERROR.format(max_commands=max_commands))
+                elif opcode == RETURN:
+                    frame = ram[LCL]
+                    program_counter = ram[frame - FRAME_SIZE]
+                    argument = ram[ARG]
+                    ram[argument] = ram[stack_pointer - 1]
+                    stack_pointer = argument + 1
+                    ram[THAT] = ram[frame - 1]
+                    ram[THIS] = ram[frame - 2]
+                    ram[ARG] = ram[frame - 3]
+                    ram[LCL] = ram[frame - 4]
+                    if program_counter == RETURN_TO_HOST:
+                        break
+                else:
+                    # CALL_OS
+                    os_calls += 1
+                    stack_pointer -= second
+                    ram[SP] = stack_pointer
+                    if first not in os_functions:
+                        raise VMError(UNKNOWN_FUNCTION_ERROR.format(function=first))
+                    value = os_functions[first](self, ram[stack_pointer:stack_pointer + second])
+                    ram[stack_pointer] = value or 0
+                    stack_pointer += 1
+                    if executed_commands > commands_limit:
+                        raise VMError(COMMANDS_LIMIT_ERROR.format(max_commands=max_commands))
+        finally:
+            ram[SP] = stack_pointer
+            self.__executed_commands += executed_commands
+            self.__executed_jumps += executed_jumps
+            self.__executed_calls += executed_calls
+            self.__os_calls += os_calls
+
+    def peek(self, address):
+        """
+        :param address: a RAM address
+        :return: the value in the address
+        """
+        if not 0 <= address < RAM_SIZE:
+            raise VMError(ADDRESS_ERROR.format(address=address))
+        return self.__ram[address]
+
+    def poke(self, address, value):
+        """
+        Sets the value in a RAM address
+        :param address: a RAM address
+        :param value: the value, a 16-bit word
+        """
+        if not 0 <= address < RAM_SIZE:
+            raise VMError(ADDRESS_ERROR.format(address=address))
+        self.__ram[address] = value
+
+    def alloc(self, size):
+        """
+        Allocates a block of the heap. The size of each block is kept in the word before it, as the operating system
+        does
+        :param size: the number of words to allocate
+        :return: the address of the block
+        """
+        if size <= 0:
+            self.error(ALLOCATION_SIZE_ERROR)
+        for position, (address, block_size) in enumerate(self.__free_blocks):
+            if block_size >= size:
+                del self.__free_blocks[position]
+                return address
+        address = self.__heap_top + 1
+        if address + size > HEAP_END:
+            self.error(HEAP_OVERFLOW_ERROR)
+        self.__ram[address - 1] = size
+        self.__heap_top = address + size
+        return address
+
+    def free(self, address):
+        """
+        Returns a block that alloc allocated to the heap
+        :param address: the address of the block
+        """
+        self.__free_blocks.append((address, self.__ram[address - 1]))
+
+    def write_output(self, text):
+        """
+        Adds text to the output of the program
+        :param text: the text
+        """
+        self.__output.append(text)
+
+    def erase_output(self):
+        """
+        Removes the last character of the output of the program, if there is one
+        """
+        while self.__output and not self.__output[-1]:
+            self.__output.pop()
+        if self.__output:
+            self.__output[-1] = self.__output[-1][:-1]
+
+    def read_input(self):
+        """
+        :return: the next character of the input text (as a character code), or a new line when the input ended
+        """
+        if self.__input_position >= len(self.__input_text):
+            return NEW_LINE_CHAR
+        char = self.__input_text[self.__input_position]
+        self.__input_position += 1
+        return NEW_LINE_CHAR if char == "\n" else ord(char)
+
+    def halt(self):
+        """
+        Stops the program
+        """
+        raise ProgramHalt()
+
+    def error(self, code):
+        """
+        Prints the error code of the operating system and stops the program, as Sys.error does
+        :param code: the error code
+        """
+        self.write_output(SYS_ERROR_FORMAT.format(code=code))
+        self.halt()
+
+
+def parse_command(command):
+    """
+    :param command: a vm command, as text without a line break
+    :return: the instruction tuple of the command (see BinaryVMReader), with the numbers as ints
+    """
+    parts = command.split()
+    if parts[0] in (PUSH_COMMAND, POP_COMMAND, FUNCTION_COMMAND, CALL_COMMAND):
+        return parts[0], parts[1], int(parts[2])
+    return tuple(parts)
+
+
+def to_word(value):
+    """
+    :param value: an integer
+    :return: the value wrapped into a signed 16-bit word
+    """
+    value %= WORD_MODULUS
+    return value - WORD_MODULUS if value > MAX_WORD else value
+
+
+##############################
+# operating system functions #
+##############################
+def math_divide(interpreter, arguments):
+    """
+    Math.divide: divides, truncating towards zero
+    """
+    dividend, divisor = arguments
+    if divisor == 0:
+        interpreter.error(DIVIDE_BY_ZERO_ERROR)
+    quotient = abs(dividend) // abs(divisor)
+    return to_word(quotient if (dividend < 0) == (divisor < 0) else -quotient)
+
+
+def math_sqrt(interpreter, arguments):
+    """
+    Math.sqrt: the integer part of the square root
+    """
+    if arguments[0] < 0:
+        interpreter.error(NEGATIVE_SQRT_ERROR)
+    return math.isqrt(arguments[0])
+
+
+def array_new(interpreter, arguments):
+    """
+    Array.new: allocates an array
+    """
+    if arguments[0] <= 0:
+        interpreter.error(ARRAY_SIZE_ERROR)
+    return interpreter.alloc(arguments[0])
+
+
+def string_new(interpreter, arguments):
+    """
+    String.new: allocates an empty string with the given maximal length
+    """
+    max_length = arguments[0]
+    if max_length < 0:
+        interpreter.error(STRING_SIZE_ERROR)
+    string = interpreter.alloc(STRING_CHARS + max_length)
+    interpreter.poke(string + STRING_MAX_LENGTH, max_length)
+    interpreter.poke(string + STRING_LENGTH, 0)
+    return string
+
+
+def get_string_text(interpreter, string):
+    """
+    :param interpreter: the VMInterpreter
+    :param string: the address of a string object
+    :return: the characters of the string, as a python string
+    """
+    return "".join(OUTPUT_CHARS.get(interpreter.peek(string + STRING_CHARS + position),
+                                    chr(interpreter.peek(string + STRING_CHARS + position)))
+                   for position in range(interpreter.peek(string + STRING_LENGTH)))
+
+
+def string_char_at(interpreter, arguments):
+    """
+    String.charAt: the character at the given index
+    """
+    string, index = arguments
+    if not 0 <= index < interpreter.peek(string + STRING_LENGTH):
+        interpreter.error(STRING_INDEX_ERROR)
+    return interpreter.peek(string + STRING_CHARS + index)
+
+
+def string_set_char_at(interpreter, arguments):
+    """
+    String.setCharAt: replaces the character at the given index
+    """
+    string, index, char = arguments
+    if not 0 <= index < interpreter.peek(string + STRING_LENGTH):
+        interpreter.error(STRING_SET_INDEX_ERROR)
+    interpreter.poke(string + STRING_CHARS + index, char)
+
+
+def string_append_char(interpreter, arguments):
+    """
+    String.appendChar: appends a character and returns the string
+    """
+    string, char = arguments
+    length = interpreter.peek(string + STRING_LENGTH)
+    if length >= interpreter.peek(string + STRING_MAX_LENGTH):
+        interpreter.error(STRING_FULL_ERROR)
+    interpreter.poke(string + STRING_CHARS + length, char)
+    interpreter.poke(string + STRING_LENGTH, length + 1)
+    return string
+
+
+def string_erase_last_char(interpreter, arguments):
+    """
+    String.eraseLastChar: removes the last character
+    """
+    string = arguments[0]
+    length = interpreter.peek(string + STRING_LENGTH)
+    if length == 0:
+        interpreter.error(STRING_EMPTY_ERROR)
+    interpreter.poke(string + STRING_LENGTH, length - 1)
+
+
+def string_int_value(interpreter, arguments):
+    """
+    String.intValue: the integer value of the digits at the start of the string (after an optional minus)
+    """
+    text = get_string_text(interpreter, arguments[0])
+    sign = 1
+    if text[:1] == chr(MINUS_CHAR):
+        sign = -1
+        text = text[1:]
+    value = 0
+    for char in text:
+        if char not in DIGIT_CHARS:
+            break
+        value = value * 10 + DIGIT_CHARS.index(char)
+    return to_word(sign * value)
+
+
+def string_set_int(interpreter, arguments):
+    """
+    String.setInt: sets the string to the digits of the given integer
+    """
+    string, value = arguments
+    text = str(value)
+    if len(text) > interpreter.peek(string + STRING_MAX_LENGTH):
+        interpreter.error(STRING_SET_INT_ERROR)
+    for position, char in enumerate(text):
+        interpreter.poke(string + STRING_CHARS + position, ord(char))
+    interpreter.poke(string + STRING_LENGTH, len(text))
+
+
+def output_print_char(interpreter, arguments):
+    """
+    Output.printChar: prints a character
+    """
+    char = arguments[0]
+    if char == BACKSPACE_CHAR:
+        interpreter.erase_output()
+    else:
+        interpreter.write_output(OUTPUT_CHARS.get(char, chr(char)))
+
+
+def keyboard_read_char(interpreter, arguments):
+    """
+    Keyboard.readChar: reads the next character of the input text and echoes it
+    """
+    char = interpreter.read_input()
+    output_print_char(interpreter, [char])
+    return char
+
+
+def keyboard_read_line(interpreter, arguments):
+    """
+    Keyboard.readLine: prints the message, and reads a line of the input text into a new string
+    """
+    interpreter.write_output(get_string_text(interpreter, arguments[0]))
+    chars = []
+    char = interpreter.read_input()
+    while char != NEW_LINE_CHAR:
+        chars.append(char)
+        char = interpreter.read_input()
+    interpreter.write_output("".join(map(chr, chars)) + OUTPUT_CHARS[NEW_LINE_CHAR])
+    string = string_new(interpreter, [len(chars)])
+    for char in chars:
+        string_append_char(interpreter, [string, char])
+    return string
+
+
+def keyboard_read_int(interpreter, arguments):
+    """
+    Keyboard.readInt: prints the message, and reads a line of the input text as an integer
+    """
+    return string_int_value(interpreter, [keyboard_read_line(interpreter, arguments)])
+
+
+def do_nothing(interpreter, arguments):
+    """
+    The functions of the screen, and the others that have no effect on the text output
+    """
+
+
+# the operating system functions: each gets the interpreter and the list of the arguments, and returns the return
+# value (None for 0)
+OS_FUNCTIONS = {
+    "Math.init": do_nothing,
+    "Math.multiply": lambda interpreter, arguments: to_word(arguments[0] * arguments[1]),
+    "Math.divide": math_divide,
+    "Math.min": lambda interpreter, arguments: min(arguments),
+    "Math.max": lambda interpreter, arguments: max(arguments),
+    "Math.abs": lambda interpreter, arguments: to_word(abs(arguments[0])),
+    "Math.sqrt": math_sqrt,
+    "Memory.init": do_nothing,
+    "Memory.peek": lambda interpreter, arguments: interpreter.peek(arguments[0]),
+    "Memory.poke": lambda interpreter, arguments: interpreter.poke(arguments[0], arguments[1]),
+    "Memory.alloc": lambda interpreter, arguments: interpreter.alloc(arguments[0]),
+    "Memory.deAlloc": lambda interpreter, arguments: interpreter.free(arguments[0]),
+    "Array.new": array_new,
+    "Array.dispose": lambda interpreter, arguments: interpreter.free(arguments[0]),
+    "String.new": string_new,
+    "String.dispose": lambda interpreter, arguments: interpreter.free(arguments[0]),
+    "String.length": lambda interpreter, arguments: interpreter.peek(arguments[0] + STRING_LENGTH),
+    "String.charAt": string_char_at,
+    "String.setCharAt": string_set_char_at,
+    "String.appendChar": string_append_char,
+    "String.eraseLastChar": string_erase_last_char,
+    "String.intValue": string_int_value,
+    "String.setInt": string_set_int,
+    "String.backSpace": lambda interpreter, arguments: BACKSPACE_CHAR,
+    "String.doubleQuote": lambda interpreter, arguments: DOUBLE_QUOTE_CHAR,
+    "String.newLine": lambda interpreter, arguments: NEW_LINE_CHAR,
+    "Output.init": do_nothing,
+    "Output.moveCursor": do_nothing,
+    "Output.printChar": output_print_char,
+    "Output.printString": lambda interpreter, arguments: interpreter.write_output(
+        get_string_text(interpreter, arguments[0])),
+    "Output.printInt": lambda interpreter, arguments: interpreter.write_output(str(arguments[0])),
+    "Output.println": lambda interpreter, arguments: interpreter.write_output(OUTPUT_CHARS[NEW_LINE_CHAR]),
+    "Output.backSpace": lambda interpreter, arguments: interpreter.erase_output(),
+    "Keyboard.init": do_nothing,
+    "Keyboard.keyPressed": do_nothing,
+    "Keyboard.readChar": keyboard_read_char,
+    "Keyboard.readLine": keyboard_read_line,
+    "Keyboard.readInt": keyboard_read_int,
+    "Screen.init": do_nothing,
+    "Screen.clearScreen": do_nothing,
+    "Screen.setColor": do_nothing,
+    "Screen.drawPixel": do_nothing,
+    "Screen.drawLine": do_nothing,
+    "Screen.drawRectangle": do_nothing,
+    "Screen.drawCircle": do_nothing,
+    "Sys.init": do_nothing,
+    "Sys.halt": lambda interpreter, arguments: interpreter.halt(),
+    "Sys.error": lambda interpreter, arguments: interpreter.error(arguments[0]),
+    "Sys.wait": do_nothing,
+}
+
+
+def print_output(output):
+    """
+    Prints the output of a program, ending it with a line break if it doesn't end with one
+    :param output: the text the program printed
+    """
+    if output:
+        print(output, end="" if output.endswith(OUTPUT_CHARS[NEW_LINE_CHAR]) else None)
+
+
+def parse_arguments(arguments):
+    """
+    :param arguments: the command line arguments, without the program name
+    :return: the parsed arguments
+    """
+    parser = argparse.ArgumentParser(description="Runs compiled vm code and counts the commands it executes.")
+    parser.add_argument("paths", nargs="+", metavar="PATH",
+                        help="vm files (or bytecode files) and directories of vm files")
+    parser.add_argument("--max-commands", type=int, default=None,
+                        help="stop the program after this number of vm commands")
+    parser.add_argument("--input", default="", help="the text the keyboard functions read")
+    return parser.parse_args(arguments)
+
+
+# main part
+if __name__ == '__main__':
+    args = parse_arguments(sys.argv[1:])
+    interpreter = VMInterpreter(input_text=args.input, max_commands=args.max_commands)
+    try:
+        interpreter.load_paths(args.paths)
+        interpreter.run()
+    except (OSError, ValueError, VMError) as error:
+        print_output(interpreter.get_output())
+        print(error, file=sys.stderr)
+        sys.exit(1)
+    print_output(interpreter.get_output())
+    print(interpreter.get_report(), file=sys.stderr)
@@ -1,3 +1,5 @@
+import io
+
 from SymbolTable import STATIC_SEGMENT_KEYWORD, FIELD_SEGMENT_KEYWORD, ARG_SEGMENT_KEYWORD, \
     VAR_SEGMENT_KEYWORD
 
@@ -18,6 +20,7 @@ RETURN_COMMAND = "return"
 FUNCTION_COMMAND = "function"
 CALL_COMMAND = "call"
 COMMAND_SEP = " "
+VM_SUFFIX = ".vm"  # the suffix of vm text files
 SEGMENTS_DICT = {STATIC_SEGMENT_KEYWORD: STATIC_SEGMENT, ARG_SEGMENT_KEYWORD: ARG_SEGMENT,
                  VAR_SEGMENT_KEYWORD: LOCAL_SEGMENT, FIELD_SEGMENT_KEYWORD: THIS_SEGMENT}
 MATH_DICT = {"*": "Math.multiply", "/": "Math.divide"}
@@ -27,18 +30,30 @@ BINARY_OP_DICT = {"+": "add", "-": "sub", "&": "and", "|": "or", ">": "gt", "<":
 LABEL_NAME = "L"
 LINE_BREAK = "\n"
 FUNCTION_NAME_SEP = "."
+DEFAULT_ENCODING = "utf-8"
+BINARY_MODE_MARK = "b"
 
 
 class VMWriter:
     """
-    VMWriter class. The class writes vm commands into a given output stream
+    VMWriter class. The class writes vm commands into a given output stream.
+    The commands are collected in a buffer, and written to the stream in a single write call when flush is called
+    (the compilation engine flushes after every subroutine).
     """
-    def __init__(self, output_stream):
+    def __init__(self, output_stream, encoding=DEFAULT_ENCODING, optimizers=()):
         """
         Initialize VMWriter object that writes the vm commands to the given output stream
-        :param output_stream: the stream to write the vm command into
+        :param output_stream: the stream to write the vm command into. Either a text stream or a binary stream
+        :param encoding: the encoding of the vm code, used when the output stream is a binary stream
+        :param optimizers: the optimizers (such as a PeepholeOptimizer) to apply to the buffered commands when they
+        are flushed, in order
         """
         self.__output_stream = output_stream
+        self.__buffer = []  # the vm commands that were not written yet, without line breaks
+        self.__optimizers = optimizers
+        self.__encoding = None
+        if is_binary_stream(output_stream):
+            self.__encoding = encoding
 
     def write_push(self, segment, index):
         """
@@ -49,7 +64,7 @@ class VMWriter:
         if segment in SEGMENTS_DICT:
             segment = SEGMENTS_DICT[segment]
 
-        self.__output_stream.write(PUSH_COMMAND + COMMAND_SEP + segment + COMMAND_SEP + str(index) + LINE_BREAK)
+        self.__buffer.append(PUSH_COMMAND + COMMAND_SEP + segment + COMMAND_SEP + str(index))
 
     def write_pop(self, segment, index):
         """
@@ -60,7 +75,7 @@ class VMWriter:
         if segment in SEGMENTS_DICT:
             segment = SEGMENTS_DICT[segment]
 
-        self.__output_stream.write(POP_COMMAND + COMMAND_SEP + segment + COMMAND_SEP + str(index) + LINE_BREAK)
+        self.__buffer.append(POP_COMMAND + COMMAND_SEP + segment + COMMAND_SEP + str(index))
 
     def write_arithmetic(self, command, is_unary=False):
         """
@@ -69,34 +84,34 @@ class VMWriter:
         :param is_unary: checks if the operation is an unary operation
         """
         if is_unary:
-            self.__output_stream.write(UNARY_OP_DICT[command] + LINE_BREAK)
+            self.__buffer.append(UNARY_OP_DICT[command])
             return
 
         if command in MATH_DICT:
             self.write_call(MATH_DICT[command], MATH_NUM_ARGS)
         else:
-            self.__output_stream.write(BINARY_OP_DICT[command] + LINE_BREAK)
+            self.__buffer.append(BINARY_OP_DICT[command])
 
     def write_label(self, label):
         """
         Writes a VM label command
         :param label: The number (index) of the label to create
         """
-        self.__output_stream.write(LABEL_COMMAND + COMMAND_SEP + LABEL_NAME + str(label) + LINE_BREAK)
+        self.__buffer.append(LABEL_COMMAND + COMMAND_SEP + LABEL_NAME + str(label))
 
     def write_goto(self, label):
         """
         Writes a VM goto command
         :param label: The number (index) of the label to create
         """
-        self.__output_stream.write(GOTO_COMMAND + COMMAND_SEP + LABEL_NAME + str(label) + LINE_BREAK)
+        self.__buffer.append(GOTO_COMMAND + COMMAND_SEP + LABEL_NAME + str(label))
 
     def write_if(self, label):
         """
         Writes a VM If-goto command
         :param label: The number (index) of the label to create
         """
-        self.__output_stream.write(IF_COMMAND + COMMAND_SEP + LABEL_NAME + str(label) + LINE_BREAK)
+        self.__buffer.append(IF_COMMAND + COMMAND_SEP + LABEL_NAME + str(label))
 
     def write_call(self, name, n_args):
         """
@@ -104,7 +119,7 @@ class VMWriter:
         :param name: the called function name
         :param n_args: the number of arguments passed to the function
         """
-        self.__output_stream.write(CALL_COMMAND + COMMAND_SEP + name + COMMAND_SEP + str(n_args) + LINE_BREAK)
+        self.__buffer.append(CALL_COMMAND + COMMAND_SEP + name + COMMAND_SEP + str(n_args))
 
     def write_function(self, class_name, name, n_locals):
         """
@@ -113,11 +128,67 @@ class VMWriter:
         :param name: the function name
         :param n_locals: the number of local variable the function needs
         """
-        self.__output_stream.write(FUNCTION_COMMAND + COMMAND_SEP + class_name + FUNCTION_NAME_SEP + name +
-                                   COMMAND_SEP + str(n_locals) + LINE_BREAK)
+        self.__buffer.append(FUNCTION_COMMAND + COMMAND_SEP + class_name + FUNCTION_NAME_SEP + name +
+                             COMMAND_SEP + str(n_locals))
 
     def write_return(self):
         """
         Writes a VM return command
         """
-        self.__output_stream.write(RETURN_COMMAND + LINE_BREAK)
+        self.__buffer.append(RETURN_COMMAND)
+
+    def write_code(self, code):
+        """
+        Writes vm code that was already generated, as is
+        :param code: vm commands, each ending with a line break
+        """
+        self.__buffer.extend(code.splitlines())
+
+    def get_code(self):
+        """
+        :return: the vm code of the commands that were not flushed yet
+        """
+        if not self.__buffer:
+            return ""
+        return LINE_BREAK.join(self.__buffer) + LINE_BREAK
+
+    def flush(self):
+        """
+        Writes all the buffered commands to the output stream
+        """
+        commands = self.__buffer
+        self.__buffer = []
+        for optimizer in self.__optimizers:
+            if commands:
+                commands = optimizer.optimize(commands)
+        if commands:
+            self.write_commands(commands)
+
+    def write_commands(self, commands):
+        """
+        Writes the given commands to the output stream, in a single write call
+        :param commands: a list of vm commands, without line breaks
+        """
+        code = LINE_BREAK.join(commands) + LINE_BREAK
+        if self.__encoding is not None:
+            self.__output_stream.write(code.encode(self.__encoding))
+        else:
+            self.__output_stream.write(code)
+
+    def close(self):
+        """
+        Writes the remaining commands. Nothing should be written after the writer is closed
+        """
+        self.flush()
+
+
+def is_binary_stream(stream):
+    """
+    :param stream: an output stream
+    :return: True iff the stream expects bytes rather than text
+    """
+    if isinstance(stream, (io.RawIOBase, io.BufferedIOBase)):
+        return True
+    if isinstance(stream, io.TextIOBase):
+        return False
+    return BINARY_MODE_MARK in getattr(stream, "mode", "")
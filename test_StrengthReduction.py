@@ -0,0 +1,143 @@
+###########
+# imports #
+###########
+import unittest
+
+import JackCompiler
+from CodeGenerator import STRENGTH_REDUCTION
+from Linker import split_commands
+from VMInterpreter import VMInterpreter, to_word
+
+#############
+# constants #
+#############
+TEST_CLASS_NAME = "Main"
+# the constant factors: 0, 1 and -1, powers of two, other positive and negative factors and the largest word
+FACTORS = (0, 1, -1, 2, 4, 16, 1024, 16384, 3, 5, 7, 10, 255, 1000, 32767, -2, -3, -16, -1000, -32767)
+ARGUMENTS = (0, 1, -1, 2, 7, -7, 123, -1000, 181, 32767, -32767, -32768)
+# the multiplicands: a variable, an expression and a call that adds the number of times it was called to its
+# argument (so a multiplicand that is evaluated more than once changes the result)
+VARIABLE_MULTIPLICAND = "x"
+EXPRESSION_MULTIPLICAND = "(x - 1)"
+CALL_MULTIPLICAND = "Main.next(x)"
+MULTIPLICANDS = (VARIABLE_MULTIPLICAND, EXPRESSION_MULTIPLICAND, CALL_MULTIPLICAND)
+FUNCTION_NAME_FORMAT = "m{index}"
+FUNCTION_TEMPLATE = """
+    function int {name}(int x) {{
+        return {expression};
+    }}
+"""
+CLASS_TEMPLATE = """
+class Main {{
+    static int calls;
+
+    function int next(int x) {{
+        let calls = calls + 1;
+        return x + calls;
+    }}
+{functions}
+}}
+"""
+MULTIPLY_CALL = "call Math.multiply"
+# multiplications short enough to be written as additions
+SHORT_MULTIPLICATIONS_CLASS = """
+class Main {
+    function int run(int x) {
+        return (x * 16) + (3 * x) - (x * (-4)) + ((x - 1) * 10);
+    }
+}
+"""
+LEVELS = (0, 1)
+
+
+def get_expressions():
+    """
+    :return: a list of the tested multiplications: the jack expression and a function from the argument to the
+    expected result
+    """
+    multiplicand_values = {VARIABLE_MULTIPLICAND: lambda x: x, EXPRESSION_MULTIPLICAND: lambda x: to_word(x - 1),
+                           CALL_MULTIPLICAND: lambda x: to_word(x + 1)}
+    expressions = []
+    for factor in FACTORS:
+        constant = str(factor) if factor >= 0 else "(-%d)" % -factor
+        for multiplicand in MULTIPLICANDS:
+            value = multiplicand_values[multiplicand]
+            expected = (lambda x, value=value, factor=factor: to_word(value(x) * factor))
+            expressions.append((multiplicand + " * " + constant, expected))
+            expressions.append((constant + " * " + multiplicand, expected))
+    return expressions
+
+
+class StrengthReductionTest(unittest.TestCase):
+    """
+    Checks that the multiplications by constants compute the same results with and without strength reduction
+    """
+    @classmethod
+    def setUpClass(cls):
+        """
+        Builds the jack code of the test class: a function for each tested multiplication
+        """
+        cls.expressions = get_expressions()
+        functions = "".join(FUNCTION_TEMPLATE.format(name=FUNCTION_NAME_FORMAT.format(index=index),
+                                                     expression=expression)
+                            for index, (expression, expected) in enumerate(cls.expressions))
+        cls.source = CLASS_TEMPLATE.format(functions=functions)
+
+    def compile(self, optimizations, use_ast=False, source=None):
+        """
+        :param optimizations: the names of the optimizations to apply
+        :param use_ast: whether or not to compile through the abstract syntax tree
+        :param source: the jack code to compile, the test class by default
+        :return: the vm code of the class
+        """
+        return JackCompiler.compile_source(source or self.source, None, JackCompiler.get_build_options(
+            use_ast=use_ast, optimizations=optimizations))
+
+    def run_functions(self, vm_code):
+        """
+        :param vm_code: the vm code of the test class
+        :return: a dictionary from each tested multiplication and argument to its result
+        """
+        interpreter = VMInterpreter()
+        interpreter.load_class(TEST_CLASS_NAME, split_commands(vm_code))
+        results = {}
+        for index, (expression, expected) in enumerate(self.expressions):
+            function_name = TEST_CLASS_NAME + "." + FUNCTION_NAME_FORMAT.format(index=index)
+            for argument in ARGUMENTS:
+                results[expression, argument] = interpreter.call_function(function_name, [argument])
+        return results
+
+    def test_levels_compute_the_same_results(self):
+        """
+        The results at -O 0 and -O 1 are equal, and equal to the 16-bit products
+        """
+        expected_results = {(expression, argument): expected(argument) for expression, expected in self.expressions
+                            for argument in ARGUMENTS}
+        for level in LEVELS:
+            with self.subTest(level=level):
+                results = self.run_functions(self.compile(JackCompiler.get_optimizations(level)))
+                self.assertEqual(results, expected_results)
+
+    def test_strength_reduction_alone(self):
+        """
+        Strength reduction without the other optimizations computes the same results, in both compilation modes
+        """
+        unoptimized_results = self.run_functions(self.compile(JackCompiler.get_optimizations(0)))
+        for use_ast in (False, True):
+            with self.subTest(use_ast=use_ast):
+                results = self.run_functions(self.compile({STRENGTH_REDUCTION}, use_ast))
+                self.assertEqual(results, unoptimized_results)
+
+    def test_short_multiplications_call_no_math(self):
+        """
+        With strength reduction, multiplications by small constants don't call Math.multiply
+        """
+        self.assertIn(MULTIPLY_CALL, self.compile(JackCompiler.get_optimizations(0),
+                                                  source=SHORT_MULTIPLICATIONS_CLASS))
+        self.assertNotIn(MULTIPLY_CALL, self.compile(JackCompiler.get_optimizations(1),
+                                                     source=SHORT_MULTIPLICATIONS_CLASS))
+
+
+# main part
+if __name__ == '__main__':
+    unittest.main()